@@ -1,5 +1,15 @@
 from django.apps import AppConfig
+from django.core.signals import request_finished
+from django.db.backends.signals import connection_created
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from .slow_queries import install
+        from .sqlite import apply_pragmas, optimize_if_due
+
+        connection_created.connect(install)
+        connection_created.connect(apply_pragmas)
+        request_finished.connect(optimize_if_due)
@@ -0,0 +1,17 @@
+"""SQLite, в котором транзакция может сразу взять блокировку записи.
+
+Обычный ``BEGIN`` откладывает блокировку до первой записи: две
+транзакции, успевшие прочитать данные, не могут обе перейти к записи,
+и одна из них сразу получает ``database is locked`` без ожидания
+busy_timeout. ``BEGIN IMMEDIATE`` ждёт блокировку в самом начале.
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    # Включается на одну транзакцию, см. posts.writes.immediate_atomic
+    begin_immediate = False
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(
+            'BEGIN IMMEDIATE' if self.begin_immediate else 'BEGIN')
@@ -0,0 +1,47 @@
+"""Бэкенды кеша, которые считают попадания для текущего запроса."""
+from django.core.cache.backends import locmem
+
+from .instrumentation import record_cache
+from .sqlite_cache import SQLiteCache
+from .tiered_cache import TwoTierCache
+
+_MISSING = object()
+
+
+class InstrumentedCacheMixin:
+    """Учитывает попадания и промахи get/get_many в RequestStats."""
+
+    _counting = True
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _MISSING, version)
+        if value is _MISSING:
+            if self._counting:
+                record_cache(0, 1, key)
+            return default
+        if self._counting:
+            record_cache(1, 0, key)
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        # Базовый get_many вызывает get по ключу: не считаем дважды
+        self._counting = False
+        try:
+            found = super().get_many(keys, version)
+        finally:
+            del self._counting
+        record_cache(len(found), len(keys) - len(found))
+        return found
+
+
+class LocMemCache(InstrumentedCacheMixin, locmem.LocMemCache):
+    pass
+
+
+class SharedCache(InstrumentedCacheMixin, SQLiteCache):
+    pass
+
+
+class TieredCache(InstrumentedCacheMixin, TwoTierCache):
+    pass
@@ -0,0 +1,101 @@
+"""Счётчики текущего запроса: SQL, кеш, шаблоны и блокировки записи.
+
+Счётчики живут в contextvar, поэтому запросы в соседних потоках
+не мешают друг другу. Блоки collect() вкладываются: метрики и профиль
+одного запроса считают одно и то же независимо. Вне collect() учёт
+не ведётся.
+"""
+import contextvars
+import functools
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+
+current = contextvars.ContextVar('request_stats', default=None)
+# Ключи фрагментов {% cache %} в Django начинаются с этого префикса
+FRAGMENT_PREFIX = 'template.cache.'
+
+
+class RequestStats:
+    __slots__ = (
+        'parent', 'queries', 'sql_time', 'cache_hits', 'cache_misses',
+        'fragment_hits', 'fragment_misses', 'template_time',
+        'lock_wait', 'lock_retries', 'l1_hits', 'l1_misses',
+        'stale_served', 'recomputes',
+    )
+
+    def __init__(self, parent=None):
+        self.parent = parent
+        self.queries = 0
+        self.sql_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.fragment_hits = 0
+        self.fragment_misses = 0
+        self.template_time = 0.0
+        self.lock_wait = 0.0
+        self.lock_retries = 0
+        self.l1_hits = 0
+        self.l1_misses = 0
+        self.stale_served = 0
+        self.recomputes = 0
+
+
+def _add(**deltas):
+    stats = current.get()
+    while stats is not None:
+        for name, delta in deltas.items():
+            setattr(stats, name, getattr(stats, name) + delta)
+        stats = stats.parent
+
+
+def _record_query(stats, execute, sql, params, many, context):
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.sql_time += time.perf_counter() - started
+
+
+def record_cache(hits, misses, key=None):
+    _add(cache_hits=hits, cache_misses=misses)
+    if key is not None and key.startswith(FRAGMENT_PREFIX):
+        _add(fragment_hits=hits, fragment_misses=misses)
+
+
+def record_l1(hits, misses):
+    # Обращения к памяти процесса; промахи L1 идут в общий кеш
+    _add(l1_hits=hits, l1_misses=misses)
+
+
+def record_stale():
+    _add(stale_served=1)
+
+
+def record_recompute():
+    _add(recomputes=1)
+
+
+def record_template(seconds):
+    _add(template_time=seconds)
+
+
+def record_lock(seconds, retries=0):
+    _add(lock_wait=seconds, lock_retries=retries)
+
+
+@contextmanager
+def collect():
+    """Считает запросы, обращения к кешу и рендер внутри блока."""
+    stats = RequestStats(parent=current.get())
+    token = current.set(stats)
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(
+                    functools.partial(_record_query, stats)))
+            yield stats
+    finally:
+        current.reset(token)
@@ -0,0 +1,60 @@
+import os
+import tempfile
+import time
+
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+from core.sqlite_cache import SQLiteCache
+
+# Размер типичного фрагмента ленты из десяти карточек
+FRAGMENT = 'x' * 20_000
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает задержку операций кеша: locmem, файловый кеш '
+        'Django и общий кеш SQLite'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keys', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        # Все ключи помещаются: сравниваем операции, а не вытеснение
+        params = {'OPTIONS': {'MAX_ENTRIES': options['keys'] * 2}}
+        with tempfile.TemporaryDirectory() as directory:
+            backends = {
+                'locmem': LocMemCache('bench', params),
+                'filebased': FileBasedCache(
+                    os.path.join(directory, 'files'), params),
+                'sqlite (общий)': SQLiteCache(
+                    os.path.join(directory, 'cache.sqlite3'), params),
+            }
+            self.stdout.write(
+                f'{"бэкенд":<16}{"set, мкс":>10}{"get, мкс":>10}'
+                f'{"get_many(10), мкс":>19}{"incr, мкс":>11}')
+            for name, cache in backends.items():
+                self.stdout.write(f'{name:<16}' + ''.join(
+                    f'{value:>{width}.1f}' for value, width in zip(
+                        self.measure(cache, options), (10, 10, 19, 11))))
+
+    def measure(self, cache, options):
+        keys = [f'fragment:{index}' for index in range(options['keys'])]
+        repeat = options['repeat']
+        cache.set('counter', 0, timeout=None)
+
+        def timed(operation):
+            started = time.perf_counter()
+            for index in range(repeat):
+                operation(index)
+            return (time.perf_counter() - started) / repeat * 1e6
+
+        return (
+            timed(lambda i: cache.set(keys[i % len(keys)], FRAGMENT)),
+            timed(lambda i: cache.get(keys[i % len(keys)])),
+            timed(lambda i: cache.get_many(keys[i % 100:i % 100 + 10])),
+            timed(lambda i: cache.incr('counter')),
+        )
@@ -0,0 +1,124 @@
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+SCHEMA = (
+    'CREATE TABLE post (id INTEGER PRIMARY KEY, text TEXT, '
+    'pub_date REAL, author_id INTEGER)',
+    'CREATE INDEX post_pub_date ON post (pub_date)',
+    'CREATE INDEX post_author ON post (author_id, pub_date)',
+)
+READ = (
+    'SELECT id, text FROM post WHERE author_id = ? '
+    'ORDER BY pub_date DESC LIMIT 11'
+)
+WRITE = 'INSERT INTO post (text, pub_date, author_id) VALUES (?, ?, ?)'
+AUTHORS = 1000
+
+
+class Worker(threading.Thread):
+    """Выполняет «запросы»: чтение страницы ленты или запись поста."""
+
+    def __init__(self, path, pragmas, persistent, write, deadline):
+        super().__init__(daemon=True)
+        self.path = path
+        self.pragmas = pragmas
+        self.persistent = persistent
+        self.write = write
+        self.deadline = deadline
+        self.done = 0
+        self.errors = 0
+
+    def connect(self):
+        connection = sqlite3.connect(self.path, isolation_level=None)
+        for name, value in self.pragmas.items():
+            connection.execute(f'PRAGMA {name} = {value}')
+        return connection
+
+    def run(self):
+        connection = self.connect() if self.persistent else None
+        while time.monotonic() < self.deadline:
+            current = connection or self.connect()
+            try:
+                author = random.randrange(AUTHORS)
+                if self.write:
+                    current.execute(WRITE, ('x' * 200, time.time(), author))
+                else:
+                    current.execute(READ, (author,)).fetchall()
+                self.done += 1
+            except sqlite3.OperationalError:
+                self.errors += 1
+            finally:
+                if connection is None:
+                    current.close()
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность SQLite со стандартными '
+        'настройками и с SQLITE_PRAGMAS при одновременных чтении и записи'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--duration', type=float, default=5)
+        parser.add_argument('--rows', type=int, default=100_000)
+
+    def handle(self, *args, **options):
+        profiles = {
+            # Прагмы по умолчанию, новое соединение на каждый запрос
+            'по умолчанию': ({}, False),
+            'SQLITE_PRAGMAS + постоянные соединения': (
+                settings.SQLITE_PRAGMAS, True),
+        }
+        self.stdout.write(
+            f'{"профиль":<42}{"чтений/с":>10}{"записей/с":>11}'
+            f'{"ошибок":>8}')
+        for name, (pragmas, persistent) in profiles.items():
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'bench.sqlite3')
+                self.seed(path, options['rows'])
+                reads, writes, errors = self.run(
+                    path, pragmas, persistent, options)
+            duration = options['duration']
+            self.stdout.write(
+                f'{name:<42}{reads / duration:>10.0f}'
+                f'{writes / duration:>11.0f}{errors:>8}')
+
+    def seed(self, path, rows):
+        connection = sqlite3.connect(path)
+        for statement in SCHEMA:
+            connection.execute(statement)
+        now = time.time()
+        connection.executemany(WRITE, (
+            ('x' * 200, now - index, index % AUTHORS)
+            for index in range(rows)
+        ))
+        connection.commit()
+        connection.close()
+
+    def run(self, path, pragmas, persistent, options):
+        deadline = time.monotonic() + options['duration']
+        workers = [
+            Worker(path, pragmas, persistent, False, deadline)
+            for _ in range(options['readers'])
+        ] + [
+            Worker(path, pragmas, persistent, True, deadline)
+            for _ in range(options['writers'])
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return (
+            sum(w.done for w in workers if not w.write),
+            sum(w.done for w in workers if w.write),
+            sum(w.errors for w in workers),
+        )
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core import sqlite
+
+
+class Command(BaseCommand):
+    help = 'Обновляет статистику планировщика SQLite (для cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+        parser.add_argument(
+            '--analyze', action='store_true',
+            help='Полный ANALYZE вместо PRAGMA optimize')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if connection.vendor != 'sqlite':
+            raise CommandError('Команда нужна только для SQLite')
+        sqlite.optimize(connection, analyze=options['analyze'])
+        self.stdout.write('ANALYZE' if options['analyze'] else
+                          'PRAGMA optimize')
@@ -0,0 +1,89 @@
+import glob
+import io
+import json
+import os
+import pstats
+import statistics
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import profiling
+
+
+class Command(BaseCommand):
+    help = (
+        'Сводит профили запросов из PROFILING_DIR: время по представлениям, '
+        'самые дорогие функции и общий файл свёрнутых стеков'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', default=None)
+        parser.add_argument('--view', help='Только это представление')
+        parser.add_argument('--top', type=int, default=25)
+        parser.add_argument(
+            '--sort', default='cumulative',
+            choices=['cumulative', 'tottime', 'calls'])
+        parser.add_argument(
+            '--collapsed',
+            help='Записать сводные свёрнутые стеки для flame graph')
+        parser.add_argument('--token', action='store_true', help=(
+            'Напечатать значение заголовка для профиля одного запроса'))
+
+    def handle(self, *args, **options):
+        if options['token']:
+            self.stdout.write(
+                f'{settings.PROFILING_HEADER}: {profiling.make_token()}')
+            return
+        directory = options['dir'] or settings.PROFILING_DIR
+        profiles = self.load(directory, options['view'])
+        if not profiles:
+            raise CommandError(f'Нет профилей в {directory}')
+        self.summary(profiles)
+        stats = pstats.Stats(profiles[0][0] + '.prof', stream=io.StringIO())
+        for base, _ in profiles[1:]:
+            stats.add(base + '.prof')
+        stream = io.StringIO()
+        stats.stream = stream
+        stats.sort_stats(options['sort']).print_stats(options['top'])
+        self.stdout.write(stream.getvalue())
+        if options['collapsed']:
+            folded = Counter()
+            for base, _ in profiles:
+                with open(base + '.collapsed') as file:
+                    for line in file:
+                        stack, _, micros = line.rstrip('\n').rpartition(' ')
+                        folded[stack] += int(micros)
+            profiling.write_collapsed(options['collapsed'], folded)
+            self.stdout.write(f'Свёрнутые стеки: {options["collapsed"]}')
+
+    def load(self, directory, view):
+        profiles = []
+        for path in sorted(glob.glob(os.path.join(directory, '*.json'))):
+            base = path[:-len('.json')]
+            if not os.path.exists(base + '.prof'):
+                continue
+            with open(path) as file:
+                tags = json.load(file)
+            if view is None or tags['view'] == view:
+                profiles.append((base, tags))
+        return profiles
+
+    def summary(self, profiles):
+        by_view = defaultdict(list)
+        for _, tags in profiles:
+            by_view[tags['view']].append(tags)
+        self.stdout.write(
+            f'{"представление":<24}{"запросов":>9}{"мс, медиана":>13}'
+            f'{"SQL":>6}{"кеш, попадания":>16}'
+        )
+        for view, rows in sorted(by_view.items(), key=lambda item: str(
+                item[0])):
+            self.stdout.write(
+                f'{str(view):<24}{len(rows):>9}'
+                f'{statistics.median(r["ms"] for r in rows):>13.1f}'
+                f'{statistics.median(r["queries"] for r in rows):>6.0f}'
+                f'{sum(r["cache_hits"] for r in rows):>8}/'
+                f'{sum(r["cache_hits"] + r["cache_misses"] for r in rows):<7}'
+            )
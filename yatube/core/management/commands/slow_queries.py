@@ -0,0 +1,48 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import slow_queries
+
+
+class Command(BaseCommand):
+    help = (
+        'Сводка журнала медленных запросов: отпечатки по суммарному '
+        'времени с планом, представлениями и стеком'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--log', default=None)
+        parser.add_argument('--view', help='Только это представление')
+        parser.add_argument('--top', type=int, default=10)
+
+    def handle(self, *args, **options):
+        path = options['log'] or settings.SLOW_QUERY_LOG
+        groups = defaultdict(list)
+        for entry in slow_queries.load(path):
+            if options['view'] is None or entry['view'] == options['view']:
+                groups[entry['fingerprint']].append(entry)
+        if not groups:
+            raise CommandError(f'Нет медленных запросов в {path}')
+        ranked = sorted(
+            groups.values(), key=lambda rows: -sum(r['ms'] for r in rows))
+        for rank, rows in enumerate(ranked[:options['top']], 1):
+            self.report(rank, rows)
+
+    def report(self, rank, rows):
+        times = [row['ms'] for row in rows]
+        views = sorted({str(row['view']) for row in rows})
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'{rank}. {rows[0]["fingerprint"]}: {sum(times):.1f} мс всего, '
+            f'{len(times)} раз, в среднем {sum(times) / len(times):.1f} мс, '
+            f'максимум {max(times):.1f} мс'
+        ))
+        self.stdout.write(f'  Представления: {", ".join(views)}')
+        self.stdout.write(f'  {rows[0]["sql"]}')
+        plan = next((row['plan'] for row in rows if row['plan']), None)
+        for line in plan or ():
+            self.stdout.write(f'  план: {line}')
+        stack = next((row['stack'] for row in rows if row['stack']), ())
+        for frame in stack:
+            self.stdout.write(f'  стек: {frame}')
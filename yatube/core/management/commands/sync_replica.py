@@ -0,0 +1,37 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует базу SQLite в файлы реплик из DB_REPLICAS '
+        '(для проверки чтения с реплик на локальной машине)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('replicas', nargs='*', help=(
+            'Имена баз из REPLICA_DATABASES, по умолчанию все'))
+
+    def handle(self, *args, **options):
+        aliases = options['replicas'] or settings.REPLICA_DATABASES
+        if not aliases:
+            raise CommandError('Реплики не настроены: задайте DB_REPLICAS')
+        primary = connections['default']
+        if primary.vendor != 'sqlite':
+            raise CommandError('Копирование поддерживается только для SQLite')
+        primary.ensure_connection()
+        for alias in aliases:
+            if alias not in settings.REPLICA_DATABASES:
+                raise CommandError(f'{alias} нет в REPLICA_DATABASES')
+            path = settings.DATABASES[alias]['NAME']
+            connections[alias].close()
+            # backup копирует согласованный снимок даже под записью
+            target = sqlite3.connect(path)
+            try:
+                primary.connection.backup(target)
+            finally:
+                target.close()
+            self.stdout.write(f'{alias}: {path}')
@@ -0,0 +1,163 @@
+"""Метрики запросов в формате Prometheus.
+
+Каждый процесс копит счётчики в памяти и не чаще раза в
+METRICS_FLUSH_INTERVAL секунд сбрасывает снимок в свой файл
+``METRICS_DIR/<pid>.json``. Эндпоинт складывает свои живые
+счётчики со снимками остальных процессов, так что несколько
+воркеров gunicorn отдают одну картину.
+"""
+import glob
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+# Счётчики по представлениям: имя метрики и поле RequestStats
+COUNTERS = {
+    'yatube_sql_queries_total': ('queries', 'SQL-запросы'),
+    'yatube_sql_seconds_total': ('sql_time', 'Время SQL, с'),
+    'yatube_template_seconds_total': (
+        'template_time', 'Время рендера шаблонов, с'),
+    'yatube_cache_hits_total': ('cache_hits', 'Попадания в кеш'),
+    'yatube_cache_misses_total': ('cache_misses', 'Промахи кеша'),
+    'yatube_cache_l1_hits_total': (
+        'l1_hits', 'Попадания в кеш памяти процесса'),
+    'yatube_cache_l1_misses_total': (
+        'l1_misses', 'Промахи кеша памяти процесса (чтение из общего)'),
+    'yatube_fragment_cache_hits_total': (
+        'fragment_hits', 'Попадания во фрагменты шаблонов'),
+    'yatube_fragment_cache_misses_total': (
+        'fragment_misses', 'Промахи фрагментов шаблонов'),
+    'yatube_cache_recomputes_total': (
+        'recomputes', 'Пересчёты истёкших фрагментов'),
+    'yatube_cache_stale_served_total': (
+        'stale_served', 'Устаревшие копии, отданные во время пересчёта'),
+    'yatube_db_lock_wait_seconds_total': (
+        'lock_wait', 'Ожидание блокировки записи в базе, с'),
+    'yatube_db_lock_retries_total': (
+        'lock_retries', 'Повторы транзакций из-за database is locked'),
+}
+HISTOGRAM = 'yatube_request_duration_seconds'
+REQUESTS = 'yatube_requests_total'
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.requests = defaultdict(int)
+            # view -> [счётчики корзин..., +Inf, сумма]
+            self.histograms = defaultdict(
+                lambda: [0] * (len(BUCKETS) + 1) + [0.0])
+            self.counters = defaultdict(float)
+            self.flushed = 0.0
+
+    def observe(self, view, status, seconds, stats):
+        with self.lock:
+            self.requests[(view, f'{status // 100}xx')] += 1
+            histogram = self.histograms[view]
+            for index, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    histogram[index] += 1
+            histogram[len(BUCKETS)] += 1
+            histogram[-1] += seconds
+            for name, (field, _) in COUNTERS.items():
+                self.counters[(name, view)] += getattr(stats, field)
+        if time.monotonic() - self.flushed > settings.METRICS_FLUSH_INTERVAL:
+            self.flush()
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'requests': [[*key, value]
+                             for key, value in self.requests.items()],
+                'histograms': dict(self.histograms),
+                'counters': [[*key, value]
+                             for key, value in self.counters.items()],
+            }
+
+    def flush(self):
+        # Снимок пишет один поток, остальные не ждут его
+        if not self.flush_lock.acquire(blocking=False):
+            return
+        try:
+            directory = settings.METRICS_DIR
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f'{os.getpid()}.json')
+            with open(path + '.tmp', 'w') as file:
+                json.dump(self.snapshot(), file)
+            os.replace(path + '.tmp', path)
+            self.flushed = time.monotonic()
+        finally:
+            self.flush_lock.release()
+
+
+registry = Registry()
+
+
+def merged():
+    """Свои живые счётчики плюс снимки других процессов."""
+    snapshots = [registry.snapshot()]
+    own = f'{os.getpid()}.json'
+    for path in glob.glob(os.path.join(settings.METRICS_DIR, '*.json')):
+        if os.path.basename(path) == own:
+            continue
+        try:
+            with open(path) as file:
+                snapshots.append(json.load(file))
+        except (OSError, ValueError):
+            continue
+    requests = defaultdict(int)
+    histograms = defaultdict(lambda: [0] * (len(BUCKETS) + 1) + [0.0])
+    counters = defaultdict(float)
+    for snapshot in snapshots:
+        for view, status, value in snapshot['requests']:
+            requests[(view, status)] += value
+        for view, values in snapshot['histograms'].items():
+            histograms[view] = [
+                a + b for a, b in zip(histograms[view], values)]
+        for name, view, value in snapshot['counters']:
+            counters[(name, view)] += value
+    return requests, histograms, counters
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render():
+    """Текст для Prometheus (формат exposition 0.0.4)."""
+    requests, histograms, counters = merged()
+    lines = [
+        f'# HELP {REQUESTS} Запросы по представлениям и классам статуса',
+        f'# TYPE {REQUESTS} counter',
+    ]
+    for (view, status), value in sorted(requests.items()):
+        lines.append(
+            f'{REQUESTS}{{view="{view}",status="{status}"}} {value}')
+    lines += [
+        f'# HELP {HISTOGRAM} Время ответа по представлениям, с',
+        f'# TYPE {HISTOGRAM} histogram',
+    ]
+    for view, values in sorted(histograms.items()):
+        bounds = [str(bound) for bound in BUCKETS] + ['+Inf']
+        for bound, value in zip(bounds, values):
+            lines.append(
+                f'{HISTOGRAM}_bucket{{view="{view}",le="{bound}"}} {value}')
+        lines.append(f'{HISTOGRAM}_sum{{view="{view}"}} {values[-1]!r}')
+        lines.append(
+            f'{HISTOGRAM}_count{{view="{view}"}} {values[len(BUCKETS)]}')
+    for name, (_, description) in COUNTERS.items():
+        lines += [f'# HELP {name} {description}', f'# TYPE {name} counter']
+        for (metric, view), value in sorted(counters.items()):
+            if metric == name:
+                lines.append(f'{name}{{view="{view}"}} {_number(value)}')
+    return '\n'.join(lines) + '\n'
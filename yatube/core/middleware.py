@@ -0,0 +1,110 @@
+import cProfile
+import random
+import threading
+import time
+
+from django.conf import settings
+
+from . import instrumentation, metrics, profiling, routers, slow_queries
+
+# cProfile в Python 3.12+ глобален для процесса: одновременно
+# профилируется только один запрос
+_profiler_lock = threading.Lock()
+
+
+class MetricsMiddleware:
+    """Время ответа, SQL, кеш и шаблоны каждого запроса по представлениям."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        with instrumentation.collect() as stats:
+            response = self.get_response(request)
+        match = request.resolver_match
+        metrics.registry.observe(
+            match.view_name if match else 'unresolved',
+            response.status_code, time.perf_counter() - started, stats,
+        )
+        return response
+
+
+class SlowQueryMiddleware:
+    """Отмечает, какому запросу принадлежат медленные SQL-запросы."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = slow_queries.current_request.set(request)
+        try:
+            return self.get_response(request)
+        finally:
+            slow_queries.current_request.reset(token)
+
+
+class ReplicaMiddleware:
+    """Чтение лент с реплик и чтение с default после своей записи."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = routers.current_request.set(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            routers.current_request.reset(token)
+        if getattr(request, 'wrote', False) and response.status_code < 400:
+            response.set_cookie(
+                settings.REPLICA_STICKY_COOKIE, '1',
+                max_age=settings.REPLICA_STICKY_SECONDS, httponly=True)
+        return response
+
+
+class ProfilingMiddleware:
+    """Профилирует долю запросов и запросы с подписанным заголовком."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.header = 'HTTP_' + settings.PROFILING_HEADER.upper().replace(
+            '-', '_')
+
+    def wanted(self, request):
+        token = request.META.get(self.header)
+        if token:
+            return profiling.check_token(token)
+        rate = settings.PROFILING_SAMPLE_RATE
+        return rate > 0 and random.random() < rate
+
+    def __call__(self, request):
+        if not self.wanted(request) or not _profiler_lock.acquire(False):
+            return self.get_response(request)
+        try:
+            return self.profile(request)
+        finally:
+            _profiler_lock.release()
+
+    def profile(self, request):
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        with instrumentation.collect() as stats:
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+        match = request.resolver_match
+        profiling.save(profiler, {
+            'view': match.view_name if match else None,
+            'path': request.path,
+            'method': request.method,
+            'status': response.status_code,
+            'ms': (time.perf_counter() - started) * 1000,
+            'queries': stats.queries,
+            'sql_ms': stats.sql_time * 1000,
+            'cache_hits': stats.cache_hits,
+            'cache_misses': stats.cache_misses,
+        })
+        return response
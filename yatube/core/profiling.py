@@ -0,0 +1,99 @@
+"""Выборочное профилирование запросов через cProfile.
+
+Для каждого профилированного запроса в PROFILING_DIR пишутся три файла
+с общим именем: ``.prof`` (pstats), ``.collapsed`` (свёрнутые стеки для
+flamegraph.pl и speedscope) и ``.json`` с метками запроса.
+"""
+import json
+import os
+import pstats
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core import signing
+
+SALT = 'core.profiling'
+# Ветви дешевле 10 мкс отбрасываются: число стеков остаётся
+# небольшим, а форма flame graph не меняется
+MIN_WEIGHT = 1e-5
+MAX_DEPTH = 64
+
+
+def make_token():
+    """Значение заголовка PROFILING_HEADER, который включает профиль."""
+    return signing.TimestampSigner(salt=SALT).sign('profile')
+
+
+def check_token(value):
+    try:
+        signing.TimestampSigner(salt=SALT).unsign(
+            value, max_age=settings.PROFILING_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def label(func):
+    filename, line, name = func
+    if filename == '~':
+        # Встроенные функции: '<built-in method ...>'
+        return name.strip('<>')
+    module = os.path.splitext(os.path.basename(filename))[0]
+    return f'{module}.{name}:{line}'
+
+
+def collapse(stats):
+    """Свёрнутые стеки ``a;b;c <мкс>`` из графа вызовов pstats.
+
+    cProfile хранит только пары вызывающий → вызываемый, поэтому
+    собственное время функции раскладывается по цепочкам вызывающих
+    пропорционально времени, проведённому в функции по каждому ребру.
+    """
+    raw = stats.stats
+    folded = defaultdict(float)
+
+    def walk(func, stack, weight):
+        callers = raw[func][4]
+        total = sum(edge[3] for edge in callers.values())
+        if not callers or total <= 0 or len(stack) >= MAX_DEPTH:
+            folded[';'.join(label(f) for f in reversed(stack))] += weight
+            return
+        for caller, edge in callers.items():
+            share = weight * edge[3] / total
+            if share < MIN_WEIGHT or caller in stack or caller not in raw:
+                if share >= MIN_WEIGHT:
+                    folded[';'.join(
+                        label(f) for f in reversed(stack))] += share
+                continue
+            walk(caller, stack + [caller], share)
+
+    for func, (_, _, tottime, _, _) in raw.items():
+        if tottime >= MIN_WEIGHT:
+            walk(func, [func], tottime)
+    return {
+        stack: round(seconds * 1_000_000)
+        for stack, seconds in folded.items() if seconds * 1_000_000 >= 1
+    }
+
+
+def write_collapsed(path, folded):
+    with open(path, 'w') as file:
+        for stack, micros in sorted(folded.items()):
+            file.write(f'{stack} {micros}\n')
+
+
+def save(profiler, tags):
+    """Сохраняет профиль запроса, возвращает путь без расширения."""
+    directory = settings.PROFILING_DIR
+    os.makedirs(directory, exist_ok=True)
+    view = (tags['view'] or 'unresolved').replace(':', '.')
+    base = os.path.join(directory, (
+        f'{time.strftime("%Y%m%d-%H%M%S")}-{time.time_ns() % 10 ** 6:06d}-'
+        f'{view}-{tags["ms"]:.0f}ms-{tags["queries"]}q'
+    ))
+    profiler.dump_stats(base + '.prof')
+    write_collapsed(base + '.collapsed', collapse(pstats.Stats(profiler)))
+    with open(base + '.json', 'w') as file:
+        json.dump(tags, file, ensure_ascii=False)
+    return base
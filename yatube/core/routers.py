@@ -0,0 +1,84 @@
+"""Чтение лент с реплик базы.
+
+Запросы GET к представлениям из REPLICA_VIEWS читают с одной из
+REPLICA_DATABASES; всё остальное, в том числе чтение внутри
+представлений записи, идёт в default. После успешной записи
+пользователь REPLICA_STICKY_SECONDS секунд читает с default
+(кука REPLICA_STICKY_COOKIE), чтобы сразу увидеть свой пост,
+комментарий или подписку, даже если реплика отстаёт.
+
+Фрагменты и карточки, собранные по данным реплики, в кеш не кладутся,
+а страницы для кеша страниц читаются с default.
+"""
+import contextvars
+import random
+
+from django.conf import settings
+
+PRIMARY = 'default'
+SAFE_METHODS = ('GET', 'HEAD')
+# Сессии и самого пользователя сразу после входа или регистрации
+# на реплике ещё нет
+PRIMARY_APPS = ('sessions', 'auth')
+# Запрос, который сейчас обрабатывается (ставит ReplicaMiddleware)
+current_request = contextvars.ContextVar('replica_request', default=None)
+
+
+def replica_for(request):
+    """Реплика для чтения в этом запросе или None."""
+    replicas = settings.REPLICA_DATABASES
+    if not replicas or request.method not in SAFE_METHODS:
+        return None
+    match = request.resolver_match
+    if match is None or match.view_name not in settings.REPLICA_VIEWS:
+        return None
+    if settings.REPLICA_STICKY_COOKIE in request.COOKIES:
+        return None
+    if not hasattr(request, 'replica'):
+        # Одна реплика на весь запрос: страницы не смешивают снимки
+        request.replica = random.choice(replicas)
+    return request.replica
+
+
+def mark_write():
+    """Отмечает, что текущий запрос записал в базу.
+
+    По этой отметке, а не по методу запроса, ReplicaMiddleware ставит
+    куку чтения с default: подписка и отписка пишут и по GET.
+    """
+    request = current_request.get()
+    if request is not None:
+        request.wrote = True
+
+
+def use_primary(request):
+    """Весь запрос читает с default (например, чтобы заполнить кеш)."""
+    request.replica = None
+
+
+def read_from_replica():
+    """Читал ли текущий запрос с реплики.
+
+    Реплика может отставать, а версия ленты уже сброшена: собранное
+    по её данным нельзя класть в кеш под новой версией.
+    """
+    request = current_request.get()
+    return getattr(request, 'replica', None) is not None
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        request = current_request.get()
+        if request is None or model._meta.app_label in PRIMARY_APPS:
+            return None
+        return replica_for(request)
+
+    def db_for_write(self, model, **hints):
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики — копии default: объекты из них можно связывать
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.REPLICA_DATABASES
@@ -0,0 +1,155 @@
+"""Журнал медленных SQL-запросов.
+
+Обёртка выполнения запросов ставится на каждое соединение с базой.
+Запрос дольше SLOW_QUERY_MS миллисекунд дописывается строкой JSON
+в SLOW_QUERY_LOG: отпечаток (SQL без литералов), длительность,
+представление и короткий стек вызова из кода проекта. План
+``EXPLAIN`` снимается один раз на отпечаток в процессе: повторы
+того же запроса его не перезапускают.
+"""
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+import traceback
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Запрос, который сейчас обрабатывается (ставит SlowQueryMiddleware)
+current_request = contextvars.ContextVar('slow_query_request', default=None)
+_explaining = contextvars.ContextVar('slow_query_explaining', default=False)
+_explained = set()
+_lock = threading.Lock()
+STACK_DEPTH = 5
+# Отпечатков с планом в памяти процесса не больше этого числа
+MAX_EXPLAINED = 1000
+
+STRING = re.compile(r"'(?:[^']|'')*'")
+NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+PLACEHOLDERS = re.compile(r'\(\s*(?:\?|%s)(?:\s*,\s*(?:\?|%s))*\s*\)')
+SPACES = re.compile(r'\s+')
+
+
+def normalize(sql):
+    """SQL без литералов: запросы, различающиеся данными, совпадают."""
+    sql = STRING.sub('?', sql)
+    sql = NUMBER.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = PLACEHOLDERS.sub('(...)', sql)
+    return SPACES.sub(' ', sql).strip()
+
+
+def fingerprint(sql):
+    return hashlib.sha1(normalize(sql).encode()).hexdigest()[:12]
+
+
+def _stack():
+    # Только кадры проекта: библиотеки и сам журнал не интересны
+    frames = [
+        frame for frame in traceback.extract_stack()[:-3]
+        if frame.filename.startswith(settings.BASE_DIR)
+        and 'site-packages' not in frame.filename
+        and not frame.filename.endswith(os.sep + 'slow_queries.py')
+    ]
+    return [
+        f'{os.path.relpath(frame.filename, settings.BASE_DIR)}:'
+        f'{frame.lineno} in {frame.name}'
+        for frame in frames[-STACK_DEPTH:]
+    ]
+
+
+def _view():
+    request = current_request.get()
+    if request is None:
+        return None
+    match = request.resolver_match
+    return match.view_name if match else request.path
+
+
+def explain(connection, sql, params):
+    """План запроса или None, если его не снять."""
+    if not sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+        return None
+    prefix = connection.ops.explain_query_prefix()
+    token = _explaining.set(True)
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f'{prefix} {sql}', params)
+            return [
+                ' '.join(str(column) for column in row)
+                for row in cursor.fetchall()
+            ]
+    except DatabaseError:
+        return None
+    finally:
+        _explaining.reset(token)
+
+
+def _first_seen(key):
+    with _lock:
+        if key in _explained or len(_explained) >= MAX_EXPLAINED:
+            return False
+        _explained.add(key)
+        return True
+
+
+def record(connection, sql, params, many, seconds):
+    key = fingerprint(sql)
+    entry = {
+        'fingerprint': key,
+        'sql': normalize(sql),
+        'ms': round(seconds * 1000, 3),
+        'view': _view(),
+        'time': timezone.now().isoformat(),
+        'stack': _stack(),
+        'plan': None,
+    }
+    if not many and _first_seen(key):
+        entry['plan'] = explain(connection, sql, params)
+    logger.warning(
+        'Медленный запрос %s (%.1f мс) в %s', key, entry['ms'], entry['view'])
+    path = settings.SLOW_QUERY_LOG
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with _lock, open(path, 'a') as file:
+        file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+
+def log_slow(execute, sql, params, many, context):
+    if _explaining.get():
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        seconds = time.perf_counter() - started
+        threshold = settings.SLOW_QUERY_MS
+        if threshold is not None and seconds * 1000 >= threshold:
+            record(context['connection'], sql, params, many, seconds)
+
+
+def install(sender, connection, **kwargs):
+    """Ставит обёртку на новое соединение (сигнал connection_created)."""
+    if log_slow not in connection.execute_wrappers:
+        connection.execute_wrappers.append(log_slow)
+
+
+def load(path):
+    """Записи журнала; битые строки пропускаются."""
+    entries = []
+    if not os.path.exists(path):
+        return entries
+    with open(path) as file:
+        for line in file:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue
+    return entries
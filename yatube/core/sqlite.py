@@ -0,0 +1,48 @@
+"""Настройки SQLite для работы под нагрузкой.
+
+Каждое новое соединение получает SQLITE_PRAGMAS: WAL, чтобы читатели
+не ждали писателя, ``synchronous=NORMAL`` (в режиме WAL база
+остаётся целостной, теряется лишь последняя транзакция при сбое
+питания), отображение файла в память, кеш страниц и ожидание
+блокировки вместо немедленной ошибки ``database is locked``.
+
+Соединения живут CONN_MAX_AGE секунд, поэтому статистика планировщика
+обновляется ``PRAGMA optimize`` после запроса раз в
+SQLITE_OPTIMIZE_INTERVAL секунд; полный ANALYZE делает
+``manage.py optimize_db --analyze``.
+"""
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+
+def apply_pragmas(sender, connection, **kwargs):
+    """Ставит SQLITE_PRAGMAS новому соединению (connection_created)."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+    connection.optimized_at = time.monotonic()
+
+
+def optimize(connection, analyze=False):
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE' if analyze else 'PRAGMA optimize')
+    connection.optimized_at = time.monotonic()
+
+
+def optimize_if_due(**kwargs):
+    """Обновляет статистику долгоживущих соединений (request_finished)."""
+    interval = settings.SQLITE_OPTIMIZE_INTERVAL
+    for connection in connections.all():
+        if connection.vendor != 'sqlite' or connection.connection is None:
+            continue
+        started = getattr(connection, 'optimized_at', None)
+        if started is not None and time.monotonic() - started >= interval:
+            try:
+                optimize(connection)
+            except DatabaseError:
+                # Статистика подождёт до следующего запроса
+                connection.optimized_at = time.monotonic()
@@ -0,0 +1,231 @@
+"""Кеш в файле SQLite, общий для всех процессов на машине.
+
+Воркеры gunicorn открывают один файл (WAL и mmap), поэтому фрагмент,
+собранный одним воркером, видят остальные, а сброс версии ленты
+доходит до всех. Записи вытесняются по давности последнего чтения,
+когда кеш превышает MAX_SIZE байт или MAX_ENTRIES записей. incr и add
+атомарны между процессами: на них держатся версии лент.
+
+Время чтения обновляется не чаще раза в ACCESS_RESOLUTION секунд,
+иначе каждое попадание было бы записью в базу.
+"""
+import os
+import pickle
+import sqlite3
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS cache (
+        key TEXT PRIMARY KEY,
+        value BLOB NOT NULL,
+        expires REAL,
+        accessed REAL NOT NULL,
+        size INTEGER NOT NULL
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed);
+"""
+PRAGMAS = {
+    'journal_mode': 'WAL',
+    # Потерять последние записи кеша при сбое питания не страшно
+    'synchronous': 'OFF',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+}
+UPSERT = """
+    INSERT INTO cache (key, value, expires, accessed, size)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (key) DO UPDATE SET
+        value = excluded.value, expires = excluded.expires,
+        accessed = excluded.accessed, size = excluded.size
+"""
+# Оставляет самые свежие записи в пределах размера и числа
+CULL = """
+    DELETE FROM cache WHERE key IN (
+        SELECT key FROM (
+            SELECT key,
+                   sum(size) OVER (ORDER BY accessed DESC, key) AS kept,
+                   row_number() OVER (ORDER BY accessed DESC, key) AS rank
+            FROM cache
+        ) WHERE kept > ? OR rank > ?
+    )
+"""
+# Ограничение SQLite на число параметров запроса
+CHUNK = 500
+
+
+class SQLiteCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.path = location
+        self.max_size = int(options.get('MAX_SIZE', 64 * 1024 * 1024))
+        self.access_resolution = options.get('ACCESS_RESOLUTION', 10)
+        # Проверять размер раз в столько записей этого процесса
+        self.cull_every = options.get('CULL_EVERY', 100)
+        self._connection = None
+        self._pid = None
+        self._writes = 0
+
+    def _db(self):
+        # После fork соединение родителя использовать нельзя
+        if self._connection is None or self._pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, isolation_level=None)
+            for name, value in PRAGMAS.items():
+                connection.execute(f'PRAGMA {name} = {value}')
+            connection.executescript(SCHEMA)
+            self._connection, self._pid = connection, os.getpid()
+        return self._connection
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _row(self, key, value, timeout, now):
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        return (key, data, self.get_backend_timeout(timeout), now,
+                len(data))
+
+    def _wrote(self, db, count=1):
+        self._writes += count
+        if self._writes >= self.cull_every:
+            self._writes = 0
+            self._cull(db)
+
+    def _cull(self, db):
+        db.execute('DELETE FROM cache WHERE expires < ?', [time.time()])
+        size, entries = db.execute(
+            'SELECT total(size), count(*) FROM cache').fetchone()
+        if size <= self.max_size and entries <= self._max_entries:
+            return
+        # Как CULL_FREQUENCY в Django: освобождаем долю с запасом
+        keep = 1 - 1 / self._cull_frequency
+        db.execute(CULL, [
+            int(self.max_size * keep), int(self._max_entries * keep)])
+
+    def _alive(self, expires, now):
+        return expires is None or expires > now
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        db = self._db()
+        row = db.execute(
+            'SELECT value, expires, accessed FROM cache WHERE key = ?',
+            [key]).fetchone()
+        now = time.time()
+        if row is None or not self._alive(row[1], now):
+            return default
+        if now - row[2] > self.access_resolution:
+            db.execute(
+                'UPDATE cache SET accessed = ? WHERE key = ?', [now, key])
+        return pickle.loads(row[0])
+
+    def get_many(self, keys, version=None):
+        original = {self._key(key, version): key for key in keys}
+        db = self._db()
+        now = time.time()
+        found = {}
+        stale = []
+        made = list(original)
+        for start in range(0, len(made), CHUNK):
+            chunk = made[start:start + CHUNK]
+            rows = db.execute(
+                'SELECT key, value, expires, accessed FROM cache '
+                f'WHERE key IN ({", ".join("?" * len(chunk))})', chunk)
+            for key, value, expires, accessed in rows:
+                if self._alive(expires, now):
+                    found[original[key]] = pickle.loads(value)
+                    if now - accessed > self.access_resolution:
+                        stale.append((now, key))
+        if stale:
+            db.executemany(
+                'UPDATE cache SET accessed = ? WHERE key = ?', stale)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        db = self._db()
+        db.execute(UPSERT, self._row(key, value, timeout, time.time()))
+        self._wrote(db)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        now = time.time()
+        rows = [
+            self._row(self._key(key, version), value, timeout, now)
+            for key, value in data.items()
+        ]
+        db = self._db()
+        with db:
+            db.execute('BEGIN')
+            db.executemany(UPSERT, rows)
+        self._wrote(db, len(rows))
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        db = self._db()
+        # Перезаписывается только истёкшая запись
+        cursor = db.execute(
+            UPSERT + ' WHERE cache.expires IS NOT NULL '
+            'AND cache.expires <= ?',
+            [*self._row(key, value, timeout, now), now])
+        if cursor.rowcount:
+            self._wrote(db)
+        return bool(cursor.rowcount)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        cursor = self._db().execute(
+            'UPDATE cache SET expires = ? WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            [self.get_backend_timeout(timeout), key, now])
+        return bool(cursor.rowcount)
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        db = self._db()
+        # BEGIN IMMEDIATE: чтение и запись не разорвёт другой процесс
+        with db:
+            db.execute('BEGIN IMMEDIATE')
+            row = db.execute(
+                'SELECT value, expires FROM cache WHERE key = ?',
+                [key]).fetchone()
+            if row is None or not self._alive(row[1], time.time()):
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            db.execute(
+                'UPDATE cache SET value = ?, size = ? WHERE key = ?',
+                [data, len(data), key])
+        return value
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        row = self._db().execute(
+            'SELECT 1 FROM cache WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            [key, time.time()]).fetchone()
+        return row is not None
+
+    def delete(self, key, version=None):
+        key = self._key(key, version)
+        cursor = self._db().execute(
+            'DELETE FROM cache WHERE key = ?', [key])
+        return bool(cursor.rowcount)
+
+    def delete_many(self, keys, version=None):
+        rows = [(self._key(key, version),) for key in keys]
+        db = self._db()
+        with db:
+            db.execute('BEGIN')
+            db.executemany('DELETE FROM cache WHERE key = ?', rows)
+
+    def clear(self):
+        self._db().execute('DELETE FROM cache')
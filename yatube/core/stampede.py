@@ -0,0 +1,80 @@
+"""Защита от одновременного пересчёта истёкшего ключа кеша.
+
+Когда фрагмент ленты истекает или его версия сбрасывается, все
+запросы в этот момент промахиваются одновременно. Пересчитывает
+только тот, кто первым взял блокировку (``add`` атомарен в общем
+кеше); остальные отдают последнюю готовую копию из слота без версии.
+Если копии ещё нет, они ждут ведущего до STAMPEDE_WAIT секунд.
+"""
+import time
+
+from django.conf import settings
+
+from .instrumentation import record_recompute, record_stale
+from .routers import read_from_replica
+
+LOCK_PREFIX = 'stampede-lock:'
+STALE_PREFIX = 'stale:'
+POLL_INTERVAL = 0.02
+_MISSING = object()
+
+
+def _counted(compute):
+    def wrapper():
+        record_recompute()
+        return compute()
+    return wrapper
+
+
+def _store(cache, key, value, timeout):
+    # Данные реплики могут отставать от уже сброшенной версии
+    if not read_from_replica():
+        cache.set(key, value, timeout)
+
+
+def get_or_compute(cache, key, compute, timeout, slot=None):
+    """Значение по ключу; при промахе пересчитывает один запрос.
+
+    ``slot`` — ключ без версии, под которым хранится последняя копия
+    для остальных запросов; по умолчанию совпадает с ``key``.
+    """
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        return value
+    compute = _counted(compute)
+    if not settings.STAMPEDE_PROTECTION:
+        value = compute()
+        _store(cache, key, value, timeout)
+        return value
+    slot = slot or key
+    lock = LOCK_PREFIX + slot
+    if cache.add(lock, 1, settings.STAMPEDE_LOCK_TIMEOUT):
+        try:
+            # Прошлый ведущий мог закончить между get и add;
+            # has_key не считается вторым промахом в метриках
+            if cache.has_key(key):
+                value = cache.get(key, _MISSING)
+                if value is not _MISSING:
+                    return value
+            value = compute()
+            _store(cache, key, value, timeout)
+            _store(
+                cache, STALE_PREFIX + slot, value,
+                settings.STAMPEDE_STALE_TIMEOUT)
+        finally:
+            cache.delete(lock)
+        return value
+    value = cache.get(STALE_PREFIX + slot, _MISSING)
+    if value is not _MISSING:
+        record_stale()
+        return value
+    deadline = time.monotonic() + settings.STAMPEDE_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        value = cache.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+    # Ведущий не успел: считаем сами, но блокировку не трогаем
+    value = compute()
+    _store(cache, key, value, timeout)
+    return value
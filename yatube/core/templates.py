@@ -0,0 +1,33 @@
+"""Шаблонный движок Django, который замеряет время рендера."""
+import contextvars
+import time
+
+from django.template.backends.django import DjangoTemplates, Template
+
+from .instrumentation import record_template
+
+# Карточки постов рендерятся отдельным render_to_string внутри
+# страницы: их время уже входит во внешний рендер
+_rendering = contextvars.ContextVar('template_rendering', default=False)
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        if _rendering.get():
+            return super().render(context, request)
+        token = _rendering.set(True)
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            record_template(time.perf_counter() - started)
+            _rendering.reset(token)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return TimedTemplate(template.template, self)
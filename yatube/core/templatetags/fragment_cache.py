@@ -0,0 +1,54 @@
+from django import template
+from django.core.cache import caches
+from django.core.cache.utils import make_template_fragment_key
+
+from core import stampede
+
+register = template.Library()
+
+
+class FragmentCacheNode(template.Node):
+    def __init__(self, nodelist, timeout, name, vary_on, version):
+        self.nodelist = nodelist
+        self.timeout = timeout
+        self.name = name
+        self.vary_on = vary_on
+        self.version = version
+
+    def render(self, context):
+        timeout = self.timeout.resolve(context)
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        slot = make_template_fragment_key(self.name, vary_on)
+        if self.version is not None:
+            vary_on.append(self.version.resolve(context))
+        return stampede.get_or_compute(
+            caches['default'],
+            make_template_fragment_key(self.name, vary_on),
+            lambda: self.nodelist.render(context),
+            None if timeout is None else int(timeout),
+            slot=slot,
+        )
+
+
+@register.tag
+def fragment_cache(parser, token):
+    """Как {% cache %}, но истёкший фрагмент пересчитывает один запрос.
+
+    {% fragment_cache timeout name var1 var2 version=cache_version %}
+
+    Пока он считает, остальные получают фрагмент предыдущей версии
+    с теми же var1, var2.
+    """
+    nodelist = parser.parse(('endfragment_cache',))
+    parser.delete_first_token()
+    bits = token.split_contents()
+    if len(bits) < 3:
+        raise template.TemplateSyntaxError(
+            f'{bits[0]} требует срок хранения и имя фрагмента')
+    version = None
+    if bits[-1].startswith('version='):
+        version = parser.compile_filter(bits.pop()[len('version='):])
+    return FragmentCacheNode(
+        nodelist, parser.compile_filter(bits[1]), bits[2],
+        [parser.compile_filter(bit) for bit in bits[3:]], version,
+    )
@@ -0,0 +1,96 @@
+import json
+import os
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core import metrics
+from posts.models import Post, User
+
+
+class MetricsEndpointTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        settings = override_settings(
+            METRICS_DIR=self.directory, METRICS_TOKEN='secret')
+        settings.enable()
+        self.addCleanup(settings.disable)
+        metrics.registry.reset()
+        self.addCleanup(metrics.registry.reset)
+        cache.clear()
+        author = User.objects.create(username='measured')
+        Post.objects.create(text='Измеряемый пост', author=author)
+
+    def scrape(self):
+        response = self.client.get(
+            reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def value(self, text, line):
+        for row in text.splitlines():
+            if row.startswith(line + ' '):
+                return float(row.rsplit(' ', 1)[1])
+        self.fail(f'Нет строки {line}')
+
+    def test_view_histogram_and_sql(self):
+        self.client.get(reverse('posts:main-view'))
+        text = self.scrape()
+        view = 'view="posts:main-view"'
+        self.assertEqual(self.value(
+            text, f'yatube_request_duration_seconds_count{{{view}}}'), 1)
+        self.assertEqual(self.value(
+            text, 'yatube_request_duration_seconds_bucket'
+            f'{{{view},le="+Inf"}}'), 1)
+        self.assertEqual(self.value(
+            text, f'yatube_requests_total{{{view},status="2xx"}}'), 1)
+        self.assertGreater(
+            self.value(text, f'yatube_sql_queries_total{{{view}}}'), 0)
+        self.assertGreater(
+            self.value(text, f'yatube_template_seconds_total{{{view}}}'), 0)
+
+    def test_fragment_cache_miss_then_hit(self):
+        self.client.get(reverse('posts:main-view'))
+        self.client.get(reverse('posts:main-view'))
+        text = self.scrape()
+        view = '{view="posts:main-view"}'
+        self.assertEqual(
+            self.value(text, f'yatube_fragment_cache_misses_total{view}'), 1)
+        self.assertEqual(
+            self.value(text, f'yatube_fragment_cache_hits_total{view}'), 1)
+
+    def test_other_processes_merged(self):
+        """Снимки других процессов складываются с живыми счётчиками."""
+        self.client.get(reverse('posts:main-view'))
+        snapshot = metrics.registry.snapshot()
+        with open(os.path.join(self.directory, '1.json'), 'w') as file:
+            json.dump(snapshot, file)
+        text = self.scrape()
+        self.assertEqual(self.value(
+            text, 'yatube_request_duration_seconds_count'
+            '{view="posts:main-view"}'), 2)
+
+    def test_hidden_from_other_addresses(self):
+        response = self.client.get(
+            reverse('metrics'), REMOTE_ADDR='10.0.0.1',
+            HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 404)
+
+    def test_loopback_needs_token(self):
+        """С loopback без токена, как через прокси, метрик не видно."""
+        for authorization in ('', 'Bearer wrong'):
+            with self.subTest(authorization=authorization):
+                response = self.client.get(
+                    reverse('metrics'), REMOTE_ADDR='127.0.0.1',
+                    HTTP_AUTHORIZATION=authorization)
+                self.assertEqual(response.status_code, 404)
+
+    @override_settings(METRICS_TOKEN='')
+    def test_closed_without_configured_token(self):
+        response = self.client.get(
+            reverse('metrics'), HTTP_AUTHORIZATION='Bearer ')
+        self.assertEqual(response.status_code, 404)
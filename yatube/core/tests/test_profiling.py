@@ -0,0 +1,84 @@
+import glob
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core import instrumentation, profiling
+from posts.models import Post, User
+
+
+class InstrumentationTest(TestCase):
+    def test_cache_hits_counted(self):
+        """get и get_many учитываются без двойного счёта."""
+        cache.set('instrumented', 1)
+        with instrumentation.collect() as stats:
+            cache.get('instrumented')
+            cache.get('absent')
+            cache.get_many(['instrumented', 'absent'])
+        self.assertEqual((stats.cache_hits, stats.cache_misses), (2, 2))
+
+    def test_queries_counted(self):
+        with instrumentation.collect() as stats:
+            list(Post.objects.all())
+        self.assertEqual(stats.queries, 1)
+
+
+class ProfilingMiddlewareTest(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        author = User.objects.create(username='profiled')
+        Post.objects.create(text='Профилируемый пост', author=author)
+
+    def files(self, extension):
+        return glob.glob(os.path.join(self.directory, f'*.{extension}'))
+
+    def test_signed_header_profiles_request(self):
+        """Запрос с подписанным заголовком оставляет профиль и метки."""
+        with override_settings(PROFILING_DIR=self.directory):
+            self.client.get(
+                reverse('posts:main-view'),
+                HTTP_X_PROFILE=profiling.make_token())
+        self.assertEqual(len(self.files('prof')), 1)
+        self.assertEqual(len(self.files('collapsed')), 1)
+        with open(self.files('json')[0]) as file:
+            tags = json.load(file)
+        self.assertEqual(tags['view'], 'posts:main-view')
+        self.assertGreater(tags['queries'], 0)
+        self.assertGreater(tags['ms'], 0)
+        with open(self.files('collapsed')[0]) as file:
+            self.assertIn('views.index', file.read())
+
+    def test_forged_header_ignored(self):
+        with override_settings(PROFILING_DIR=self.directory):
+            self.client.get(
+                reverse('posts:main-view'), HTTP_X_PROFILE='profile:forged')
+        self.assertEqual(self.files('prof'), [])
+
+    def test_sample_rate(self):
+        with override_settings(
+            PROFILING_DIR=self.directory, PROFILING_SAMPLE_RATE=1
+        ):
+            self.client.get(reverse('posts:main-view'))
+        self.assertEqual(len(self.files('prof')), 1)
+
+    def test_report_merges_profiles(self):
+        """profile_report сводит профили и пишет общий файл стеков."""
+        with override_settings(
+            PROFILING_DIR=self.directory, PROFILING_SAMPLE_RATE=1
+        ):
+            self.client.get(reverse('posts:main-view'))
+            self.client.get(reverse('posts:main-view'))
+            collapsed = os.path.join(self.directory, 'all.folded')
+            out = StringIO()
+            call_command('profile_report', collapsed=collapsed, stdout=out)
+        self.assertIn('posts:main-view', out.getvalue())
+        with open(collapsed) as file:
+            self.assertIn('views.index', file.read())
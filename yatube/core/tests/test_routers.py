@@ -0,0 +1,83 @@
+from django.conf import settings
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.urls import resolve, reverse
+
+from core.middleware import ReplicaMiddleware
+from core import routers
+from core.routers import ReplicaRouter
+from posts.models import Post, User
+
+
+@override_settings(REPLICA_DATABASES=['replica1'])
+class ReplicaRouterTest(SimpleTestCase):
+    def read(self, method, path, status=200, model=Post, write=False,
+             **extra):
+        """База, с которой представление прочитало бы модель, и ответ."""
+        request = getattr(RequestFactory(), method)(path, **extra)
+        request.resolver_match = resolve(path)
+        seen = {}
+
+        def view(request):
+            seen['database'] = ReplicaRouter().db_for_read(model)
+            seen['replica'] = routers.read_from_replica()
+            if write:
+                routers.mark_write()
+            return HttpResponse(status=status)
+
+        response = ReplicaMiddleware(view)(request)
+        self.from_replica = seen['replica']
+        return seen['database'], response
+
+    def test_feed_reads_from_replica(self):
+        for path in (reverse('posts:main-view'),
+                     reverse('posts:profile', args=['author'])):
+            with self.subTest(path=path):
+                self.assertEqual(self.read('get', path)[0], 'replica1')
+                self.assertTrue(self.from_replica)
+
+    def test_users_read_from_primary(self):
+        """Только что зарегистрированный пользователь есть на default."""
+        self.assertIsNone(
+            self.read('get', reverse('posts:main-view'), model=User)[0])
+        self.assertFalse(self.from_replica)
+
+    def test_write_views_use_primary(self):
+        self.assertIsNone(self.read('get', reverse('posts:post_create'))[0])
+        database, response = self.read(
+            'post', reverse('posts:add_comment', args=[1]), status=302,
+            write=True)
+        self.assertIsNone(database)
+        self.assertIn(settings.REPLICA_STICKY_COOKIE, response.cookies)
+
+    def test_sticky_only_after_write(self):
+        """Кука ставится по отметке записи, а не по методу запроса."""
+        _, response = self.read(
+            'post', reverse('posts:add_comment', args=[1]), status=302)
+        self.assertNotIn(settings.REPLICA_STICKY_COOKIE, response.cookies)
+        _, response = self.read(
+            'get', reverse('posts:profile_follow', args=['author']),
+            status=302, write=True)
+        self.assertIn(settings.REPLICA_STICKY_COOKIE, response.cookies)
+
+    def test_failed_write_not_sticky(self):
+        _, response = self.read(
+            'post', reverse('posts:add_comment', args=[1]), status=404,
+            write=True)
+        self.assertNotIn(settings.REPLICA_STICKY_COOKIE, response.cookies)
+
+    def test_primary_after_own_write(self):
+        """Пока жива кука после записи, ленты читаются с default."""
+        database, _ = self.read(
+            'get', reverse('posts:main-view'),
+            HTTP_COOKIE=f'{settings.REPLICA_STICKY_COOKIE}=1')
+        self.assertIsNone(database)
+
+    def test_outside_request_primary(self):
+        self.assertIsNone(ReplicaRouter().db_for_read(Post))
+
+    def test_use_primary(self):
+        request = RequestFactory().get(reverse('posts:main-view'))
+        request.resolver_match = resolve(request.path)
+        routers.use_primary(request)
+        self.assertIsNone(routers.replica_for(request))
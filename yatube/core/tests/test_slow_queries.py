@@ -0,0 +1,71 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core import slow_queries
+from posts.models import Post, User
+
+
+class FingerprintTest(TestCase):
+    def test_literals_and_lists_ignored(self):
+        self.assertEqual(
+            slow_queries.fingerprint(
+                "SELECT * FROM t WHERE id IN (%s, %s) AND name = 'a'"),
+            slow_queries.fingerprint(
+                "SELECT  *  FROM t WHERE id IN (%s) AND name = 'b''c'"),
+        )
+        self.assertNotEqual(
+            slow_queries.fingerprint('SELECT * FROM a WHERE id = 1'),
+            slow_queries.fingerprint('SELECT * FROM b WHERE id = 1'),
+        )
+
+
+class SlowQueryLogTest(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.log = os.path.join(directory, 'slow.jsonl')
+        slow_queries._explained.clear()
+        self.addCleanup(slow_queries._explained.clear)
+        author = User.objects.create(username='slow')
+        Post.objects.create(text='Медленный пост', author=author)
+
+    def test_request_queries_logged_with_plan(self):
+        """Порог 0 пишет все запросы, план снимается раз на отпечаток."""
+        with override_settings(SLOW_QUERY_MS=0, SLOW_QUERY_LOG=self.log):
+            self.client.get(reverse('posts:main-view'))
+            self.client.get(reverse('posts:main-view'))
+        entries = slow_queries.load(self.log)
+        self.assertTrue(entries)
+        self.assertEqual(
+            {entry['view'] for entry in entries}, {'posts:main-view'})
+        planned = [entry['fingerprint'] for entry in entries
+                   if entry['plan'] is not None]
+        self.assertTrue(planned)
+        self.assertEqual(len(planned), len(set(planned)))
+        self.assertTrue(any(
+            'posts/views.py' in frame
+            for entry in entries for frame in entry['stack']))
+
+    def test_fast_queries_skipped(self):
+        with override_settings(SLOW_QUERY_LOG=self.log):
+            self.client.get(reverse('posts:main-view'))
+        self.assertEqual(slow_queries.load(self.log), [])
+
+    def test_report_ranks_by_total_time(self):
+        with override_settings(SLOW_QUERY_MS=0, SLOW_QUERY_LOG=self.log):
+            list(Post.objects.all())
+            list(Post.objects.filter(text__contains='пост'))
+        entries = slow_queries.load(self.log)
+        self.assertEqual(len(entries), 2)
+        stdout = StringIO()
+        call_command('slow_queries', log=self.log, stdout=stdout)
+        output = stdout.getvalue()
+        slowest = max(entries, key=lambda entry: entry['ms'])
+        self.assertTrue(output.startswith(f'1. {slowest["fingerprint"]}'))
+        self.assertIn('план:', output)
@@ -0,0 +1,32 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from core import sqlite
+
+
+class SQLitePragmasTest(TestCase):
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_applied(self):
+        self.assertEqual(self.pragma('busy_timeout'), 5000)
+        # NORMAL = 1, MEMORY = 2
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertEqual(self.pragma('temp_store'), 2)
+        self.assertEqual(self.pragma('cache_size'), -64 * 1024)
+
+    def test_optimize_when_due(self):
+        connection.optimized_at = 0
+        with override_settings(SQLITE_OPTIMIZE_INTERVAL=0):
+            sqlite.optimize_if_due()
+        self.assertGreater(connection.optimized_at, 0)
+
+    def test_optimize_command(self):
+        stdout = StringIO()
+        call_command('optimize_db', analyze=True, stdout=stdout)
+        self.assertIn('ANALYZE', stdout.getvalue())
@@ -0,0 +1,80 @@
+import multiprocessing
+import shutil
+import tempfile
+import time
+
+from django.test import SimpleTestCase
+
+from core.sqlite_cache import SQLiteCache
+
+
+def increment(path, times):
+    cache = SQLiteCache(path, {})
+    for _ in range(times):
+        cache.incr('version')
+
+
+class SQLiteCacheTest(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.path = f'{directory}/cache.sqlite3'
+        self.cache = self.make()
+
+    def make(self, **options):
+        return SQLiteCache(self.path, {'OPTIONS': options})
+
+    def test_shared_between_instances(self):
+        """Запись одного процесса видна другому."""
+        self.cache.set('fragment', {'html': '<p>'})
+        other = self.make()
+        self.assertEqual(other.get('fragment'), {'html': '<p>'})
+        other.delete('fragment')
+        self.assertIsNone(self.cache.get('fragment'))
+
+    def test_expiry_and_add(self):
+        self.cache.set('short', 1, timeout=0.05)
+        self.assertFalse(self.cache.add('short', 2))
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get('short'))
+        self.assertTrue(self.cache.add('short', 3))
+        self.assertEqual(self.cache.get('short'), 3)
+
+    def test_get_many(self):
+        self.cache.set_many({'a': 1, 'b': 2})
+        self.assertEqual(
+            self.cache.get_many(['a', 'b', 'c']), {'a': 1, 'b': 2})
+
+    def test_incr_atomic_across_processes(self):
+        self.cache.set('version', 0, timeout=None)
+        context = multiprocessing.get_context('fork')
+        workers = [
+            context.Process(target=increment, args=(self.path, 50))
+            for _ in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(self.cache.get('version'), 200)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_least_recently_read_evicted(self):
+        cache = self.make(
+            MAX_ENTRIES=10, CULL_EVERY=1, ACCESS_RESOLUTION=0)
+        cache.set('hot', 'x')
+        for index in range(10):
+            cache.set(f'cold{index}', 'x')
+            cache.get('hot')
+        self.assertEqual(cache.get('hot'), 'x')
+        self.assertIsNone(cache.get('cold0'))
+
+    def test_size_cap(self):
+        cache = self.make(MAX_SIZE=10_000, CULL_EVERY=1)
+        for index in range(20):
+            cache.set(f'big{index}', 'x' * 1000)
+        size = cache._db().execute(
+            'SELECT total(size) FROM cache').fetchone()[0]
+        self.assertLessEqual(size, 10_000)
+        self.assertEqual(cache.get('big19'), 'x' * 1000)
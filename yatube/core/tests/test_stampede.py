@@ -0,0 +1,82 @@
+from django.core.cache import cache
+from django.template import Context, Template
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from core import instrumentation, routers, stampede
+
+
+class StampedeTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.computed = 0
+
+    def compute(self):
+        self.computed += 1
+        return f'render {self.computed}'
+
+    def hold_lock(self, slot):
+        cache.add(stampede.LOCK_PREFIX + slot, 1)
+
+    def test_computed_once(self):
+        for _ in range(3):
+            self.assertEqual(
+                stampede.get_or_compute(cache, 'key', self.compute, 60),
+                'render 1')
+        self.assertFalse(cache.has_key(stampede.LOCK_PREFIX + 'key'))
+
+    def test_stale_copy_while_other_recomputes(self):
+        """Пока ведущий считает новую версию, отдаётся прошлая."""
+        stampede.get_or_compute(
+            cache, 'page:v1', self.compute, 60, slot='page')
+        self.hold_lock('page')
+        with instrumentation.collect() as stats:
+            value = stampede.get_or_compute(
+                cache, 'page:v2', self.compute, 60, slot='page')
+        self.assertEqual(value, 'render 1')
+        self.assertEqual(self.computed, 1)
+        self.assertEqual((stats.stale_served, stats.recomputes), (1, 0))
+
+    @override_settings(STAMPEDE_WAIT=0.05)
+    def test_computes_itself_if_leader_too_slow(self):
+        self.hold_lock('cold')
+        self.assertEqual(
+            stampede.get_or_compute(cache, 'cold', self.compute, 60),
+            'render 1')
+
+    @override_settings(STAMPEDE_PROTECTION=False)
+    def test_protection_off(self):
+        stampede.get_or_compute(cache, 'p:v1', self.compute, 60, slot='p')
+        self.hold_lock('p')
+        self.assertEqual(
+            stampede.get_or_compute(
+                cache, 'p:v2', self.compute, 60, slot='p'),
+            'render 2')
+
+    def test_replica_render_not_cached(self):
+        """Собранное по данным реплики не кладётся в кеш."""
+        request = RequestFactory().get('/')
+        request.replica = 'replica1'
+        token = routers.current_request.set(request)
+        try:
+            stampede.get_or_compute(cache, 'replica', self.compute, 60)
+        finally:
+            routers.current_request.reset(token)
+        self.assertFalse(cache.has_key('replica'))
+        self.assertEqual(
+            stampede.get_or_compute(cache, 'replica', self.compute, 60),
+            'render 2')
+
+    def test_template_tag(self):
+        template = Template(
+            '{% load fragment_cache %}'
+            '{% fragment_cache 60 feed page version=version %}'
+            '{{ text }}{% endfragment_cache %}')
+        self.assertEqual(
+            template.render(Context({'page': 1, 'version': 1, 'text': 'a'})),
+            'a')
+        self.assertEqual(
+            template.render(Context({'page': 1, 'version': 1, 'text': 'b'})),
+            'a')
+        self.assertEqual(
+            template.render(Context({'page': 1, 'version': 2, 'text': 'c'})),
+            'c')
@@ -0,0 +1,55 @@
+import time
+
+from django.core.cache import caches
+from django.test import SimpleTestCase
+
+from core import instrumentation
+from core.cache import TieredCache
+
+
+class TieredCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.shared = caches['shared']
+        self.shared.clear()
+        self.cache = TieredCache(f'test-{self.id()}', {'OPTIONS': {
+            'L2': 'shared',
+            'L1_TIMEOUT': 0.2,
+            'L1_BYPASS': ['version:'],
+        }})
+
+    def test_hot_key_served_from_memory(self):
+        self.shared.set('page', '<ul>')
+        with instrumentation.collect() as stats:
+            self.assertEqual(self.cache.get('page'), '<ul>')
+            self.assertEqual(self.cache.get('page'), '<ul>')
+        self.assertEqual((stats.l1_hits, stats.l1_misses), (1, 1))
+        self.assertEqual((stats.cache_hits, stats.cache_misses), (2, 0))
+        self.assertEqual(self.cache.stats()['hits'], 1)
+
+    def test_other_process_change_visible_after_ttl(self):
+        self.cache.set('page', 'old')
+        # Другой процесс пишет мимо нашего L1
+        self.shared.set('page', 'new')
+        self.assertEqual(self.cache.get('page'), 'old')
+        time.sleep(0.25)
+        self.assertEqual(self.cache.get('page'), 'new')
+
+    def test_version_keys_bypass_memory(self):
+        """Сброс версии в другом процессе виден сразу."""
+        self.cache.set('version:index', 1)
+        self.shared.incr('version:index')
+        self.assertEqual(self.cache.get('version:index'), 2)
+        self.assertEqual(
+            self.cache.get_many(['version:index']), {'version:index': 2})
+
+    def test_mutable_values_copied(self):
+        self.cache.set('list', [1])
+        self.cache.get('list').append(2)
+        self.assertEqual(self.cache.get('list'), [1])
+
+    def test_delete_and_incr_drop_local_copy(self):
+        self.cache.set('counter', 1)
+        self.cache.incr('counter')
+        self.assertEqual(self.cache.get('counter'), 2)
+        self.cache.delete('counter')
+        self.assertIsNone(self.cache.get('counter'))
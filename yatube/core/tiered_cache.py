@@ -0,0 +1,206 @@
+"""Двухуровневый кеш: небольшой LRU в памяти процесса перед общим.
+
+Горячие ключи (первая страница ленты, популярные группы) читаются
+из памяти процесса без обращения к файлу и распаковки. Запись в L1
+живёт L1_TIMEOUT секунд, поэтому чужие изменения доходят до процесса
+не позже этого срока. Фрагменты лент ждать не приходится: в их ключ
+входит версия ленты, а сами версии (L1_BYPASS) всегда читаются из
+общего кеша. Сброс версии в любом процессе меняет ключ, и устаревшая
+запись L1 больше не запрашивается, а вытесняется как самая старая.
+"""
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from .instrumentation import record_l1
+
+_MISSING = object()
+# Такие значения отдаются из L1 как есть, остальные копируются
+IMMUTABLE = (str, bytes, int, float, bool, type(None))
+
+
+class LRU:
+    """Общее для потоков процесса хранилище L1."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[1] < time.monotonic():
+                self.misses += 1
+                return _MISSING
+            self.entries.move_to_end(key)
+            self.hits += 1
+        value, _, copied = entry
+        return pickle.loads(value) if copied else value
+
+    def set(self, key, value, ttl):
+        copied = not isinstance(value, IMMUTABLE)
+        if copied:
+            value = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + ttl, copied)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+# Django создаёт бэкенд в каждом потоке, L1 — один на процесс
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+class TwoTierCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.shared_alias = options['L2']
+        self.l1_timeout = options.get('L1_TIMEOUT', 5)
+        self.bypass = tuple(options.get('L1_BYPASS', ()))
+        with _stores_lock:
+            self.l1 = _stores.setdefault(
+                location, LRU(options.get('L1_MAX_ENTRIES', 500)))
+
+    @property
+    def l2(self):
+        return caches[self.shared_alias]
+
+    def _local(self, key, version):
+        if key.startswith(self.bypass):
+            return None
+        return self.make_key(key, version=version)
+
+    def _timeout(self, timeout):
+        # Срок по умолчанию — из настроек этого кеша, а не общего
+        if timeout is DEFAULT_TIMEOUT:
+            return self.default_timeout
+        return timeout
+
+    def _remember(self, key, value, timeout, version):
+        local = self._local(key, version)
+        if local is None:
+            return
+        expires = self.get_backend_timeout(timeout)
+        ttl = self.l1_timeout
+        if expires is not None:
+            ttl = min(ttl, expires - time.time())
+        if ttl > 0:
+            self.l1.set(local, value, ttl)
+        else:
+            self.l1.delete(local)
+
+    def _forget(self, key, version):
+        local = self._local(key, version)
+        if local is not None:
+            self.l1.delete(local)
+
+    def get(self, key, default=None, version=None):
+        local = self._local(key, version)
+        if local is not None:
+            value = self.l1.get(local)
+            if value is not _MISSING:
+                record_l1(1, 0)
+                return value
+            record_l1(0, 1)
+        value = self.l2.get(key, _MISSING, version)
+        if value is _MISSING:
+            return default
+        if local is not None:
+            self.l1.set(local, value, self.l1_timeout)
+        return value
+
+    def get_many(self, keys, version=None):
+        found = {}
+        missing = []
+        lookups = 0
+        for key in keys:
+            local = self._local(key, version)
+            value = _MISSING
+            if local is not None:
+                lookups += 1
+                value = self.l1.get(local)
+            if value is _MISSING:
+                missing.append(key)
+            else:
+                found[key] = value
+        record_l1(len(found), lookups - len(found))
+        if missing:
+            shared = self.l2.get_many(missing, version)
+            for key, value in shared.items():
+                local = self._local(key, version)
+                if local is not None:
+                    self.l1.set(local, value, self.l1_timeout)
+            found.update(shared)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.l2.set(key, value, self._timeout(timeout), version)
+        self._remember(key, value, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.l2.set_many(data, self._timeout(timeout), version)
+        for key, value in data.items():
+            if key not in failed:
+                self._remember(key, value, timeout, version)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.l2.add(key, value, self._timeout(timeout), version)
+        if added:
+            self._remember(key, value, timeout, version)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self._forget(key, version)
+        return self.l2.touch(key, self._timeout(timeout), version)
+
+    def incr(self, key, delta=1, version=None):
+        self._forget(key, version)
+        return self.l2.incr(key, delta, version)
+
+    def has_key(self, key, version=None):
+        local = self._local(key, version)
+        if local is not None and self.l1.get(local) is not _MISSING:
+            return True
+        return self.l2.has_key(key, version)
+
+    def delete(self, key, version=None):
+        self._forget(key, version)
+        return self.l2.delete(key, version)
+
+    def delete_many(self, keys, version=None):
+        keys = list(keys)
+        for key in keys:
+            self._forget(key, version)
+        self.l2.delete_many(keys, version)
+
+    def stats(self):
+        """Попадания и промахи L1 этого процесса."""
+        return {
+            'hits': self.l1.hits,
+            'misses': self.l1.misses,
+            'entries': len(self.l1.entries),
+        }
+
+    def clear(self):
+        # Очищает L1 только этого процесса
+        self.l1.clear()
+        self.l2.clear()
@@ -1,5 +1,11 @@
+import hmac
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
 from django.shortcuts import render
 
+from . import metrics as core_metrics
+
 
 def page_not_found(request, exception):
     return render(request, 'core/404.html', {'path': request.path}, status=404)
@@ -15,3 +21,23 @@ def permission_denied(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+def metrics_allowed(request):
+    # С loopback приходит и всё, что проксирует nginx, поэтому одного
+    # адреса мало: нужен ещё токен сборщика
+    token = settings.METRICS_TOKEN
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+    return (
+        bool(token)
+        and request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS
+        and hmac.compare_digest(authorization, f'Bearer {token}')
+    )
+
+
+def metrics(request):
+    # Эндпоинт внутренний: для остальных его как будто нет
+    if not metrics_allowed(request):
+        raise Http404
+    return HttpResponse(
+        core_metrics.render(), content_type='text/plain; version=0.0.4')
@@ -1,5 +1,7 @@
 from django.contrib import admin
+from django.db.models.expressions import RawSQL
 
+from . import search
 from .models import Comment, Follow, Group, Post
 
 
@@ -23,6 +25,16 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        # Ищем по полнотекстовому индексу вместо LIKE '%...%'
+        if not search_term or not search.is_available():
+            return super().get_search_results(
+                request, queryset, search_term)
+        if not search.match_expression(search_term):
+            return queryset.none(), False
+        return queryset.filter(
+            pk__in=RawSQL(*search.matching_ids(search_term))), False
+
 
 class CommentAdmin(admin.ModelAdmin):
     # Перечисляем поля, которые должны отображаться в админке
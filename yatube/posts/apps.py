@@ -1,14 +1,33 @@
 from django.apps import AppConfig
-from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models.signals import post_migrate
 
-from yatube.settings import POSTS_ON_PAGE
+from yatube.settings import COMMENTS_ON_PAGE, POSTS_ON_PAGE
+from .paginator import CursorPaginator
 
 
 class PostsConfig(AppConfig):
     name = 'posts'
 
+    def ready(self):
+        from . import signals  # noqa: F401
+        post_migrate.connect(install_search, sender=self)
 
-def get_paginator(queryset, request):
-    paginator = Paginator(queryset, POSTS_ON_PAGE)
-    page_number = request.GET.get('page')
-    return paginator.get_page(page_number)
+
+def install_search(sender, using, **kwargs):
+    from .search import install
+
+    install(connections[using])
+
+
+def get_paginator(queryset, request, **kwargs):
+    paginator = CursorPaginator(queryset, POSTS_ON_PAGE, **kwargs)
+    return paginator.get_page(
+        number=request.GET.get('page'),
+        cursor=request.GET.get('cursor'),
+    )
+
+
+def get_comments_page(queryset, cursor=None):
+    """Страница комментариев по курсору, без COUNT(*) и OFFSET."""
+    return CursorPaginator(queryset, COMMENTS_ON_PAGE).get_page(cursor=cursor)
@@ -0,0 +1,54 @@
+"""Кеш отрендеренных карточек постов.
+
+Одна и та же карточка (автор, картинка, текст, ссылки) показывается
+в главной ленте, ленте группы, профиле и подписках. Она рендерится
+один раз и хранится в кеше под ключом из id поста и версий поста,
+его автора и группы; ленты собирают страницу одним get_many.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from core.routers import read_from_replica
+
+from . import feed_cache
+
+TEMPLATE = 'posts/includes/post_card.html'
+PREFIX = 'post-card'
+
+
+def _names(post):
+    names = [feed_cache.post(post.pk), feed_cache.user(post.author_id)]
+    if post.group_id is not None:
+        names.append(feed_cache.group_info(post.group_id))
+    return names
+
+
+def _key(post, current):
+    version = '.'.join(str(current[name]) for name in _names(post))
+    return f'{PREFIX}:{post.pk}:{version}'
+
+
+def render_card(post):
+    return render_to_string(TEMPLATE, {'post': post})
+
+
+def render_cards(posts):
+    """Карточки постов страницы, недостающие рендерятся и кладутся в кеш."""
+    posts = list(posts)
+    current = feed_cache.versions(
+        {name for post in posts for name in _names(post)}
+    )
+    keys = [_key(post, current) for post in posts]
+    found = cache.get_many(keys)
+    missing = {}
+    cards = []
+    for post, key in zip(posts, keys):
+        card = found.get(key)
+        if card is None:
+            card = missing[key] = render_card(post)
+        cards.append(mark_safe(card))
+    if missing and not read_from_replica():
+        cache.set_many(missing, timeout=settings.FEED_CACHE_TIMEOUT)
+    return cards
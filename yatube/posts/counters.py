@@ -0,0 +1,80 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from . import timeline
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+BATCH_SIZE = 500
+
+
+def change(model, pk, field, delta):
+    """Атомарно сдвигает счётчик без чтения строки."""
+    if pk is None:
+        return
+    rows = model.objects.filter(pk=pk)
+    if delta < 0:
+        rows = rows.filter(**{f'{field}__gte': -delta})
+    rows.update(**{field: F(field) + delta})
+
+
+def user_stats(user):
+    """Счётчики пользователя; недостающая строка пересчитывается."""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        stats, _ = UserStats.objects.get_or_create(
+            user=user,
+            defaults={
+                'posts_count': user.posts.count(),
+                'followers_count': user.following.count(),
+                'following_count': user.follower.count(),
+            },
+        )
+        return stats
+
+
+def _count(model, field):
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')}).order_by().values(
+            field).annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+# (модель, поле счётчика, модель-источник, внешний ключ источника)
+COUNTERS = (
+    (UserStats, 'posts_count', Post, 'author'),
+    (UserStats, 'followers_count', Follow, 'author'),
+    (UserStats, 'following_count', Follow, 'user'),
+    (Post, 'comments_count', Comment, 'post'),
+    (Group, 'posts_count', Post, 'group'),
+)
+
+
+def recount():
+    """Исправляет расхождения счётчиков с COUNT(*).
+
+    Возвращает число исправленных строк для каждого счётчика.
+    """
+    UserStats.objects.bulk_create(
+        (UserStats(user_id=pk) for pk in User.objects.filter(
+            stats__isnull=True).values_list('pk', flat=True)),
+        batch_size=BATCH_SIZE,
+    )
+    fixed = {}
+    followers = {}
+    for model, field, source, key in COUNTERS:
+        actual = _count(source, key)
+        drifted = dict(model.objects.annotate(actual=actual).exclude(
+            **{field: F('actual')}).values_list('pk', field))
+        pks = list(drifted)
+        for start in range(0, len(pks), BATCH_SIZE):
+            model.objects.filter(
+                pk__in=pks[start:start + BATCH_SIZE]
+            ).update(**{field: actual})
+        fixed[f'{model.__name__}.{field}'] = len(drifted)
+        if (model, field) == (UserStats, 'followers_count'):
+            followers = drifted
+    # Исправленный счётчик подписчиков мог перейти порог раскладки
+    for author_id, was in followers.items():
+        timeline.demote(author_id, was)
+    return fixed
@@ -0,0 +1,141 @@
+"""Версии фрагментов кеша лент.
+
+Шаблоны лент кешируются надолго, а в ключ ``{% cache %}`` входит
+версия ленты. Сигналы увеличивают версию при изменении того, что
+показывается в ленте, и следующий запрос строит фрагмент заново;
+остальные страницы остаются в кеше.
+
+Версии, прочитанные внутри ``collect()``, запоминаются: по ним кеш
+страниц (posts.page_cache) узнаёт, что страница устарела.
+"""
+import contextvars
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+PREFIX = 'feed-version'
+# Версия, которая входит в ключ каждой ленты: её сбрасывают только
+# массовые правки в обход сигналов (seed_yatube). Переименование автора
+# или группы сбрасывает ленты, где есть их посты (posts.signals)
+GLOBAL = ('all',)
+# Версии, прочитанные в текущем collect()
+_collected = contextvars.ContextVar('feed_versions', default=None)
+
+
+def _key(name):
+    return f'{PREFIX}:{name}'
+
+
+def _initial():
+    # После вытеснения версия не должна начаться заново с уже
+    # использованного значения, поэтому стартуем от текущего времени
+    return time.time_ns() // 1000
+
+
+def versions(names):
+    """Текущие версии по именам, одним обращением к кешу."""
+    keys = {name: _key(name) for name in names}
+    found = cache.get_many(keys.values())
+    missing = {
+        key: _initial() for key in keys.values() if key not in found
+    }
+    if missing:
+        cache.set_many(missing, timeout=None)
+        found.update(missing)
+    current = {name: found[key] for name, key in keys.items()}
+    collected = _collected.get()
+    if collected is not None:
+        collected.update(current)
+    return current
+
+
+@contextmanager
+def collect():
+    """Собирает версии, прочитанные внутри блока: {имя: версия}."""
+    found = {}
+    token = _collected.set(found)
+    try:
+        yield found
+    finally:
+        _collected.reset(token)
+
+
+def depends(*names):
+    """Отмечает версии, от которых страница зависит вне фрагментов."""
+    versions(GLOBAL + names)
+
+
+def version(*names):
+    """Строка версий для ключа фрагмента."""
+    current = versions(GLOBAL + names)
+    return '.'.join(str(current[name]) for name in GLOBAL + names)
+
+
+def _bump(names):
+    for name in names:
+        try:
+            cache.incr(_key(name))
+        except ValueError:
+            cache.set(_key(name), _initial(), timeout=None)
+
+
+def bump(*names):
+    """Инвалидирует фрагменты, в ключ которых входят эти версии.
+
+    Внутри транзакции версия меняется ещё раз после COMMIT: фрагмент,
+    собранный параллельным запросом по старым данным, не переживёт её.
+    """
+    if not names:
+        return
+    _bump(names)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: _bump(names))
+
+
+def context(*names):
+    """Переменные шаблона для {% cache cache_timeout ... cache_version %}."""
+    return {
+        'cache_timeout': settings.FEED_CACHE_TIMEOUT,
+        'cache_version': version(*names),
+    }
+
+
+def index():
+    return 'index'
+
+
+def group(group_id):
+    return f'group:{group_id}'
+
+
+def author(author_id):
+    return f'author:{author_id}'
+
+
+def follow(user_id):
+    return f'follow:{user_id}'
+
+
+def follows(user_id):
+    # Счётчики подписчиков и подписок в профиле
+    return f'follows:{user_id}'
+
+
+def comments(post_id):
+    return f'comments:{post_id}'
+
+
+# Версии карточки поста: сам пост, подпись автора и ссылка на группу
+def post(post_id):
+    return f'post:{post_id}'
+
+
+def user(user_id):
+    return f'user:{user_id}'
+
+
+def group_info(group_id):
+    return f'group-info:{group_id}'
@@ -0,0 +1,98 @@
+"""Персональные вставки в общие страницы (hole punching).
+
+Шапка, вкладки лент, кнопка подписки, кнопка правки и форма
+комментария зависят от посетителя. Тег ``{% hole %}`` обычно рисует
+их на месте, но внутри ``shared()`` оставляет метку. Страница с
+метками одна на всех и хранится в кеше страниц, а метки заменяются
+вставками текущего посетителя в конце ответа (``fill``).
+
+Вставка регистрируется с шаблоном и функцией, которая по запросу и
+аргументам метки досчитывает контекст, обычно приходящий из
+представления.
+"""
+import contextvars
+import re
+from contextlib import contextmanager
+from urllib.parse import parse_qsl, urlencode
+
+from django.template.loader import render_to_string
+
+from .forms import CommentForm
+from .models import Follow
+
+MARK = re.compile(rb'<!--hole:(\w+)\?([^>]*)-->')
+HOLES = {}
+_shared = contextvars.ContextVar('holes_shared', default=False)
+
+
+def hole(name, template):
+    """Регистрирует вставку: функция получает request и аргументы."""
+    def register(func):
+        HOLES[name] = (template, func)
+        return func
+    return register
+
+
+@contextmanager
+def shared():
+    """Внутри блока персональные вставки заменяются метками."""
+    token = _shared.set(True)
+    try:
+        yield
+    finally:
+        _shared.reset(token)
+
+
+def is_shared():
+    return _shared.get()
+
+
+def mark(name, arguments):
+    return f'<!--hole:{name}?{urlencode(arguments)}-->'
+
+
+def template(name):
+    return HOLES[name][0]
+
+
+def render(request, name, arguments):
+    template_name, func = HOLES[name]
+    context = {**arguments, **func(request, **arguments)}
+    return render_to_string(template_name, context, request)
+
+
+def fill(request, content):
+    """Подставляет вставки текущего посетителя вместо меток."""
+    def replace(match):
+        name = match.group(1).decode()
+        arguments = dict(parse_qsl(match.group(2).decode()))
+        return render(request, name, arguments).encode()
+    return MARK.sub(replace, content)
+
+
+@hole('header', 'includes/header.html')
+def header(request):
+    return {}
+
+
+@hole('switcher', 'includes/switcher.html')
+def switcher(request):
+    return {}
+
+
+@hole('follow', 'posts/includes/follow_button.html')
+def follow_button(request, author, author_id):
+    following = request.user.is_authenticated and Follow.objects.filter(
+        user=request.user, author_id=author_id).exists()
+    return {'following': following}
+
+
+@hole('post_edit', 'posts/includes/post_edit_button.html')
+def post_edit_button(request, post_id, author_id):
+    # Аргументы метки приходят строками
+    return {'author_id': int(author_id)}
+
+
+@hole('comment_form', 'posts/includes/comment_form.html')
+def comment_form(request, post_id):
+    return {'form': CommentForm()}
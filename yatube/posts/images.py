@@ -0,0 +1,116 @@
+"""Заранее подготовленные варианты картинок постов.
+
+После загрузки картинки пост ставится в очередь ImageJob, а фоновый
+обработчик (``manage.py image_worker``) нарезает фиксированный набор
+размеров в JPEG и, если Pillow собран с libwebp, в WebP. Имена готовых
+файлов хранятся в ``Post.image_variants``, и шаблоны строят ``srcset``
+без обращения к Pillow. Пока варианты не готовы, показывается
+загруженный файл.
+"""
+import json
+import logging
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps, features
+
+from .models import ImageJob, Post
+
+logger = logging.getLogger(__name__)
+
+# Размеры повторяют пропорции карточки 960x339
+SIZES = ((960, 339), (640, 226), (320, 113))
+QUALITY = 85
+
+
+def formats():
+    """Пары (расширение, формат Pillow); WebP идёт первым."""
+    if features.check('webp'):
+        return (('webp', 'WEBP'), ('jpg', 'JPEG'))
+    return (('jpg', 'JPEG'),)
+
+
+def variant_name(image_name, width, height, ext):
+    stem = os.path.splitext(image_name)[0]
+    return f'variants/{stem}/{width}x{height}.{ext}'
+
+
+def enqueue(post):
+    """Ставит в очередь пост с картинкой, для которой нет вариантов."""
+    if post.image and not post.image_variants:
+        ImageJob.objects.update_or_create(
+            post=post, defaults={'image': post.image.name})
+
+
+def generate(image):
+    """Нарезает варианты картинки и возвращает их имена по форматам."""
+    with image.open('rb') as file:
+        source = ImageOps.exif_transpose(Image.open(file)).convert('RGB')
+    variants = {}
+    for width, height in SIZES:
+        # Обрезка по центру с увеличением, как crop="center" upscale=True
+        resized = ImageOps.fit(
+            source, (width, height), Image.LANCZOS, centering=(0.5, 0.5)
+        )
+        for ext, image_format in formats():
+            buffer = BytesIO()
+            resized.save(buffer, image_format, quality=QUALITY)
+            name = variant_name(image.name, width, height, ext)
+            default_storage.delete(name)
+            name = default_storage.save(name, ContentFile(buffer.getvalue()))
+            variants.setdefault(ext, []).append([name, width, height])
+    return variants
+
+
+def process(post):
+    """Готовит варианты для поста; False, если картинку уже сменили."""
+    image_name = post.image.name
+    try:
+        variants = generate(post.image)
+    except (OSError, ValueError) as error:
+        # Битый или пропавший файл: повторять бесполезно
+        logger.warning('Не удалось нарезать %s: %s', image_name, error)
+        return False
+    with transaction.atomic():
+        current = Post.objects.select_for_update().filter(
+            pk=post.pk).values_list('image', flat=True).first()
+        if current != image_name:
+            return False
+        post.image_variants = json.dumps(variants)
+        # save(), а не update(): сигналы сбрасывают кеш карточек и лент
+        post.save(update_fields=['image_variants'])
+    return True
+
+
+def run_jobs(limit):
+    """Обрабатывает до limit задач из очереди, возвращает их число."""
+    jobs = list(ImageJob.objects.select_related('post')[:limit])
+    for job in jobs:
+        process(job.post)
+        # Картинку сменили во время нарезки: задача уже про новую
+        ImageJob.objects.filter(pk=job.pk, image=job.image).delete()
+    return len(jobs)
+
+
+def srcset(post):
+    """Данные для <picture>: src по умолчанию и srcset по форматам."""
+    if not post.image_variants:
+        return None
+    variants = json.loads(post.image_variants)
+    sets = {
+        ext: ', '.join(
+            f'{default_storage.url(name)} {width}w'
+            for name, width, _ in items
+        )
+        for ext, items in variants.items()
+    }
+    name, width, height = variants['jpg'][0]
+    return {
+        'src': default_storage.url(name),
+        'width': width,
+        'height': height,
+        **sets,
+    }
@@ -0,0 +1,240 @@
+"""Нагрузочный прогон маршрутов posts по HTTP.
+
+Виртуальные пользователи работают в потоках, каждый со своей сессией
+requests, и выбирают маршрут по весам сценария. Итог — задержки
+p50/p95/p99 и пропускная способность по каждому маршруту; сравнение
+с сохранённым прогоном показывает регрессии.
+"""
+import random
+import re
+import statistics
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from urllib.parse import urlsplit
+
+import requests
+from django.core.management.base import CommandError
+from django.urls import reverse
+
+# Веса маршрутов в сценариях
+SCENARIOS = {
+    'read': {
+        'main-view': 30, 'group_list': 15, 'profile': 20,
+        'post_detail': 25, 'follow_index': 10,
+    },
+    'mixed': {
+        'main-view': 25, 'group_list': 12, 'profile': 15,
+        'post_detail': 20, 'follow_index': 13,
+        'post_create': 5, 'add_comment': 10,
+    },
+    'write': {'post_create': 50, 'add_comment': 50},
+}
+# Маршруты записи: без входа они не работают
+WRITE_ROUTES = {'post_create', 'add_comment'}
+METRICS = ('p50', 'p95', 'p99')
+CSRF_FIELD = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+
+
+def build_request(route, targets, rng, username=None):
+    """(метод, путь, данные формы, ожидаемый редирект) для маршрута.
+
+    Запись удалась, только если сервер перенаправил туда же, куда
+    представление после сохранения: на профиль автора или на пост.
+    """
+    if route == 'main-view':
+        return 'GET', reverse('posts:main-view'), None, None
+    if route == 'group_list':
+        slug = rng.choice(targets['groups'])
+        return 'GET', reverse('posts:group_list', args=[slug]), None, None
+    if route == 'profile':
+        username = rng.choice(targets['usernames'])
+        return 'GET', reverse('posts:profile', args=[username]), None, None
+    if route == 'post_detail':
+        post_id = rng.choice(targets['posts'])
+        return (
+            'GET', reverse('posts:post_detail', args=[post_id]), None, None)
+    if route == 'follow_index':
+        return 'GET', reverse('posts:follow_index'), None, None
+    if route == 'post_create':
+        return 'POST', reverse('posts:post_create'), {
+            'text': f'Нагрузочный пост {rng.random()}',
+        }, reverse('posts:profile', args=[username])
+    if route == 'add_comment':
+        post_id = rng.choice(targets['posts'])
+        return 'POST', reverse('posts:add_comment', args=[post_id]), {
+            'text': f'Нагрузочный комментарий {rng.random()}',
+        }, reverse('posts:post_detail', args=[post_id])
+    raise ValueError(f'Неизвестный маршрут: {route}')
+
+
+def login(session, base_url, username, password):
+    """Входит через форму входа; без входа остаются публичные страницы."""
+    url = base_url + reverse('users:login')
+    page = session.get(url)
+    token = CSRF_FIELD.search(page.text)
+    if token is None:
+        return False
+    response = session.post(url, data={
+        'username': username,
+        'password': password,
+        'csrfmiddlewaretoken': token.group(1),
+    }, headers={'Referer': url}, allow_redirects=False)
+    return response.status_code == 302
+
+
+def succeeded(response, expected):
+    if expected is None:
+        return response.status_code < 400
+    return (
+        response.status_code == 302
+        and urlsplit(response.headers.get('Location', '')).path == expected
+    )
+
+
+class Worker(threading.Thread):
+    def __init__(self, run, number, session, username):
+        super().__init__(daemon=True)
+        self.run_state = run
+        self.rng = random.Random(f'{run.seed}:{number}')
+        self.session = session
+        self.username = username
+        self.samples = []
+
+    def run(self):
+        state = self.run_state
+        session = self.session
+        routes, weights = zip(*state.weights.items())
+        while state.take():
+            route = self.rng.choices(routes, weights)[0]
+            method, path, data, expected = build_request(
+                route, state.targets, self.rng, self.username)
+            if data is not None:
+                data['csrfmiddlewaretoken'] = session.cookies.get(
+                    'csrftoken', '')
+            started = time.perf_counter()
+            try:
+                response = session.request(
+                    method, state.base_url + path, data=data,
+                    headers={'Referer': state.base_url + path},
+                    allow_redirects=False, timeout=state.timeout,
+                )
+                ok = succeeded(response, expected)
+            except requests.RequestException:
+                ok = False
+            self.samples.append(
+                (route, time.perf_counter() - started, ok))
+
+
+class LoadRun:
+    """Общее состояние прогона: ограничение по времени и числу запросов."""
+
+    def __init__(self, base_url, weights, targets, duration, total,
+                 seed=0, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.weights = weights
+        self.targets = targets
+        self.deadline = None
+        self.duration = duration
+        self.left = total
+        self.seed = seed
+        self.timeout = timeout
+        self.lock = threading.Lock()
+
+    def take(self):
+        if time.monotonic() >= self.deadline:
+            return False
+        if self.left is None:
+            return True
+        with self.lock:
+            if self.left <= 0:
+                return False
+            self.left -= 1
+            return True
+
+    def session(self, account, writes):
+        """Сессия потока; запись без входа считала бы одни ошибки."""
+        session = requests.Session()
+        if account is None:
+            if writes:
+                raise CommandError(
+                    'Сценарию с записью нужны пользователи, см. seed_yatube')
+            return session
+        if not login(session, self.base_url, *account) and writes:
+            raise CommandError(f'Не удалось войти как {account[0]}')
+        return session
+
+    def execute(self, concurrency, accounts=()):
+        writes = bool(WRITE_ROUTES & set(self.weights))
+        workers = []
+        for number in range(concurrency):
+            account = accounts[number % len(accounts)] if accounts else None
+            workers.append(Worker(
+                self, number, self.session(account, writes),
+                account[0] if account else None))
+        self.deadline = time.monotonic() + self.duration
+        started = time.monotonic()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        elapsed = time.monotonic() - started
+        samples = [sample for worker in workers for sample in worker.samples]
+        return summarize(samples, elapsed)
+
+
+def percentiles(timings):
+    if len(timings) == 1:
+        return dict.fromkeys(METRICS, timings[0])
+    cuts = statistics.quantiles(timings, n=100, method='inclusive')
+    return {'p50': cuts[49], 'p95': cuts[94], 'p99': cuts[98]}
+
+
+def summarize(samples, elapsed):
+    """Сводка по маршрутам: задержки в мс, ошибки, запросы в секунду."""
+    by_route = defaultdict(list)
+    errors = defaultdict(int)
+    for route, seconds, ok in samples:
+        by_route[route].append(seconds * 1000)
+        if not ok:
+            errors[route] += 1
+    by_route['total'] = [seconds * 1000 for _, seconds, _ in samples]
+    errors['total'] = sum(errors.values())
+    routes = {}
+    for route, timings in sorted(by_route.items()):
+        if not timings:
+            continue
+        routes[route] = {
+            'requests': len(timings),
+            'errors': errors[route],
+            'rps': round(len(timings) / elapsed, 2),
+            **{name: round(value, 2)
+               for name, value in percentiles(timings).items()},
+        }
+    return {
+        'finished': datetime.now().isoformat(timespec='seconds'),
+        'elapsed': round(elapsed, 2),
+        'routes': routes,
+    }
+
+
+def compare(current, baseline, threshold):
+    """Регрессии относительно прошлого прогона.
+
+    Задержка считается регрессией, если выросла больше чем
+    в 1 + threshold раз, пропускная способность — если во столько же
+    раз упала.
+    """
+    regressions = []
+    for route, now in current['routes'].items():
+        before = baseline.get('routes', {}).get(route)
+        if before is None:
+            continue
+        for metric in METRICS:
+            if now[metric] > before[metric] * (1 + threshold):
+                regressions.append(
+                    (route, metric, before[metric], now[metric]))
+        if now['rps'] * (1 + threshold) < before['rps']:
+            regressions.append((route, 'rps', before['rps'], now['rps']))
+    return regressions
@@ -0,0 +1,72 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.db import transaction
+
+from posts.models import Post, User
+from posts.paginator import NEXT, CursorPaginator, encode_cursor
+from yatube.settings import POSTS_ON_PAGE
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает стоимость первой и глубокой страницы ленты '
+        'для OFFSET-пагинатора и пагинатора по курсору'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1_000_000)
+        parser.add_argument('--page', type=int, default=10_000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--batch', type=int, default=5000)
+        parser.add_argument(
+            '--keep', action='store_true',
+            help='Не откатывать созданные посты после замера',
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.seed(options['posts'], options['batch'])
+            self.measure(options['page'], options['repeat'])
+            if not options['keep']:
+                transaction.set_rollback(True)
+
+    def seed(self, total, batch):
+        missing = total - Post.objects.count()
+        if missing <= 0:
+            return
+        author, _ = User.objects.get_or_create(username='bench_author')
+        self.stdout.write(f'Создаём {missing} постов...')
+        while missing > 0:
+            size = min(batch, missing)
+            Post.objects.bulk_create(
+                Post(author=author, text='bench') for _ in range(size)
+            )
+            missing -= size
+
+    def measure(self, page, repeat):
+        queryset = Post.objects.all()
+        offset = (page - 1) * POSTS_ON_PAGE - 1
+        anchor = CursorPaginator(queryset, POSTS_ON_PAGE).object_list[offset]
+        cursor = encode_cursor(NEXT, anchor.pub_date, anchor.pk, page)
+        cases = {
+            'offset, страница 1': lambda: Paginator(
+                queryset, POSTS_ON_PAGE).get_page(1),
+            f'offset, страница {page}': lambda: Paginator(
+                queryset, POSTS_ON_PAGE).get_page(page),
+            'cursor, страница 1': lambda: CursorPaginator(
+                queryset, POSTS_ON_PAGE).get_page(),
+            f'cursor, страница {page}': lambda: CursorPaginator(
+                queryset, POSTS_ON_PAGE).get_page(cursor=cursor),
+        }
+        for name, get_page in cases.items():
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                list(get_page())
+                timings.append(time.perf_counter() - start)
+            self.stdout.write(
+                f'{name:<28} {statistics.median(timings) * 1000:9.2f} мс'
+            )
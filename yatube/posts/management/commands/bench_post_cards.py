@@ -0,0 +1,64 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import feed_cache
+from posts.cards import render_card, render_cards
+from posts.models import Post, User
+from yatube.settings import POSTS_ON_PAGE
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает время рендера карточек одной страницы ленты '
+        'без кеша, с холодным и с тёплым кешем карточек'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.seed()
+            posts = self.measure(options['repeat'])
+            transaction.set_rollback(True)
+        # id откатанных постов достанутся новым постам: их карточки
+        # из кеша использоваться не должны
+        feed_cache.bump(*(feed_cache.post(post.pk) for post in posts))
+
+    def seed(self):
+        missing = POSTS_ON_PAGE - Post.objects.count()
+        if missing <= 0:
+            return
+        author, _ = User.objects.get_or_create(username='bench_author')
+        Post.objects.bulk_create(
+            Post(author=author, text='bench') for _ in range(missing)
+        )
+
+    def measure(self, repeat):
+        posts = list(
+            Post.objects.select_related('author', 'group')[:POSTS_ON_PAGE]
+        )
+
+        def cold():
+            feed_cache.bump(*(feed_cache.post(post.pk) for post in posts))
+            return render_cards(posts)
+
+        cases = {
+            'без кеша карточек': lambda: [render_card(p) for p in posts],
+            'кеш, холодный': cold,
+            'кеш, тёплый': lambda: render_cards(posts),
+        }
+        render_cards(posts)
+        for name, render in cases.items():
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                render()
+                timings.append(time.perf_counter() - start)
+            self.stdout.write(
+                f'{name:<20} {statistics.median(timings) * 1000:9.2f} мс'
+            )
+        return posts
@@ -0,0 +1,72 @@
+import statistics
+import threading
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from core import instrumentation
+from posts import feed_cache
+
+
+class Command(BaseCommand):
+    help = (
+        'Одновременно открывает главную страницу сразу после сброса '
+        'её фрагмента и считает пересчёты и запросы к базе с защитой '
+        'от лавины промахов и без неё'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=200)
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f'{"защита":<8}{"сброс":<10}{"пересчётов":>11}'
+            f'{"устаревших":>11}{"SQL":>7}{"p50, мс":>9}{"p95, мс":>9}')
+        for protection in (False, True):
+            for expiry in ('версия', 'холодный'):
+                # Под 200 потоками почти каждый запрос попал бы в журнал
+                with override_settings(
+                        STAMPEDE_PROTECTION=protection, SLOW_QUERY_MS=None):
+                    row = self.run(options['clients'], expiry)
+                self.stdout.write(
+                    f'{"да" if protection else "нет":<8}{expiry:<10}'
+                    f'{row[0]:>11}{row[1]:>11}{row[2]:>7}'
+                    f'{row[3]:>9.1f}{row[4]:>9.1f}')
+
+    def run(self, clients, expiry):
+        url = reverse('posts:main-view')
+        # Прогрев: фрагмент и его прошлая копия уже в кеше
+        Client().get(url)
+        if expiry == 'версия':
+            feed_cache.bump(feed_cache.index())
+        else:
+            cache.clear()
+        barrier = threading.Barrier(clients)
+        results = []
+
+        def request():
+            client = Client()
+            barrier.wait()
+            started = time.perf_counter()
+            with instrumentation.collect() as stats:
+                client.get(url)
+            results.append((stats, time.perf_counter() - started))
+            connection.close()
+
+        threads = [threading.Thread(target=request) for _ in range(clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        timings = sorted(seconds * 1000 for _, seconds in results)
+        return (
+            sum(stats.recomputes for stats, _ in results),
+            sum(stats.stale_served for stats, _ in results),
+            sum(stats.queries for stats, _ in results),
+            statistics.median(timings),
+            timings[int(len(timings) * 0.95) - 1],
+        )
@@ -0,0 +1,76 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from posts import timeline
+from posts.models import Comment, Follow, Post, TimelineEntry, User
+from posts.paginator import NEXT, CursorPaginator
+from yatube.settings import POSTS_ON_PAGE
+
+# Признаки полного просмотра таблицы или сортировки во временном дереве
+FULL_SCAN = re.compile(
+    r'\bSCAN (TABLE )?\w+( \(.*\))?$|USE TEMP B-TREE|Seq Scan'
+)
+# Слияние ленты с постами популярных авторов сортируется по определению
+MERGED_FEED = 'follow_index с популярными авторами'
+
+
+def feed_pages(name, queryset, **kwargs):
+    paginator = CursorPaginator(queryset, POSTS_ON_PAGE, **kwargs)
+    limit = POSTS_ON_PAGE + 1
+    keyset = paginator.keyset_queryset(NEXT, timezone.now(), 1)
+    return {
+        f'{name}: первая страница': paginator.object_list[:limit],
+        f'{name}: страница по курсору': keyset[:limit],
+    }
+
+
+def feed_queries():
+    """Запросы, которые выполняют представления posts."""
+    user = User(pk=1)
+    queries = {}
+    queries.update(feed_pages('index', Post.objects.all()))
+    queries.update(feed_pages('group_posts', Post.objects.filter(group_id=1)))
+    queries.update(feed_pages('profile', Post.objects.filter(author=user)))
+    queries.update(feed_pages(
+        'follow_index', timeline.timeline_entries(user), key='post_id'))
+    queries.update(feed_pages(
+        MERGED_FEED, timeline.merged_feed(user, [2])))
+    queries.update({
+        'profile: подписан ли читатель': Follow.objects.filter(
+            author=user, user_id=2)[:1],
+        'post_detail: комментарии': Comment.objects.filter(post_id=1),
+        'fan-out: подписчики автора': Follow.objects.filter(
+            author=user).values_list('user_id', flat=True),
+        'unfollow: записи автора в ленте': TimelineEntry.objects.filter(
+            user=user, author_id=2),
+    })
+    return queries
+
+
+class Command(BaseCommand):
+    help = 'Печатает план выполнения для каждого запроса лент'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--strict', action='store_true',
+            help='Завершиться с ошибкой, если есть полный просмотр таблицы',
+        )
+
+    def handle(self, *args, **options):
+        regressions = []
+        for name, queryset in feed_queries().items():
+            plan = queryset.explain()
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            for line in plan.splitlines():
+                if FULL_SCAN.search(line):
+                    if not name.startswith(MERGED_FEED):
+                        regressions.append(name)
+                    line = self.style.ERROR(line)
+                self.stdout.write(f'  {line}')
+        if regressions and options['strict']:
+            raise CommandError(
+                'Полный просмотр таблицы: ' + ', '.join(sorted(
+                    set(regressions)))
+            )
@@ -0,0 +1,117 @@
+import json
+import random
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import loadtest
+from posts.models import Group, Post, User
+
+# Сколько значений каждого вида брать из базы для адресов запросов
+SAMPLE = 1000
+
+
+def sample_ids(queryset, rng):
+    """Случайные id без ORDER BY RANDOM() по всей таблице."""
+    ids = queryset.values_list('pk', flat=True)
+    first, last = ids.order_by('pk').first(), ids.order_by('-pk').first()
+    if first is None:
+        return []
+    picked = {rng.randint(first, last) for _ in range(SAMPLE)}
+    return list(ids.filter(pk__in=picked)) or [first]
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный прогон маршрутов posts против запущенного сервера '
+        'с отчётом p50/p95/p99 и сравнением с прошлым прогоном'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000')
+        parser.add_argument(
+            '--scenario', choices=sorted(loadtest.SCENARIOS),
+            default='read')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument(
+            '--duration', type=float, default=30,
+            help='Длительность прогона в секундах')
+        parser.add_argument(
+            '--requests', type=int,
+            help='Остановиться после этого числа запросов')
+        parser.add_argument(
+            '--username-prefix', default='seed',
+            help='Пользователи для входа, см. seed_yatube')
+        parser.add_argument('--password', default='yatube-seed')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Сохранить результат в JSON')
+        parser.add_argument(
+            '--baseline', help='JSON прошлого прогона для сравнения')
+        parser.add_argument(
+            '--threshold', type=float, default=0.2,
+            help='Допустимое ухудшение метрик, доля')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        targets = self.targets(rng)
+        accounts = [
+            (username, options['password'])
+            for username in User.objects.filter(
+                username__startswith=options['username_prefix']
+            ).values_list('username', flat=True)[:options['concurrency']]
+        ]
+        run = loadtest.LoadRun(
+            options['url'], loadtest.SCENARIOS[options['scenario']],
+            targets, options['duration'], options['requests'],
+            seed=options['seed'],
+        )
+        result = run.execute(options['concurrency'], accounts)
+        result.update({
+            'url': options['url'],
+            'scenario': options['scenario'],
+            'concurrency': options['concurrency'],
+        })
+        self.report(result)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(result, file, ensure_ascii=False, indent=2)
+        if options['baseline']:
+            with open(options['baseline']) as file:
+                baseline = json.load(file)
+            for key in ('scenario', 'concurrency'):
+                if baseline.get(key) != result[key]:
+                    raise CommandError(
+                        f'Прошлый прогон с другим {key}: {baseline.get(key)}')
+            regressions = loadtest.compare(
+                result, baseline, options['threshold'])
+            if regressions:
+                raise CommandError('Регрессии: ' + ', '.join(
+                    f'{route} {metric} {before} → {now}'
+                    for route, metric, before, now in regressions
+                ))
+
+    def targets(self, rng):
+        posts = sample_ids(Post.objects.all(), rng)
+        users = sample_ids(
+            User.objects.filter(posts__isnull=False).distinct(), rng)
+        if not posts:
+            raise CommandError('В базе нет постов, запустите seed_yatube')
+        return {
+            'posts': posts,
+            'usernames': list(User.objects.filter(
+                pk__in=users).values_list('username', flat=True)),
+            'groups': list(Group.objects.filter(
+                pk__in=sample_ids(Group.objects.all(), rng)
+            ).values_list('slug', flat=True)) or ['-'],
+        }
+
+    def report(self, result):
+        self.stdout.write(
+            f'{"маршрут":<14}{"запросов":>10}{"ошибок":>8}{"rps":>9}'
+            f'{"p50":>9}{"p95":>9}{"p99":>9}'
+        )
+        for route, row in result['routes'].items():
+            self.stdout.write(
+                f'{route:<14}{row["requests"]:>10}{row["errors"]:>8}'
+                f'{row["rps"]:>9}{row["p50"]:>9}{row["p95"]:>9}'
+                f'{row["p99"]:>9}'
+            )
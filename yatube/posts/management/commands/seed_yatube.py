@@ -0,0 +1,299 @@
+import contextlib
+import multiprocessing
+import random
+import time
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from posts import feed_cache
+from posts.counters import recount
+from posts.models import (Comment, Follow, Group, Post, TimelineEntry, User,
+                          UserStats)
+from posts.seed_text import make_texts
+
+# Начало отсчёта дат: при одном зерне данные совпадают между запусками
+EPOCH = timezone.make_aware(datetime(2022, 1, 1))
+SUFFIXES = {'k': 10 ** 3, 'm': 10 ** 6}
+
+
+def amount(value):
+    """Число с необязательным суффиксом: 100k, 5M."""
+    value = value.strip().lower()
+    multiplier = SUFFIXES.get(value[-1:], 1)
+    if multiplier != 1:
+        value = value[:-1]
+    try:
+        return int(float(value) * multiplier)
+    except ValueError:
+        raise CommandError(f'Не число: {value}')
+
+
+@contextlib.contextmanager
+def explicit_dates(*models):
+    # bulk_create заполняет auto_now_add текущим временем,
+    # а посты и комментарии должны быть растянуты по времени
+    fields = [model._meta.get_field('pub_date') for model in models]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    help = (
+        'Наполняет базу детерминированными данными для нагрузочных '
+        'тестов: пользователи, группы, посты, подписки, комментарии'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=amount, default=1000)
+        parser.add_argument('--groups', type=amount, default=50)
+        parser.add_argument('--posts', type=amount, default=10_000)
+        parser.add_argument('--follows', type=amount, default=20_000)
+        parser.add_argument('--comments', type=amount, default=20_000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch', type=int, default=5000)
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='На сколько дней от 2022-01-01 растянуть публикации',
+        )
+        parser.add_argument(
+            '--workers', type=int, default=0,
+            help='Процессы для генерации текстов, 0 — без пула',
+        )
+        parser.add_argument(
+            '--password', default='yatube-seed',
+            help='Общий пароль созданных пользователей',
+        )
+        parser.add_argument(
+            '--skip-timelines', action='store_true',
+            help='Не раскладывать посты по лентам подписок',
+        )
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.random = random.Random(options['seed'])
+        self.prefix = f'seed{options["seed"]}_'
+        self.reported = 0
+        if User.objects.filter(username__startswith=self.prefix).exists():
+            raise CommandError(
+                f'Данные с зерном {options["seed"]} уже есть, '
+                'укажите другой --seed'
+            )
+        pool = None
+        if options['workers'] > 0:
+            pool = multiprocessing.Pool(options['workers'])
+        try:
+            users = self.seed_users(options['users'])
+            groups = self.seed_groups(options['groups'])
+            with explicit_dates(Post, Comment):
+                posts = self.seed_posts(options['posts'], users, groups, pool)
+                self.seed_comments(options['comments'], users, posts, pool)
+            follows = self.seed_follows(options['follows'], users)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+        self.step('Пересчёт счётчиков')
+        with transaction.atomic():
+            recount()
+        if not options['skip_timelines']:
+            self.seed_timelines(follows)
+        # Новые строки появились в обход сигналов
+        feed_cache.bump(*feed_cache.GLOBAL, feed_cache.index())
+
+    def step(self, message):
+        self.stdout.write(self.style.MIGRATE_HEADING(message))
+
+    def progress(self, name, done, total, started):
+        now = time.monotonic()
+        if done < total and now - self.reported < 1:
+            return
+        self.reported = now
+        rate = done / max(time.monotonic() - started, 1e-6)
+        self.stdout.write(
+            f'  {name}: {done}/{total} ({done / total:.1%}), '
+            f'{rate:,.0f} строк/с'
+        )
+
+    def insert(self, name, total, rows):
+        """Пишет строки пачками, каждая пачка — своя транзакция."""
+        model_rows = []
+        done = 0
+        started = time.monotonic()
+        for row in rows:
+            model_rows.append(row)
+            if len(model_rows) == self.options['batch']:
+                done += self.flush(model_rows)
+                self.progress(name, done, total, started)
+        if model_rows:
+            done += self.flush(model_rows)
+            self.progress(name, done, total, started)
+
+    def flush(self, rows):
+        with transaction.atomic():
+            type(rows[0]).objects.bulk_create(rows)
+        size = len(rows)
+        rows.clear()
+        return size
+
+    def id_range(self, queryset, start):
+        """Диапазон id строк, вставленных после start.
+
+        bulk_create в SQLite не возвращает id, но вставка одним
+        процессом выдаёт их подряд.
+        """
+        ids = queryset.filter(pk__gt=start).values_list('pk', flat=True)
+        last = ids.order_by('-pk').first()
+        if last is None:
+            return range(0)
+        return range(ids.order_by('pk').first(), last + 1)
+
+    def last_id(self, model):
+        return model.objects.order_by('-pk').values_list(
+            'pk', flat=True).first() or 0
+
+    def texts(self, kind, total, pool):
+        batch = self.options['batch']
+        jobs = [
+            (self.options['seed'], chunk, kind, min(batch, total - start))
+            for chunk, start in enumerate(range(0, total, batch))
+        ]
+        if pool is None:
+            for job in jobs:
+                yield from make_texts(job)
+            return
+        # Пул опережает запись в базу не больше чем на окно пачек,
+        # иначе готовые тексты копятся в памяти
+        window = self.options['workers'] * 2
+        for start in range(0, len(jobs), window):
+            for chunk in pool.imap(make_texts, jobs[start:start + window]):
+                yield from chunk
+
+    def pub_date(self):
+        seconds = self.random.randrange(self.options['days'] * 86400)
+        return EPOCH + timedelta(seconds=seconds)
+
+    def seed_users(self, total):
+        self.step('Пользователи')
+        start = self.last_id(User)
+        # Хеш пароля считается один раз: PBKDF2 на каждого слишком долог
+        password = make_password(self.options['password'])
+        self.insert('users', total, (
+            User(
+                username=f'{self.prefix}{number}',
+                first_name=f'Имя{number}',
+                last_name=f'Фамилия{number}',
+                password=password,
+            )
+            for number in range(total)
+        ))
+        users = self.id_range(User.objects.all(), start)
+        UserStats.objects.bulk_create(
+            (UserStats(user_id=pk) for pk in users), ignore_conflicts=True,
+        )
+        return users
+
+    def seed_groups(self, total):
+        self.step('Группы')
+        start = self.last_id(Group)
+        self.insert('groups', total, (
+            Group(
+                title=f'Группа {number}',
+                slug=f'{self.prefix}{number}',
+                description=f'Сообщество номер {number}',
+            )
+            for number in range(total)
+        ))
+        return self.id_range(Group.objects.all(), start)
+
+    def seed_posts(self, total, users, groups, pool):
+        self.step('Посты')
+        if not users:
+            raise CommandError('Для постов нужны пользователи')
+        start = self.last_id(Post)
+        rng = self.random
+        self.insert('posts', total, (
+            Post(
+                text=text,
+                author_id=rng.choice(users),
+                group_id=rng.choice(groups) if groups and rng.random() < 0.7
+                else None,
+                pub_date=self.pub_date(),
+            )
+            for text in self.texts('post', total, pool)
+        ))
+        return self.id_range(Post.objects.all(), start)
+
+    def seed_comments(self, total, users, posts, pool):
+        self.step('Комментарии')
+        if not posts:
+            return
+        rng = self.random
+        self.insert('comments', total, (
+            Comment(
+                text=text,
+                post_id=rng.choice(posts),
+                author_id=rng.choice(users),
+                pub_date=self.pub_date(),
+            )
+            for text in self.texts('comment', total, pool)
+        ))
+
+    def popular_author(self, users):
+        # Половина подписок — по степенному распределению: у первых
+        # авторов подписчиков больше порога TIMELINE_FANOUT_LIMIT,
+        # как у настоящих звёзд
+        if self.random.random() < 0.5:
+            return self.random.choice(users)
+        return users[int(len(users) * self.random.random() ** 3)]
+
+    def seed_follows(self, total, users):
+        self.step('Подписки')
+        start = self.last_id(Follow)
+        per_user = min(total // max(len(users), 1), len(users) - 1)
+        total = per_user * len(users)
+
+        def rows():
+            for user in users:
+                authors = set()
+                while len(authors) < per_user:
+                    author = self.popular_author(users)
+                    if author != user:
+                        authors.add(author)
+                for author in sorted(authors):
+                    yield Follow(user_id=user, author_id=author)
+
+        self.insert('follows', total, rows())
+        return self.id_range(Follow.objects.all(), start)
+
+    def seed_timelines(self, follows):
+        """Раскладывает посты по лентам так, как это сделал бы fan-out."""
+        self.step('Ленты подписок')
+        batch = self.options['batch']
+        sql = f"""
+            INSERT INTO {TimelineEntry._meta.db_table}
+                (user_id, post_id, author_id, pub_date)
+            SELECT f.user_id, p.id, p.author_id, p.pub_date
+            FROM {Follow._meta.db_table} f
+            JOIN {UserStats._meta.db_table} s
+                ON s.user_id = f.author_id AND s.followers_count < %s
+            JOIN {Post._meta.db_table} p ON p.author_id = f.author_id
+            WHERE f.id BETWEEN %s AND %s
+        """
+        started = time.monotonic()
+        for first in range(follows.start, follows.stop, batch):
+            last = min(first + batch, follows.stop) - 1
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(
+                    sql, [settings.TIMELINE_FANOUT_LIMIT, first, last])
+            self.progress(
+                'timelines', last - follows.start + 1, len(follows), started)
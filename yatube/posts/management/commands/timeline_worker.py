@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from posts.timeline import run_jobs
+
+
+class Command(BaseCommand):
+    help = 'Фоновый обработчик очереди: раскладывает посты авторов по лентам'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch', type=int, default=5)
+        parser.add_argument(
+            '--interval', type=float, default=2,
+            help='Пауза в секундах, когда очередь пуста',
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Разобрать очередь и завершиться',
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            done = run_jobs(options['batch'])
+            if done:
+                self.stdout.write(f'Обработано авторов: {done}')
+            elif options['once']:
+                return
+            else:
+                time.sleep(options['interval'])
@@ -0,0 +1,63 @@
+from core import instrumentation, routers
+
+from . import feed_cache, holes, page_cache, thumbnails
+
+LOOKUPS_HEADER = 'X-Thumbnail-Lookups'
+
+
+class ThumbnailLookupsMiddleware:
+    """Добавляет в ответ число обращений к хранилищу миниатюр."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = thumbnails.lookups.set(0)
+        try:
+            response = self.get_response(request)
+            response[LOOKUPS_HEADER] = str(thumbnails.lookups.get())
+        finally:
+            thumbnails.lookups.reset(token)
+        return response
+
+
+class PageCacheMiddleware:
+    """Отдаёт готовые страницы лент с вставками текущего посетителя.
+
+    Старая по времени копия отдаётся сразу, а новая собирается в фоне
+    одним запросом. Без копии, после изменения версий и сразу после
+    своей записи страница собирается как обычно.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not page_cache.applies(request):
+            return self.get_response(request)
+        entry = page_cache.get(request)
+        state = entry and page_cache.state(entry)
+        if state is None or page_cache.after_write(request):
+            response = self.render(request)
+            if not response.streaming:
+                response.content = holes.fill(request, response.content)
+            response[page_cache.HEADER] = 'miss'
+            return response
+        if state == 'stale' and page_cache.start_refresh(request):
+            page_cache.in_background(self.refresh, page_cache.copy(request))
+        return page_cache.response(request, entry, state)
+
+    def render(self, request):
+        # Копия живёт долго: реплика могла не догнать сброс версии
+        routers.use_primary(request)
+        with instrumentation.collect() as stats:
+            with feed_cache.collect() as versions, holes.shared():
+                response = self.get_response(request)
+        page_cache.store(request, response, versions, stats)
+        return response
+
+    def refresh(self, request):
+        try:
+            self.render(request)
+        finally:
+            page_cache.finish_refresh(request)
@@ -0,0 +1,40 @@
+# Generated by Django 2.2.16 on 2026-10-17 04:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def enqueue_images(apps, schema_editor):
+    # Варианты для уже загруженных картинок нарежет image_worker
+    ImageJob = apps.get_model('posts', 'ImageJob')
+    Post = apps.get_model('posts', 'Post')
+    ImageJob.objects.bulk_create(
+        ImageJob(post_id=pk)
+        for pk in Post.objects.exclude(image='').values_list('pk', flat=True)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_auto_20261017_0431'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageJob',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='posts.Post')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['created'],
+            },
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_variants',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.RunPython(enqueue_images, migrations.RunPython.noop),
+    ]
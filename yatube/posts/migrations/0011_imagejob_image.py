@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-17 05:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0010_timelinejob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imagejob',
+            name='image',
+            field=models.CharField(default='', max_length=100),
+        ),
+    ]
@@ -8,11 +8,39 @@ class Group(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(unique=True)
     description = models.TextField(max_length=200)
+    posts_count = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return self.title
 
 
+# Поля, которые выводит карточка поста в лентах
+FEED_FIELDS = (
+    'id', 'text', 'pub_date', 'image', 'image_variants',
+    'author__id', 'author__username', 'author__first_name',
+    'author__last_name', 'group__id', 'group__slug', 'group__title',
+)
+
+
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Посты для лент: автор и группа одним JOIN, только нужные поля."""
+        return self.select_related('author', 'group').only(*FEED_FIELDS)
+
+    def for_detail(self):
+        """Пост для страницы поста вместе со счётчиками автора."""
+        return self.select_related('author__stats', 'group')
+
+
+class CommentQuerySet(models.QuerySet):
+    def for_thread(self):
+        """Комментарии для ветки под постом вместе с их авторами."""
+        return self.select_related('author').only(
+            'id', 'text', 'pub_date', 'post_id',
+            'author__id', 'author__username',
+        )
+
+
 class Post(models.Model):
     text = models.TextField('Текст поста')
     pub_date = models.DateTimeField('Дата публикации',
@@ -35,9 +63,24 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
+    # JSON с именами нарезанных вариантов картинки, см. posts.images
+    image_variants = models.TextField(blank=True, editable=False)
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ['-pub_date']
+        # Индексы повторяют фильтр и сортировку каждой ленты:
+        # (pub_date, id) читается в обратном порядке для
+        # ORDER BY pub_date DESC, id DESC
+        indexes = [
+            models.Index(fields=['pub_date', 'id'], name='post_date_idx'),
+            models.Index(fields=['author', 'pub_date', 'id'],
+                         name='post_author_date_idx'),
+            models.Index(fields=['group', 'pub_date', 'id'],
+                         name='post_group_date_idx'),
+        ]
 
     def __str__(self):
         # выводим текст поста
@@ -59,8 +102,14 @@ class Comment(models.Model):
         related_name='comments'
     )
 
+    objects = CommentQuerySet.as_manager()
+
     class Meta:
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(fields=['post', 'pub_date', 'id'],
+                         name='comment_post_date_idx'),
+        ]
 
 
 class Follow(models.Model):
@@ -80,3 +129,87 @@ class Follow(models.Model):
             models.UniqueConstraint(fields=['user', 'author'],
                                     name='unique_follow')
         ]
+        # unique_follow покрывает выборку по (user, author),
+        # а раскладка постов по подписчикам идёт от автора
+        indexes = [
+            models.Index(fields=['author', 'user'],
+                         name='follow_author_user_idx'),
+        ]
+
+
+class UserStats(models.Model):
+    """Поддерживаемые сигналами счётчики пользователя."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats'
+    )
+    posts_count = models.PositiveIntegerField(default=0)
+    # Сколько пользователей подписано на автора
+    followers_count = models.PositiveIntegerField(default=0)
+    # На скольких авторов подписан пользователь
+    following_count = models.PositiveIntegerField(default=0)
+
+
+class TimelineEntry(models.Model):
+    """Запись в материализованной ленте подписок пользователя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-pub_date']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'],
+                                    name='unique_timeline_entry')
+        ]
+        indexes = [
+            models.Index(fields=['user', 'pub_date', 'post'],
+                         name='timeline_user_date_idx'),
+            models.Index(fields=['user', 'author'],
+                         name='timeline_user_author_idx'),
+        ]
+
+
+class TimelineJob(models.Model):
+    """Автор, посты которого нужно разложить по лентам подписчиков."""
+    author = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='timeline_job'
+    )
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['created']
+
+
+class ImageJob(models.Model):
+    """Пост, для картинки которого нужно нарезать варианты."""
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='+'
+    )
+    # Картинка, для которой поставлена задача
+    image = models.CharField(max_length=100, default='')
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['created']
@@ -0,0 +1,138 @@
+"""Кеш целых страниц лент.
+
+Страницы из PAGE_CACHE_VIEWS собираются с метками вместо персональных
+вставок (posts.holes) и отличаются только адресом, поэтому ответ
+хранится по пути и строке запроса и отдаётся всем посетителям, в том
+числе вошедшим: метки заполняются для каждого запроса. Вместе с ним
+запоминаются версии feed_cache, прочитанные при сборке страницы: пост,
+комментарий, подписка или переименование меняют версию, и страница
+собирается заново сразу: автор записи должен её увидеть. Копия старше
+PAGE_CACHE_MAX_AGE секунд при тех же версиях ещё отдаётся, пока один
+запрос в фоне собирает новую; хранится она PAGE_CACHE_TIMEOUT секунд.
+"""
+import hashlib
+import io
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import connections
+from django.http import HttpResponse
+from django.urls import Resolver404, resolve
+
+from . import feed_cache, holes
+
+PREFIX = 'page:'
+LOCK_PREFIX = 'page-refresh:'
+HEADER = 'X-Page-Cache'
+
+
+def applies(request):
+    """Можно ли отдать этому запросу общую копию страницы."""
+    if not settings.PAGE_CACHE_ENABLED or request.method != 'GET':
+        return False
+    try:
+        match = resolve(request.path_info)
+    except Resolver404:
+        return False
+    # Шапке нужно имя представления и без вызова самого представления
+    request.resolver_match = match
+    return match.view_name in settings.PAGE_CACHE_VIEWS
+
+
+def after_write(request):
+    """Посетитель только что писал: ему нужна страница с default.
+
+    Кука ставится ReplicaMiddleware после записи; пока она жива,
+    копия собирается заново, а не отдаётся из кеша.
+    """
+    return settings.REPLICA_STICKY_COOKIE in request.COOKIES
+
+
+def key(request):
+    query = '&'.join(sorted(request.META.get('QUERY_STRING', '').split('&')))
+    path = f'{request.path}?{query}'.encode()
+    return PREFIX + hashlib.sha1(path).hexdigest()
+
+
+def cacheable(request, response):
+    # Страница, которая вне вставок прочитала сессию или выдала
+    # CSRF-токен, — чужая. У запроса фоновой сборки сессии нет
+    session = getattr(request, 'session', None)
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and 'private' not in response.get('Cache-Control', '')
+        and (session is None or not session.accessed)
+        and not request.META.get('CSRF_COOKIE_USED')
+    )
+
+
+def get(request):
+    return cache.get(key(request))
+
+
+def store(request, response, versions, stats):
+    # Пока другой запрос пересчитывал фрагмент, в страницу попала его
+    # прошлая копия: под текущими версиями такую страницу хранить нельзя
+    if stats.stale_served or not cacheable(request, response):
+        return
+    cache.set(key(request), {
+        'content': response.content,
+        'status': response.status_code,
+        'headers': list(response.items()),
+        'versions': versions,
+        'created': time.time(),
+    }, settings.PAGE_CACHE_TIMEOUT)
+
+
+def state(entry):
+    """'hit', 'stale' — пора обновить в фоне, None — копия неверна."""
+    if feed_cache.versions(entry['versions']) != entry['versions']:
+        return None
+    if time.time() - entry['created'] > settings.PAGE_CACHE_MAX_AGE:
+        return 'stale'
+    return 'hit'
+
+
+def response(request, entry, state):
+    result = HttpResponse(
+        holes.fill(request, entry['content']), status=entry['status'])
+    for header, value in entry['headers']:
+        result[header] = value
+    result[HEADER] = state
+    return result
+
+
+def start_refresh(request):
+    """Берёт право обновить страницу; False — уже обновляет другой."""
+    return cache.add(
+        LOCK_PREFIX + key(request), 1, settings.STAMPEDE_LOCK_TIMEOUT)
+
+
+def finish_refresh(request):
+    cache.delete(LOCK_PREFIX + key(request))
+
+
+def copy(request):
+    """Запрос для фоновой сборки: исходный к этому времени отдан."""
+    environ = dict(request.environ, **{'wsgi.input': io.BytesIO()})
+    return WSGIRequest(environ)
+
+
+def in_background(func, *args):
+    if not settings.PAGE_CACHE_BACKGROUND:
+        func(*args)
+        return
+
+    def target():
+        try:
+            func(*args)
+        finally:
+            # Соединения этого потока больше никому не понадобятся
+            connections.close_all()
+
+    threading.Thread(target=target, daemon=True).start()
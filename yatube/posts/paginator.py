@@ -0,0 +1,154 @@
+import base64
+import binascii
+import json
+
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+NEXT = 'n'
+PREVIOUS = 'p'
+SQLITE_MIN_INT = -2 ** 63
+SQLITE_MAX_INT = 2 ** 63 - 1
+
+
+def pack_token(payload):
+    """Упаковывает список значений в непрозрачный токен для URL."""
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def unpack_token(token):
+    """Распаковывает токен, для испорченного токена возвращает None."""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        return json.loads(raw.decode())
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        return None
+
+
+def encode_cursor(direction, pub_date, pk, number):
+    """Упаковывает позицию в ленте в непрозрачный токен."""
+    return pack_token([direction, pub_date.isoformat(), pk, number])
+
+
+def is_db_int(value):
+    """Целое, которое SQLite может сравнить с ключом (64 бита)."""
+    return (
+        isinstance(value, int) and not isinstance(value, bool)
+        and SQLITE_MIN_INT <= value <= SQLITE_MAX_INT
+    )
+
+
+def decode_cursor(token):
+    """Разбирает токен курсора, для испорченного токена возвращает None."""
+    try:
+        direction, pub_date, pk, number = unpack_token(token)
+        # Дата вида 2021-13-01 проходит формат, но не существует
+        pub_date = parse_datetime(pub_date)
+    except (ValueError, TypeError):
+        return None
+    if (
+        direction not in (NEXT, PREVIOUS) or pub_date is None
+        or not is_db_int(pk) or not is_db_int(number)
+    ):
+        return None
+    return direction, pub_date, pk, max(number, 1)
+
+
+class CursorPaginator(Paginator):
+    """Пагинатор по ключу (pub_date, pk) без COUNT(*) и OFFSET.
+
+    Каждая страница выбирается одним запросом вида
+    ``WHERE (pub_date, pk) < (...) ORDER BY pub_date DESC, pk DESC LIMIT n+1``,
+    поэтому глубокие страницы стоят столько же, сколько первая.
+    Параметр ``page=`` поддерживается для старых ссылок.
+
+    ``key`` задаёт поле, разрешающее равные даты, а ``item`` —
+    преобразование строки выборки в объект страницы: так лента подписок
+    листает записи TimelineEntry, а в шаблон отдаёт посты.
+    """
+
+    def __init__(self, object_list, per_page, key='pk', item=None,
+                 **kwargs):
+        self.key = key
+        self.item = item
+        super().__init__(
+            object_list.order_by('-pub_date', f'-{key}'), per_page, **kwargs
+        )
+
+    def get_page(self, number=None, cursor=None):
+        if cursor:
+            position = decode_cursor(cursor)
+            if position is not None:
+                return self._keyset_page(*position)
+        if number is not None:
+            return self._offset_page(number)
+        return self._first_page()
+
+    def _first_page(self):
+        rows = list(self.object_list[:self.per_page + 1])
+        return self._make_page(rows, 1, has_previous=False)
+
+    def _offset_page(self, number):
+        # Совместимость со ссылками вида ?page=N
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            return self._first_page()
+        if number <= 1:
+            return self._first_page()
+        bottom = (number - 1) * self.per_page
+        rows = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not rows:
+            # Номер за пределами ленты: отдаём последнюю страницу,
+            # как это делает Paginator.get_page
+            return self._offset_page(self.num_pages)
+        return self._make_page(rows, number, has_previous=True)
+
+    def keyset_queryset(self, direction, pub_date, pk):
+        """Строки после (NEXT) или до (PREVIOUS) позиции курсора.
+
+        Условие записано как диапазон по pub_date с исключением
+        границы, чтобы СУБД читала индекс по дате по порядку.
+        """
+        if direction == NEXT:
+            return self.object_list.filter(
+                Q(pub_date__lte=pub_date)
+                & ~Q(pub_date=pub_date, **{f'{self.key}__gte': pk})
+            )
+        return self.object_list.filter(
+            Q(pub_date__gte=pub_date)
+            & ~Q(pub_date=pub_date, **{f'{self.key}__lte': pk})
+        ).order_by('pub_date', self.key)
+
+    def _keyset_page(self, direction, pub_date, pk, number):
+        rows = list(self.keyset_queryset(
+            direction, pub_date, pk)[:self.per_page + 1])
+        if direction == NEXT:
+            return self._make_page(rows, number, has_previous=True)
+        if len(rows) <= self.per_page:
+            # Дошли до начала ленты
+            return self._first_page()
+        rows = rows[:self.per_page][::-1]
+        page = self._make_page(rows, number, has_previous=True)
+        page.next_cursor = self._cursor(NEXT, rows[-1], number + 1)
+        return page
+
+    def _make_page(self, rows, number, has_previous):
+        has_next = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        items = [self.item(row) for row in rows] if self.item else rows
+        page = Page(items, number, self)
+        page.next_cursor = None
+        page.previous_cursor = None
+        if has_next:
+            page.next_cursor = self._cursor(NEXT, rows[-1], number + 1)
+        if has_previous and rows:
+            page.previous_cursor = self._cursor(PREVIOUS, rows[0], number - 1)
+        return page
+
+    def _cursor(self, direction, row, number):
+        return encode_cursor(
+            direction, row.pub_date, getattr(row, self.key), number
+        )
@@ -0,0 +1,201 @@
+"""Полнотекстовый поиск по постам на SQLite FTS5.
+
+Индекс ``posts_post_fts`` хранит нормализованный текст поста (ё → е)
+и поддерживается триггерами на ``posts_post``. Русская морфология
+приближается отбрасыванием окончания и поиском по префиксу.
+"""
+import re
+
+from django.core.paginator import Page, Paginator
+from django.db import connection
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Post
+from .paginator import NEXT, PREVIOUS, pack_token, unpack_token
+
+FTS_TABLE = 'posts_post_fts'
+MAX_TERMS = 10
+SNIPPET_TOKENS = 16
+
+WORD = re.compile(r'\w+')
+RUSSIAN_ENDING = re.compile(
+    r'(ами|ями|ого|его|ому|ему|ыми|ими|ой|ей|ий|ый|ая|яя|ое|ее|ые|ие|'
+    r'ам|ям|ах|ях|ом|ем|ов|ев|ию|ью|[аеиоуыьюяй])$'
+)
+
+INSTALL_SQL = (
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        text, tokenize = 'unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai
+        AFTER INSERT ON posts_post BEGIN
+            INSERT INTO {FTS_TABLE}(rowid, text)
+            VALUES (new.id, replace(replace(new.text, 'ё', 'е'), 'Ё', 'Е'));
+        END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad
+        AFTER DELETE ON posts_post BEGIN
+            DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+        END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au
+        AFTER UPDATE OF text ON posts_post BEGIN
+            UPDATE {FTS_TABLE}
+            SET text = replace(replace(new.text, 'ё', 'е'), 'Ё', 'Е')
+            WHERE rowid = new.id;
+        END""",
+)
+REBUILD_SQL = (
+    f'DELETE FROM {FTS_TABLE}',
+    f"""INSERT INTO {FTS_TABLE}(rowid, text)
+        SELECT id, replace(replace(text, 'ё', 'е'), 'Ё', 'Е')
+        FROM posts_post""",
+)
+
+
+def is_available(using=connection):
+    return using.vendor == 'sqlite'
+
+
+def install(using=connection):
+    """Создаёт индекс и триггеры, если их нет.
+
+    Вызывается после каждой миграции: SQLite пересоздаёт таблицу
+    posts_post при изменении её схемы, и триггеры пропадают вместе
+    со старой таблицей. В этом случае индекс перестраивается целиком.
+    """
+    if not is_available(using):
+        return
+    with using.cursor() as cursor:
+        cursor.execute(
+            "SELECT count(*) FROM sqlite_master WHERE type = 'trigger' "
+            "AND name LIKE %s", [f'{FTS_TABLE}_a_']
+        )
+        complete = cursor.fetchone()[0] == len(INSTALL_SQL) - 1
+        for statement in INSTALL_SQL:
+            cursor.execute(statement)
+        if not complete:
+            for statement in REBUILD_SQL:
+                cursor.execute(statement)
+
+
+def match_expression(query):
+    """Превращает ввод пользователя в безопасное выражение MATCH."""
+    terms = []
+    for word in WORD.findall(query.lower().replace('ё', 'е'))[:MAX_TERMS]:
+        stem = RUSSIAN_ENDING.sub('', word)
+        if len(stem) < 3:
+            stem = word
+        terms.append(f'"{stem}"*')
+    return ' '.join(terms)
+
+
+def matching_ids(query):
+    """SQL-подзапрос с id постов, подходящих под запрос."""
+    return (
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+        [match_expression(query)],
+    )
+
+
+def search_page(query, per_page, cursor=None):
+    """Страница результатов поиска по убыванию релевантности (BM25).
+
+    Листается по ключу (score, rowid) так же, как ленты листаются
+    по (pub_date, pk): курсор хранит границу страницы, OFFSET
+    не используется.
+    """
+    expression = match_expression(query)
+    if not expression:
+        return _make_page([], per_page, 1, None, None)
+    position = _decode(cursor) if cursor else None
+    if position is None:
+        rows = _fetch(expression, per_page + 1)
+        return _page(rows, per_page, 1, has_previous=False)
+    direction, score, rowid, number = position
+    if direction == NEXT:
+        rows = _fetch(expression, per_page + 1,
+                      'score > %s OR (score = %s AND rowid > %s)',
+                      [score, score, rowid])
+        return _page(rows, per_page, number, has_previous=True)
+    rows = _fetch(expression, per_page + 1,
+                  'score < %s OR (score = %s AND rowid < %s)',
+                  [score, score, rowid], descending=True)
+    if len(rows) <= per_page:
+        return search_page(query, per_page)
+    rows = rows[:per_page][::-1]
+    page = _page(rows, per_page, number, has_previous=True)
+    page.next_cursor = _encode(NEXT, rows[-1], number + 1)
+    return page
+
+
+def _fetch(expression, limit, where='1', params=(), descending=False):
+    order = 'DESC' if descending else 'ASC'
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""SELECT rowid, score, snippet FROM (
+                    SELECT rowid, bm25({FTS_TABLE}) AS score,
+                           snippet({FTS_TABLE}, 0, char(2), char(3),
+                                   '…', {SNIPPET_TOKENS}) AS snippet
+                    FROM {FTS_TABLE}
+                    WHERE {FTS_TABLE} MATCH %s
+                )
+                WHERE {where}
+                ORDER BY score {order}, rowid {order}
+                LIMIT %s""",
+            [expression, *params, limit],
+        )
+        return cursor.fetchall()
+
+
+def highlight(snippet):
+    # Текст поста экранируется, размечаются только найденные слова
+    return mark_safe(
+        escape(snippet).replace('\x02', '<mark>').replace('\x03', '</mark>')
+    )
+
+
+def _page(rows, per_page, number, has_previous):
+    has_next = len(rows) > per_page
+    rows = rows[:per_page]
+    posts = Post.objects.for_feed().in_bulk(
+        [row[0] for row in rows]
+    )
+    results = []
+    for rowid, score, snippet in rows:
+        post = posts.get(rowid)
+        if post is not None:
+            post.score = score
+            post.snippet = highlight(snippet)
+            results.append(post)
+    next_cursor = previous_cursor = None
+    if has_next:
+        next_cursor = _encode(NEXT, rows[-1], number + 1)
+    if has_previous and rows:
+        previous_cursor = _encode(PREVIOUS, rows[0], number - 1)
+    return _make_page(results, per_page, number, next_cursor, previous_cursor)
+
+
+def _make_page(results, per_page, number, next_cursor, previous_cursor):
+    page = Page(results, number, Paginator(results, per_page))
+    page.next_cursor = next_cursor
+    page.previous_cursor = previous_cursor
+    return page
+
+
+def _encode(direction, row, number):
+    rowid, score, _ = row
+    return pack_token([direction, score, rowid, number])
+
+
+def _decode(token):
+    try:
+        direction, score, rowid, number = unpack_token(token)
+    except (ValueError, TypeError):
+        return None
+    if (
+        direction not in (NEXT, PREVIOUS)
+        or not isinstance(score, (int, float))
+        or not isinstance(rowid, int) or not isinstance(number, int)
+    ):
+        return None
+    return direction, score, rowid, max(number, 1)
@@ -0,0 +1,24 @@
+"""Генерация текстов для seed_yatube.
+
+Модуль не импортирует Django, чтобы его можно было запускать в пуле
+процессов. Каждая пачка получает своё зерно, поэтому результат не
+зависит от числа процессов.
+"""
+from faker import Faker
+
+SENTENCES = {
+    'post': (2, 8),
+    'comment': (1, 2),
+}
+
+
+def make_texts(job):
+    """Тексты для одной пачки: job = (зерно, номер пачки, вид, размер)."""
+    seed, chunk, kind, size = job
+    fake = Faker('ru_RU')
+    fake.seed_instance(f'{seed}:{kind}:{chunk}')
+    low, high = SENTENCES[kind]
+    return [
+        fake.paragraph(nb_sentences=fake.random_int(low, high))
+        for _ in range(size)
+    ]
@@ -0,0 +1,173 @@
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save)
+from django.dispatch import receiver
+
+from . import feed_cache, images, timeline
+from .counters import change
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+
+# Поля пользователя и группы, которые видны в карточках постов
+# и на страницах профиля и группы
+USER_DISPLAY_FIELDS = ('username', 'first_name', 'last_name')
+GROUP_DISPLAY_FIELDS = ('title', 'slug', 'description')
+
+
+def saved_fields(instance, fields, update_fields):
+    """Значения полей до сохранения; None — сохраняются не они."""
+    if instance.pk is None:
+        return None
+    if update_fields is not None and not set(fields) & set(update_fields):
+        return None
+    return type(instance).objects.filter(
+        pk=instance.pk).values_list(*fields).first()
+
+
+def display_changed(instance, fields):
+    saved = instance._saved_display
+    return saved is not None and saved != tuple(
+        getattr(instance, name) for name in fields)
+
+
+def bump_user_feeds(user_id):
+    # Карточки автора есть в главной ленте, его профиле, лентах групп
+    # с его постами и у подписчиков
+    group_ids = Post.objects.filter(author_id=user_id).values_list(
+        'group_id', flat=True).distinct().order_by()
+    feed_cache.bump(
+        feed_cache.user(user_id), feed_cache.author(user_id),
+        feed_cache.index(),
+        *(feed_cache.group(pk) for pk in group_ids if pk is not None)
+    )
+    timeline.touch(user_id)
+
+
+def bump_group_feeds(group_id):
+    author_ids = list(Post.objects.filter(group_id=group_id).values_list(
+        'author_id', flat=True).distinct().order_by())
+    feed_cache.bump(
+        feed_cache.group_info(group_id), feed_cache.group(group_id),
+        feed_cache.index(),
+        *(feed_cache.author(pk) for pk in author_ids)
+    )
+    for author_id in author_ids:
+        timeline.touch(author_id)
+
+
+@receiver(pre_save, sender=User)
+def remember_user(sender, instance, update_fields, **kwargs):
+    instance._saved_display = saved_fields(
+        instance, USER_DISPLAY_FIELDS, update_fields)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    if created:
+        UserStats.objects.get_or_create(user=instance)
+    elif display_changed(instance, USER_DISPLAY_FIELDS):
+        bump_user_feeds(instance.pk)
+
+
+@receiver(pre_save, sender=Group)
+def remember_group(sender, instance, update_fields, **kwargs):
+    instance._saved_display = saved_fields(
+        instance, GROUP_DISPLAY_FIELDS, update_fields)
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, created, **kwargs):
+    if not created and display_changed(instance, GROUP_DISPLAY_FIELDS):
+        bump_group_feeds(instance.pk)
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    # После удаления у постов группы уже не будет
+    bump_group_feeds(instance.pk)
+
+
+def bump_post_feeds(post, *group_ids):
+    feed_cache.bump(
+        feed_cache.index(),
+        feed_cache.author(post.author_id),
+        *(feed_cache.group(pk) for pk in group_ids if pk is not None)
+    )
+
+
+@receiver(pre_save, sender=Post)
+def remember_saved(sender, instance, **kwargs):
+    # Группа до редактирования нужна, чтобы перенести счётчик
+    instance._saved_group_id = None
+    saved_image = ''
+    if instance.pk is not None:
+        saved = Post.objects.filter(
+            pk=instance.pk).values_list('group_id', 'image').first()
+        if saved is not None:
+            instance._saved_group_id, saved_image = saved
+    if instance.image.name != saved_image:
+        # Варианты прежней картинки больше не подходят
+        instance.image_variants = ''
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    if created:
+        change(UserStats, instance.author_id, 'posts_count', 1)
+        change(Group, instance.group_id, 'posts_count', 1)
+        timeline.fan_out(instance)
+    elif instance._saved_group_id != instance.group_id:
+        change(Group, instance._saved_group_id, 'posts_count', -1)
+        change(Group, instance.group_id, 'posts_count', 1)
+    if not created:
+        # Правка поста видна подписчикам автора
+        timeline.touch(instance.author_id)
+        feed_cache.bump(feed_cache.post(instance.pk))
+    bump_post_feeds(instance, instance.group_id, instance._saved_group_id)
+    images.enqueue(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    change(UserStats, instance.author_id, 'posts_count', -1)
+    change(Group, instance.group_id, 'posts_count', -1)
+    timeline.touch(instance.author_id)
+    bump_post_feeds(instance, instance.group_id)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        change(Post, instance.post_id, 'comments_count', 1)
+    feed_cache.bump(feed_cache.comments(instance.post_id))
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    change(Post, instance.post_id, 'comments_count', -1)
+    feed_cache.bump(feed_cache.comments(instance.post_id))
+
+
+def bump_follows(follow):
+    feed_cache.bump(
+        feed_cache.follows(follow.author_id),
+        feed_cache.follows(follow.user_id)
+    )
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, **kwargs):
+    if created:
+        change(UserStats, instance.author_id, 'followers_count', 1)
+        change(UserStats, instance.user_id, 'following_count', 1)
+        timeline.backfill(instance.user_id, instance.author_id)
+        bump_follows(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    was = timeline.followers_count(instance.author_id)
+    change(UserStats, instance.author_id, 'followers_count', -1)
+    change(UserStats, instance.user_id, 'following_count', -1)
+    timeline.trim(instance.user_id, instance.author_id)
+    timeline.demote(instance.author_id, was)
+    bump_follows(instance)
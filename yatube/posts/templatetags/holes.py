@@ -0,0 +1,16 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from posts import holes
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def hole(context, name, **arguments):
+    """{% hole 'follow' author=... %} — персональная вставка или метка."""
+    if holes.is_shared():
+        return mark_safe(holes.mark(name, arguments))
+    snippet = context.template.engine.get_template(holes.template(name))
+    with context.push(**arguments):
+        return snippet.render(context)
@@ -0,0 +1,18 @@
+from django import template
+
+from posts import images
+from posts.cards import render_cards
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_cards(posts):
+    """{% post_cards page_obj as cards %} — карточки постов из кеша."""
+    return render_cards(posts)
+
+
+@register.filter
+def image_variants(post):
+    """src и srcset готовых вариантов картинки или None."""
+    return images.srcset(post)
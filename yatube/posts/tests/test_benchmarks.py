@@ -0,0 +1,175 @@
+"""Микробенчмарки горячих путей posts.
+
+Число запросов каждого случая сравнивается с benchmarks.json рядом
+с тестами при каждом запуске тестов. Время (медиана повторов, мс)
+шумит на занятой машине, поэтому сравнивается только с ``BENCH=1``:
+``BENCH=1 python -m pytest yatube/posts/tests/test_benchmarks.py``.
+Время сначала приводится к скорости машины по калибровочному циклу.
+Обновить базовые значения: ``BENCH_UPDATE=1``.
+"""
+import json
+import os
+import statistics
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection
+from django.template.loader import render_to_string
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from core.templatetags.user_filters import addclass
+from posts import feed_cache, views
+from posts.apps import get_comments_page, get_paginator
+from posts.forms import CommentForm, PostForm
+from posts.models import Follow, Group, Post, User
+
+BASELINE = os.path.join(os.path.dirname(__file__), 'benchmarks.json')
+REPEAT = 15
+# Допустимое замедление относительно базы и абсолютный запас на шум
+TOLERANCE = float(os.environ.get('BENCH_TOLERANCE', 1.0))
+SLACK_MS = 1.0
+# Сравнивать ли время с базой
+TIMING = bool(os.environ.get('BENCH'))
+
+
+def median_ms(func, repeat=REPEAT):
+    func()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def calibrate():
+    """Время эталонной работы интерпретатора на этой машине."""
+    return median_ms(lambda: sum(i * i for i in range(100_000)), repeat=7)
+
+
+# Фрагментный кеш отключён: замеряется полный рендер
+@override_settings(CACHES={'default': {
+    'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}})
+class HotPathBenchmarks(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create(
+            username='bench_author', first_name='Автор')
+        cls.reader = User.objects.create(username='bench_reader')
+        cls.group = Group.objects.create(slug='bench', title='Бенчмарк')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for number in range(25):
+            Post.objects.create(
+                text=f'Пост для замера {number} ' * 10,
+                author=cls.author,
+                group=cls.group,
+            )
+        cls.post = Post.objects.first()
+        for number in range(30):
+            cls.post.comments.create(
+                text=f'Комментарий {number}', author=cls.reader)
+        cls.results = {}
+        cls.baseline = {'calibration_ms': calibrate(), 'cases': {}}
+        if os.path.exists(BASELINE):
+            with open(BASELINE) as file:
+                cls.baseline = json.load(file)
+        cls.scale = calibrate() / cls.baseline['calibration_ms']
+
+    @classmethod
+    def tearDownClass(cls):
+        if os.environ.get('BENCH_UPDATE'):
+            with open(BASELINE, 'w') as file:
+                json.dump({
+                    'calibration_ms': round(calibrate(), 3),
+                    'cases': dict(sorted(cls.results.items())),
+                }, file, ensure_ascii=False, indent=2)
+                file.write('\n')
+        super().tearDownClass()
+
+    def request(self, path='/', user=None, **params):
+        request = RequestFactory().get(path, params)
+        request.user = user or AnonymousUser()
+        return request
+
+    def check(self, name, func):
+        with CaptureQueriesContext(connection) as queries:
+            func()
+        if os.environ.get('BENCH_UPDATE'):
+            self.results[name] = {
+                'ms': round(median_ms(func), 3), 'queries': len(queries)}
+            return
+        base = self.baseline['cases'].get(name)
+        self.assertIsNotNone(base, f'Нет базы для {name}, см. BENCH_UPDATE')
+        self.assertLessEqual(
+            len(queries), base['queries'], f'{name}: лишние запросы')
+        if not TIMING:
+            return
+        elapsed = median_ms(func)
+        allowed = base['ms'] * self.scale * (1 + TOLERANCE) + SLACK_MS
+        self.assertLessEqual(
+            elapsed, allowed,
+            f'{name}: {elapsed:.2f} мс при базе {base["ms"]} мс')
+
+    def template_contexts(self):
+        request = self.request(user=self.reader)
+        page = get_paginator(Post.objects.for_feed(), request)
+        post = Post.objects.for_detail().get(pk=self.post.pk)
+        return request, {
+            'posts/index.html': {
+                'page_obj': page, **feed_cache.context(feed_cache.index())},
+            'posts/group_list.html': {
+                'group': self.group, 'page_obj': page,
+                **feed_cache.context(feed_cache.group(self.group.pk))},
+            'posts/profile.html': {
+                'username': self.author, 'page_obj': page,
+                'count': 25, 'stats': self.author.stats, 'following': True,
+                **feed_cache.context(feed_cache.author(self.author.pk))},
+            'posts/follow.html': {
+                'page_obj': page,
+                **feed_cache.context(feed_cache.follow(self.reader.pk))},
+            'posts/post_detail.html': {
+                'post': post, 'count': 25, 'form': CommentForm(),
+                'comments': get_comments_page(post.comments.for_thread())},
+            'posts/create_post.html': {'form': PostForm()},
+            'posts/search.html': {'page_obj': page, 'query': 'Пост'},
+        }
+
+    def test_templates(self):
+        """Рендер шаблонов posts с готовым контекстом."""
+        request, contexts = self.template_contexts()
+        for template, context in contexts.items():
+            with self.subTest(template=template):
+                self.check(f'template {template}', lambda: render_to_string(
+                    template, context, request))
+
+    def test_views(self):
+        """Представления через RequestFactory, без middleware."""
+        cases = {
+            'index': (views.index, {}),
+            'group_posts': (views.group_posts, {'slug': self.group.slug}),
+            'profile': (views.profile, {'username': self.author.username}),
+            'post_detail': (views.post_detail, {'post_id': self.post.pk}),
+            'follow_index': (views.follow_index, {}),
+            'post_search': (views.post_search, {}),
+        }
+        for name, (view, kwargs) in cases.items():
+            with self.subTest(view=name):
+                request = self.request(user=self.reader, q='Пост')
+                self.check(f'view {name}', lambda: view(request, **kwargs))
+
+    def test_paginator(self):
+        """Первая и следующая страница ленты по курсору."""
+        first = get_paginator(Post.objects.for_feed(), self.request())
+        self.check('get_paginator first', lambda: list(get_paginator(
+            Post.objects.for_feed(), self.request())))
+        self.check('get_paginator cursor', lambda: list(get_paginator(
+            Post.objects.for_feed(),
+            self.request(cursor=first.next_cursor))))
+
+    def test_addclass(self):
+        """Фильтр addclass на поле формы."""
+        form = PostForm()
+        self.check('filter addclass', lambda: addclass(
+            form['text'], 'form-control'))
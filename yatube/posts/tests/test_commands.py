@@ -0,0 +1,135 @@
+import json
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts import images
+from posts.images import SIZES
+from posts.models import (Comment, Follow, Group, ImageJob, Post,
+                          TimelineEntry, User, UserStats)
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (b'\x47\x49\x46\x38\x39\x61\x02\x00'
+             b'\x01\x00\x80\x00\x00\x00\x00\x00'
+             b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+             b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+             b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+             b'\x0A\x00\x3B'
+             )
+
+
+class ExplainFeedsCommandTest(TestCase):
+    def test_feeds_use_indexes(self):
+        """Запросы лент читают индексы без полного просмотра таблиц."""
+        out = StringIO()
+        call_command('explain_feeds', '--strict', stdout=out)
+        self.assertIn('post_author_date_idx', out.getvalue())
+
+
+class SeedCommandTest(TestCase):
+    SIZES = {
+        'users': 20, 'groups': 3, 'posts': 60, 'follows': 100,
+        'comments': 40,
+    }
+
+    def seed(self, seed):
+        call_command(
+            'seed_yatube', seed=seed, batch=25, stdout=StringIO(),
+            **self.SIZES
+        )
+
+    def test_seed_creates_consistent_data(self):
+        """Данные создаются вместе со счётчиками и лентами."""
+        self.seed(1)
+        self.assertEqual(Post.objects.count(), self.SIZES['posts'])
+        self.assertEqual(Comment.objects.count(), self.SIZES['comments'])
+        self.assertEqual(Follow.objects.count(), self.SIZES['follows'])
+        stats = UserStats.objects.all()
+        self.assertEqual(
+            sum(row.posts_count for row in stats), self.SIZES['posts'])
+        self.assertEqual(
+            sum(row.followers_count for row in stats),
+            self.SIZES['follows'])
+        self.assertTrue(TimelineEntry.objects.exists())
+        self.assertGreater(
+            Post.objects.values('pub_date').distinct().count(), 1)
+
+    def test_seed_is_deterministic(self):
+        """Одно зерно даёт одни и те же тексты и даты."""
+        self.seed(7)
+        first = list(Post.objects.order_by('pk').values_list(
+            'text', 'pub_date'))
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        self.seed(7)
+        self.assertEqual(
+            list(Post.objects.order_by('pk').values_list(
+                'text', 'pub_date')), first)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageWorkerCommandTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.user = User.objects.create(username='image_author')
+        self.post = Post.objects.create(
+            text='Пост с картинкой',
+            author=self.user,
+            image=SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif'),
+        )
+
+    def test_worker_generates_variants(self):
+        """Загрузка ставит пост в очередь, обработчик нарезает варианты."""
+        self.assertTrue(ImageJob.objects.filter(post=self.post).exists())
+        call_command('image_worker', '--once', stdout=StringIO())
+        self.assertFalse(ImageJob.objects.exists())
+        self.post.refresh_from_db()
+        variants = json.loads(self.post.image_variants)
+        self.assertEqual(
+            [(width, height) for _, width, height in variants['jpg']],
+            list(SIZES)
+        )
+        for name, _, _ in variants['jpg']:
+            self.assertTrue(default_storage.exists(name))
+        response = Client().get(reverse('posts:main-view'))
+        self.assertContains(response, 'srcset=')
+
+    def test_new_image_resets_variants(self):
+        """Новая картинка сбрасывает варианты и снова попадает в очередь."""
+        call_command('image_worker', '--once', stdout=StringIO())
+        self.post.refresh_from_db()
+        self.post.image = SimpleUploadedFile(
+            'other.gif', SMALL_GIF, 'image/gif')
+        self.post.save()
+        self.assertEqual(self.post.image_variants, '')
+        self.assertTrue(ImageJob.objects.filter(post=self.post).exists())
+        response = Client().get(reverse('posts:main-view'))
+        self.assertContains(response, self.post.image.url)
+
+    def test_image_replaced_while_processing_stays_queued(self):
+        """Задача, которую во время нарезки поставили заново, остаётся."""
+        def replace_image(post):
+            post.image = SimpleUploadedFile(
+                'other.gif', SMALL_GIF, 'image/gif')
+            post.save()
+
+        with mock.patch.object(images, 'process', side_effect=replace_image):
+            images.run_jobs(10)
+        self.post.refresh_from_db()
+        self.assertEqual(
+            ImageJob.objects.get(post=self.post).image, self.post.image.name)
+        call_command('image_worker', '--once', stdout=StringIO())
+        self.assertFalse(ImageJob.objects.exists())
@@ -0,0 +1,81 @@
+import requests
+from django.core.management.base import CommandError
+from django.test import LiveServerTestCase, SimpleTestCase
+from django.urls import reverse
+
+from posts import loadtest
+from posts.models import Group, Post, User
+
+
+class SummaryTest(SimpleTestCase):
+    def test_percentiles_per_route(self):
+        """Сводка считает перцентили и ошибки по маршрутам."""
+        samples = [('main-view', ms / 1000, True) for ms in range(1, 101)]
+        samples.append(('profile', 0.5, False))
+        result = loadtest.summarize(samples, elapsed=10)
+        main = result['routes']['main-view']
+        self.assertEqual(main['requests'], 100)
+        self.assertEqual(main['rps'], 10)
+        self.assertAlmostEqual(main['p50'], 50.5)
+        self.assertAlmostEqual(main['p99'], 99.01)
+        self.assertEqual(result['routes']['profile']['errors'], 1)
+        self.assertEqual(result['routes']['total']['requests'], 101)
+
+    def test_compare_flags_regressions(self):
+        """Сравнение находит выросшие задержки и упавший rps."""
+        row = {'p50': 10, 'p95': 20, 'p99': 30, 'rps': 100}
+        baseline = {'routes': {'main-view': row}}
+        slower = {'routes': {'main-view': {**row, 'p95': 25, 'rps': 70}}}
+        self.assertEqual(loadtest.compare(baseline, baseline, 0.2), [])
+        self.assertEqual(
+            loadtest.compare(slower, baseline, 0.2),
+            [('main-view', 'p95', 20, 25), ('main-view', 'rps', 100, 70)]
+        )
+
+    def test_write_succeeds_only_on_expected_redirect(self):
+        """Запись засчитывается только по редиректу на её результат."""
+        expected = reverse('posts:post_detail', args=[1])
+        for status, location, ok in (
+            (302, expected, True),
+            (302, 'http://testserver' + expected, True),
+            (302, reverse('users:login') + '?next=' + expected, False),
+            (200, '', False),
+        ):
+            with self.subTest(status=status, location=location):
+                response = requests.Response()
+                response.status_code = status
+                response.headers['Location'] = location
+                self.assertEqual(
+                    loadtest.succeeded(response, expected), ok)
+
+
+class LoadRunTest(LiveServerTestCase):
+    def test_mixed_scenario_against_live_server(self):
+        """Смешанный сценарий проходит без ошибок, включая запись."""
+        user = User.objects.create_user('loader', password='secret')
+        group = Group.objects.create(slug='load', title='Нагрузка')
+        post = Post.objects.create(text='Пост', author=user, group=group)
+        run = loadtest.LoadRun(
+            self.live_server_url, loadtest.SCENARIOS['mixed'],
+            {'posts': [post.pk], 'usernames': [user.username],
+             'groups': [group.slug]},
+            duration=30, total=40,
+        )
+        # Один поток: общая SQLite-база в памяти не держит
+        # параллельную запись
+        result = run.execute(1, [('loader', 'secret')])
+        self.assertEqual(result['routes']['total']['requests'], 40)
+        self.assertEqual(result['routes']['total']['errors'], 0)
+
+    def test_failed_login_aborts_write_run(self):
+        """Без входа сценарий с записью не запускается."""
+        User.objects.create_user('loader', password='secret')
+        run = loadtest.LoadRun(
+            self.live_server_url, loadtest.SCENARIOS['write'],
+            {'posts': [1], 'usernames': [], 'groups': []},
+            duration=30, total=1,
+        )
+        for accounts in ([('loader', 'wrong')], []):
+            with self.subTest(accounts=accounts):
+                with self.assertRaises(CommandError):
+                    run.execute(1, accounts)
@@ -1,7 +1,8 @@
 from django.contrib.auth import get_user_model
 from django.test import TestCase
 
-from ..models import Group, Post
+from ..counters import recount
+from ..models import Comment, Follow, Group, Post, UserStats
 
 User = get_user_model()
 
@@ -32,3 +33,61 @@ class PostModelTest(TestCase):
         for expect, model in test_models_expect.items():
             with self.subTest(field=expect):
                 self.assertEqual(str(model), expect)
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+
+    def test_counters_follow_writes(self):
+        """Счётчики меняются при создании и удалении объектов."""
+        post = Post.objects.create(
+            author=self.author, text='Тестовый пост', group=self.group)
+        Comment.objects.create(post=post, author=self.reader, text='Коммент')
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        counters = {
+            'posts': (UserStats.objects.get(user=self.author).posts_count, 1),
+            'followers': (
+                UserStats.objects.get(user=self.author).followers_count, 1),
+            'following': (
+                UserStats.objects.get(user=self.reader).following_count, 1),
+            'comments': (Post.objects.get(pk=post.pk).comments_count, 1),
+            'group': (Group.objects.get(pk=self.group.pk).posts_count, 1),
+        }
+        for name, (value, expected) in counters.items():
+            with self.subTest(counter=name):
+                self.assertEqual(value, expected)
+        follow.delete()
+        post.delete()
+        stats = UserStats.objects.get(user=self.author)
+        self.assertEqual(stats.posts_count, 0)
+        self.assertEqual(stats.followers_count, 0)
+        self.assertEqual(Group.objects.get(pk=self.group.pk).posts_count, 0)
+
+    def test_group_change_moves_counter(self):
+        """Смена группы переносит пост между счётчиками групп."""
+        post = Post.objects.create(
+            author=self.author, text='Тестовый пост', group=self.group)
+        post.group = None
+        post.save()
+        self.assertEqual(Group.objects.get(pk=self.group.pk).posts_count, 0)
+
+    def test_recount_fixes_drift(self):
+        """recount исправляет рассинхронизированные счётчики."""
+        Post.objects.bulk_create([
+            Post(author=self.author, text='Без сигналов', group=self.group)
+        ])
+        fixed = recount()
+        self.assertEqual(fixed['UserStats.posts_count'], 1)
+        self.assertEqual(fixed['Group.posts_count'], 1)
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).posts_count, 1)
+        self.assertEqual(recount()['UserStats.posts_count'], 0)
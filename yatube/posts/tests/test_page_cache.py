@@ -0,0 +1,189 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.test import (
+    Client, TestCase, TransactionTestCase, override_settings)
+from django.urls import reverse
+
+from core import stampede
+from posts import page_cache
+from posts.models import Comment, Follow, Post, User
+
+
+@override_settings(PAGE_CACHE_ENABLED=True, PAGE_CACHE_BACKGROUND=False)
+class PageCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create(username='author')
+        cls.reader = User.objects.create(username='reader')
+        cls.post = Post.objects.create(text='Первый пост', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def get(self, url):
+        return self.guest_client.get(url)
+
+    def state(self, url):
+        return self.get(url).get(page_cache.HEADER)
+
+    def test_second_request_is_hit(self):
+        url = reverse('posts:main-view')
+        first = self.get(url)
+        second = self.get(url)
+        self.assertEqual(first[page_cache.HEADER], 'miss')
+        self.assertEqual(second[page_cache.HEADER], 'hit')
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['Content-Type'], first['Content-Type'])
+
+    def test_query_order_does_not_matter(self):
+        url = reverse('posts:main-view')
+        self.get(url + '?page=1&x=2')
+        self.assertEqual(self.state(url + '?x=2&page=1'), 'hit')
+        self.assertEqual(self.state(url + '?page=2'), 'miss')
+
+    def client_for(self, user):
+        client = Client()
+        client.force_login(user)
+        return client
+
+    def test_logged_in_user_gets_own_header(self):
+        """Общая страница дорисовывается вставками посетителя."""
+        self.reader.first_name = 'Читатель'
+        self.reader.save()
+        url = reverse('posts:main-view')
+        self.assertNotContains(self.get(url), 'Читатель')
+        response = self.client_for(self.reader).get(url)
+        self.assertEqual(response[page_cache.HEADER], 'hit')
+        self.assertContains(response, 'Пользователь: Читатель')
+        self.assertContains(response, reverse('posts:post_create'))
+        self.assertNotContains(self.get(url), 'Читатель')
+        self.assertNotContains(response, '<!--hole:')
+
+    def test_post_buttons_per_visitor(self):
+        url = reverse('posts:post_detail', args=(self.post.pk,))
+        edit = reverse('posts:post_edit', args=(self.post.pk,))
+        comment = reverse('posts:add_comment', args=(self.post.pk,))
+        guest = self.get(url)
+        self.assertNotContains(guest, edit)
+        self.assertNotContains(guest, comment)
+        author = self.client_for(self.author).get(url)
+        self.assertEqual(author[page_cache.HEADER], 'hit')
+        self.assertContains(author, edit)
+        self.assertContains(author, 'csrfmiddlewaretoken')
+        self.assertIn(settings.CSRF_COOKIE_NAME, author.cookies)
+        reader = self.client_for(self.reader).get(url)
+        self.assertNotContains(reader, edit)
+        self.assertContains(reader, comment)
+
+    def test_follow_button_per_visitor(self):
+        Follow.objects.create(user=self.reader, author=self.author)
+        url = reverse('posts:profile', args=(self.author.username,))
+        unfollow = reverse(
+            'posts:profile_unfollow', args=(self.author.username,))
+        self.assertNotContains(self.get(url), unfollow)
+        response = self.client_for(self.reader).get(url)
+        self.assertEqual(response[page_cache.HEADER], 'hit')
+        self.assertContains(response, unfollow)
+
+    def test_writer_gets_fresh_page(self):
+        """После своей записи посетитель не получает копию из кеша."""
+        url = reverse('posts:main-view')
+        client = self.client_for(self.reader)
+        client.get(url)
+        self.assertEqual(client.get(url)[page_cache.HEADER], 'hit')
+        client.post(
+            reverse('posts:add_comment', args=(self.post.pk,)),
+            {'text': 'Комментарий'})
+        self.assertIn(settings.REPLICA_STICKY_COOKIE, client.cookies)
+        self.assertEqual(client.get(url)[page_cache.HEADER], 'miss')
+        self.assertEqual(self.state(url), 'hit')
+
+    def test_other_views_not_cached(self):
+        self.assertIsNone(self.state(reverse('posts:search')))
+
+    def test_new_post_shown_at_once(self):
+        url = reverse('posts:main-view')
+        self.get(url)
+        Post.objects.create(text='Второй пост', author=self.author)
+        response = self.get(url)
+        self.assertEqual(response[page_cache.HEADER], 'miss')
+        self.assertContains(response, 'Второй пост')
+        self.assertEqual(self.state(url), 'hit')
+
+    def test_comment_invalidates_post_page(self):
+        url = reverse('posts:post_detail', args=(self.post.pk,))
+        self.get(url)
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий')
+        response = self.get(url)
+        self.assertEqual(response[page_cache.HEADER], 'miss')
+        self.assertContains(response, 'Комментарий')
+
+    def test_follow_invalidates_profile(self):
+        url = reverse('posts:profile', args=(self.author.username,))
+        self.get(url)
+        self.assertEqual(self.state(url), 'hit')
+        Follow.objects.create(user=self.reader, author=self.author)
+        response = self.get(url)
+        self.assertEqual(response[page_cache.HEADER], 'miss')
+        self.assertContains(response, 'Подписчиков: 1')
+
+    @override_settings(PAGE_CACHE_MAX_AGE=0)
+    def test_old_page_refreshed(self):
+        url = reverse('posts:main-view')
+        self.get(url)
+        self.assertEqual(self.state(url), 'stale')
+
+    @override_settings(PAGE_CACHE_MAX_AGE=0)
+    def test_single_refresh(self):
+        """Пока страницу обновляет один запрос, другие её не собирают."""
+        url = reverse('posts:main-view')
+        request = self.get(url).wsgi_request
+        created = page_cache.get(request)['created']
+        self.assertTrue(page_cache.start_refresh(request))
+        self.assertEqual(self.state(url), 'stale')
+        self.assertEqual(page_cache.get(request)['created'], created)
+        page_cache.finish_refresh(request)
+        self.assertEqual(self.state(url), 'stale')
+        self.assertGreater(page_cache.get(request)['created'], created)
+
+    def test_page_with_stale_fragment_not_stored(self):
+        """Страница с прошлой копией фрагмента не кешируется."""
+        url = reverse('posts:main-view')
+        self.get(url)
+        lock = stampede.LOCK_PREFIX + make_template_fragment_key(
+            'index_page', [1, ''])
+        cache.add(lock, 1)
+        Post.objects.create(text='Второй пост', author=self.author)
+        response = self.get(url)
+        self.assertEqual(response[page_cache.HEADER], 'miss')
+        self.assertNotContains(response, 'Второй пост')
+        self.assertEqual(self.state(url), 'miss')
+        cache.delete(lock)
+        self.assertContains(self.get(url), 'Второй пост')
+        self.assertEqual(self.state(url), 'hit')
+
+
+@override_settings(PAGE_CACHE_ENABLED=True, PAGE_CACHE_MAX_AGE=0)
+class BackgroundRefreshTests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        author = User.objects.create(username='author')
+        Post.objects.create(text='Первый пост', author=author)
+
+    def test_stale_page_refreshed_in_thread(self):
+        url = reverse('posts:main-view')
+        request = self.client.get(url).wsgi_request
+        created = page_cache.get(request)['created']
+        response = self.client.get(url)
+        self.assertEqual(response[page_cache.HEADER], 'stale')
+        lock = page_cache.LOCK_PREFIX + page_cache.key(request)
+        deadline = time.monotonic() + 5
+        while cache.has_key(lock) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertFalse(cache.has_key(lock))
+        self.assertGreater(page_cache.get(request)['created'], created)
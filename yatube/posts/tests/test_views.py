@@ -1,16 +1,23 @@
 import shutil
 import tempfile
+from io import StringIO
 
 from django import forms
 from django.conf import settings
 from django.core.cache import cache
+from django.core.management import call_command
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.paginator import Paginator
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from sorl.thumbnail import get_thumbnail
 
-from posts.models import Follow, Group, Post, User
-from yatube.settings import POSTS_ON_PAGE
+from posts import feed_cache, thumbnails, timeline
+from posts.counters import recount
+from posts.models import (
+    Comment, Follow, Group, Post, TimelineEntry, TimelineJob, User, UserStats)
+from posts.paginator import NEXT, pack_token
+from yatube.settings import COMMENTS_ON_PAGE, POSTS_ON_PAGE
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
@@ -224,17 +231,130 @@ class PostPagesTests(TestCase):
         # заполняем кэш
         cache_test = self.authorized_client.get(
             reverse('posts:main-view')).content
-        # удаляем запись
+        # меняем запись в обход сигналов: версия ленты не меняется
+        Post.objects.filter(pk=post_cache.pk).update(text='Изменено')
+        post_updated = self.authorized_client.get(
+            reverse('posts:main-view')).content
+        self.assertEqual(cache_test, post_updated)
+        # удаление поста сбрасывает фрагмент без ожидания
         post_cache.delete()
-        # проверяем кэш
         post_deleted = self.authorized_client.get(
             reverse('posts:main-view')).content
-        self.assertEqual(cache_test, post_deleted)
-        # проверяем что кэш очистился
-        cache.clear()
-        response_non_cached = self.authorized_client.get(
-            reverse('posts:main-view')).content
-        self.assertNotEqual(cache_test, response_non_cached)
+        self.assertNotEqual(cache_test, post_deleted)
+        self.assertNotIn('Изменено', post_deleted.decode())
+
+    def test_cache_invalidated_by_author_rename(self):
+        """Переименование автора сбрасывает кеш всех лент."""
+        pages = (
+            reverse('posts:main-view'),
+            reverse('posts:group_list',
+                    kwargs={'slug': self.post.group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': self.user.username}),
+        )
+        for page in pages:
+            self.authorized_client.get(page)
+        self.user.first_name = 'Переименованный'
+        self.user.save()
+        for page in pages:
+            with self.subTest(page=page):
+                response = self.authorized_client.get(page)
+                self.assertIn('Переименованный', response.content.decode())
+
+    def test_save_without_rename_keeps_feeds(self):
+        """Сохранение без смены имени не сбрасывает ленты."""
+        user = User.objects.get(pk=self.user.pk)
+        group = Group.objects.get(pk=self.post.group.pk)
+        other = User.objects.create(username='other_author')
+        names = (
+            feed_cache.index(), feed_cache.user(user.pk),
+            feed_cache.author(other.pk), feed_cache.group_info(group.pk),
+        )
+        before = feed_cache.versions(names)
+        user.save()
+        group.save()
+        self.assertEqual(feed_cache.versions(names), before)
+        user.last_name = 'Новая фамилия'
+        user.save()
+        after = feed_cache.versions(names)
+        self.assertNotEqual(
+            after[feed_cache.index()], before[feed_cache.index()])
+        self.assertEqual(
+            after[feed_cache.author(other.pk)],
+            before[feed_cache.author(other.pk)])
+
+    def test_post_card_shared_between_feeds(self):
+        """Карточка поста рендерится один раз для всех лент."""
+        post = Post.objects.create(
+            text='Карточка из кеша',
+            author=self.user,
+            group=self.post.group,
+        )
+        self.authorized_client.get(reverse('posts:main-view'))
+        # в обход сигналов: версии карточки и ленты группы не меняются,
+        # но фрагмент ленты строится заново
+        Post.objects.filter(pk=post.pk).update(text='Изменено')
+        feed_cache.bump(feed_cache.group(self.post.group.pk))
+        response = self.authorized_client.get(reverse(
+            'posts:group_list', kwargs={'slug': self.post.group.slug}))
+        self.assertIn('Карточка из кеша', response.content.decode())
+        # правка поста сбрасывает карточку
+        post.text = 'Отредактировано'
+        post.save()
+        response = self.authorized_client.get(reverse('posts:main-view'))
+        self.assertIn('Отредактировано', response.content.decode())
+
+    def test_post_card_invalidated_by_group_rename(self):
+        """Переименование группы сбрасывает карточки её постов."""
+        group = Group.objects.create(slug='renamed', title='Старое имя')
+        Post.objects.create(text='Пост группы', author=self.user, group=group)
+        self.authorized_client.get(reverse('posts:main-view'))
+        group.slug = 'renamed-new'
+        group.save()
+        response = self.authorized_client.get(reverse('posts:main-view'))
+        self.assertIn(
+            reverse('posts:group_list', kwargs={'slug': 'renamed-new'}),
+            response.content.decode()
+        )
+
+    def test_feeds_skip_thumbnail_store(self):
+        """Ленты не обращаются к хранилищу миниатюр."""
+        pages = (
+            reverse('posts:main-view'),
+            reverse('posts:group_list',
+                    kwargs={'slug': self.post.group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': self.user.username}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        )
+        for page in pages:
+            with self.subTest(page=page):
+                response = self.authorized_client.get(page)
+                self.assertEqual(response['X-Thumbnail-Lookups'], '0')
+
+    def test_thumbnail_lookups_counted(self):
+        """Чтение хранилища миниатюр попадает в счётчик."""
+        token = thumbnails.lookups.set(0)
+        try:
+            get_thumbnail(self.post.image, '10x10')
+            self.assertGreater(thumbnails.lookups.get(), 0)
+        finally:
+            thumbnails.lookups.reset(token)
+
+    def test_cache_keeps_other_groups(self):
+        """Новый пост не сбрасывает кеш чужой группы."""
+        group = Group.objects.create(slug='other', title='Другая группа')
+        other_version = feed_cache.version(feed_cache.group(group.pk))
+        index_version = feed_cache.version(feed_cache.index())
+        Post.objects.create(
+            text='Пост в первой группе',
+            author=self.user,
+            group=self.post.group,
+        )
+        self.assertEqual(
+            feed_cache.version(feed_cache.group(group.pk)), other_version)
+        self.assertNotEqual(
+            feed_cache.version(feed_cache.index()), index_version)
 
 
 class PostGroupTests(TestCase):
@@ -327,6 +447,56 @@ class PaginatorViewsTest(TestCase):
         self.assertEqual(len(response.context['page_obj']),
                          self.POSTS_ON_LAST_PAGE)
 
+    def test_next_cursor_continues_feed(self):
+        """Курсор следующей страницы продолжает ленту без повторов."""
+        first_page = self.authorized_client_1.get(
+            reverse('posts:main-view')).context['page_obj']
+        second_page = self.authorized_client_1.get(
+            reverse('posts:main-view'),
+            {'cursor': first_page.next_cursor}
+        ).context['page_obj']
+        self.assertEqual(len(second_page), self.POSTS_ON_LAST_PAGE)
+        self.assertEqual(second_page.number, 2)
+        self.assertIsNone(second_page.next_cursor)
+        self.assertFalse(
+            set(first_page.object_list) & set(second_page.object_list)
+        )
+
+    def test_previous_cursor_returns_first_page(self):
+        """Курсор предыдущей страницы возвращает на первую страницу."""
+        second_page = self.authorized_client_1.get(
+            reverse('posts:main-view') + '?page=2').context['page_obj']
+        first_page = self.authorized_client_1.get(
+            reverse('posts:main-view'),
+            {'cursor': second_page.previous_cursor}
+        ).context['page_obj']
+        self.assertEqual(first_page.number, 1)
+        self.assertIsNone(first_page.previous_cursor)
+        self.assertEqual(
+            first_page.object_list,
+            list(Post.objects.order_by('-pub_date', '-pk')[:POSTS_ON_PAGE])
+        )
+
+    def test_broken_cursor_returns_first_page(self):
+        """Испорченный курсор открывает первую страницу."""
+        response = self.authorized_client_1.get(
+            reverse('posts:main-view'), {'cursor': 'broken'})
+        self.assertEqual(response.context['page_obj'].number, 1)
+        self.assertEqual(len(response.context['page_obj']), POSTS_ON_PAGE)
+
+    def test_tampered_cursor_returns_first_page(self):
+        """Курсор с несуществующей датой или огромным ключом — испорчен."""
+        for payload in (
+            [NEXT, '2021-13-01T00:00:00', 1, 2],
+            [NEXT, '2021-01-01T00:00:00', 2 ** 63, 2],
+            [NEXT, '2021-01-01T00:00:00', '1', 2],
+        ):
+            with self.subTest(payload=payload):
+                response = self.authorized_client_1.get(
+                    reverse('posts:main-view'),
+                    {'cursor': pack_token(payload)})
+                self.assertEqual(response.context['page_obj'].number, 1)
+
 
 class FollowViewTest(TestCase):
     @classmethod
@@ -416,3 +586,253 @@ class FollowViewTest(TestCase):
         follow_not_subscriber = self.authorized_client_2.get(
             reverse('posts:follow_index')).context.get('page_obj').object_list
         self.assertNotIn(post, follow_not_subscriber)
+
+    def test_follow_backfills_timeline(self):
+        """После подписки в ленте появляются старые посты автора"""
+        self.authorized_client_2.post(
+            reverse('posts:profile_follow', args=[self.author_2]),
+        )
+        follow_list = self.authorized_client_2.get(
+            reverse('posts:follow_index')).context.get('page_obj').object_list
+        self.assertIn(self.post, follow_list)
+
+    def test_unfollow_trims_timeline(self):
+        """После отписки записи автора удаляются из ленты"""
+        self.authorized_client.post(
+            reverse('posts:profile_unfollow', args=[self.author_2]),
+        )
+        self.assertFalse(
+            TimelineEntry.objects.filter(
+                user=self.user,
+                author=self.author_2
+            ).exists()
+        )
+
+    @override_settings(REPLICA_DATABASES=['replica1'])
+    def test_follow_by_get_reads_primary(self):
+        """После подписки по GET лента читается с default, а не с
+        отстающей реплики (в тестах реплики нет вовсе)"""
+        response = self.authorized_client_2.get(
+            reverse('posts:profile_follow', args=[self.author_2]))
+        self.assertIn(settings.REPLICA_STICKY_COOKIE, response.cookies)
+        follow_list = self.authorized_client_2.get(
+            reverse('posts:follow_index')).context.get('page_obj').object_list
+        self.assertIn(self.post, follow_list)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_popular_author_merged_on_read(self):
+        """Посты популярного автора не раскладываются по лентам,
+        а подмешиваются при чтении"""
+        post = Post.objects.create(
+            text='Тестовый популярного автора',
+            author=self.author_2
+        )
+        self.assertFalse(
+            TimelineEntry.objects.filter(post=post).exists()
+        )
+        follow_list = self.authorized_client.get(
+            reverse('posts:follow_index')).context.get('page_obj').object_list
+        self.assertIn(post, follow_list)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=2)
+    def test_unpopular_author_posts_backfilled(self):
+        """Когда автор перестаёт быть популярным, его посты,
+        вышедшие без раскладки, появляются в лентах подписчиков"""
+        Follow.objects.create(user=self.author, author=self.author_2)
+        post = Post.objects.create(
+            text='Тестовый популярного автора',
+            author=self.author_2
+        )
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+        self.authorized_client_2.post(
+            reverse('posts:profile_unfollow', args=[self.author_2]),
+        )
+        self.assertTrue(
+            TimelineJob.objects.filter(author=self.author_2).exists())
+        # Пока задача ждёт обработчика, посты подмешиваются при чтении
+        for _ in range(2):
+            follow_list = self.authorized_client.get(
+                reverse('posts:follow_index')
+            ).context.get('page_obj').object_list
+            self.assertIn(post, follow_list)
+            call_command('timeline_worker', '--once', stdout=StringIO())
+        self.assertFalse(TimelineJob.objects.exists())
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.user, post=post).exists()
+        )
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=2)
+    def test_concurrent_unfollows_demote_author(self):
+        """Отписка, увидевшая счётчик до соседней, тоже ловит переход"""
+        Follow.objects.create(user=self.author, author=self.author_2)
+        # Обе отписки прочитали 2, а после изменения видят уже 0
+        UserStats.objects.filter(user=self.author_2).update(
+            followers_count=0)
+        timeline.demote(self.author_2.pk, was=2)
+        self.assertTrue(
+            TimelineJob.objects.filter(author=self.author_2).exists())
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=2)
+    def test_recount_demotes_author(self):
+        """Пересчёт счётчика через порог ставит автора в очередь"""
+        UserStats.objects.filter(user=self.author_2).update(
+            followers_count=5)
+        recount()
+        self.assertTrue(
+            TimelineJob.objects.filter(author=self.author_2).exists())
+
+
+class SearchViewTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='test_author')
+        cls.post = Post.objects.create(
+            text='Ёжик нашёл рыжую кошку в тумане',
+            author=cls.user,
+        )
+        cls.other = Post.objects.create(
+            text='Совсем другой текст <script>',
+            author=cls.user,
+        )
+
+    def search(self, query, **params):
+        return self.client.get(
+            reverse('posts:search'), {'q': query, **params}
+        ).context['page_obj']
+
+    def test_search_handles_russian_forms(self):
+        """Поиск находит другие формы слова и не различает е и ё."""
+        for query in ('кошки', 'ежик', 'туманом', 'РЫЖАЯ'):
+            with self.subTest(query=query):
+                self.assertEqual(self.search(query).object_list, [self.post])
+
+    def test_search_follows_edits(self):
+        """Индекс обновляется при редактировании и удалении поста."""
+        post = Post.objects.create(text='Пост про попугая', author=self.user)
+        post.text = 'Теперь про собаку'
+        post.save()
+        self.assertEqual(self.search('попугай').object_list, [])
+        self.assertEqual(self.search('собака').object_list, [post])
+        post.delete()
+        self.assertEqual(self.search('собака').object_list, [])
+
+    def test_snippet_is_escaped(self):
+        """Фрагмент подсвечивает найденное и экранирует текст поста."""
+        snippet = self.search('другой')[0].snippet
+        self.assertIn('<mark>другой</mark>', snippet)
+        self.assertIn('&lt;script&gt;', snippet)
+
+    def test_search_pages_by_cursor(self):
+        """Результаты листаются курсором без повторов."""
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Кошка номер {i}')
+            for i in range(POSTS_ON_PAGE)
+        )
+        first_page = self.search('кошка')
+        second_page = self.search('кошка', cursor=first_page.next_cursor)
+        self.assertEqual(len(first_page), POSTS_ON_PAGE)
+        self.assertEqual(len(second_page), 1)
+        self.assertFalse(
+            set(first_page.object_list) & set(second_page.object_list)
+        )
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке использует тот же индекс."""
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password')
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'кошки'})
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.post])
+
+
+class QueryBudgetTest(TestCase):
+    """Число запросов страницы не зависит от числа постов на ней."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create(username='reader')
+        authors = [
+            User.objects.create(username=f'author_{i}', first_name=f'Имя {i}')
+            for i in range(3)
+        ]
+        groups = [
+            Group.objects.create(slug=f'budget-{i}', title=f'Группа {i}')
+            for i in range(3)
+        ]
+        for author in authors:
+            Follow.objects.create(user=cls.reader, author=author)
+        for i in range(POSTS_ON_PAGE + 2):
+            Post.objects.create(
+                text=f'Пост {i}',
+                author=authors[i % 3],
+                group=groups[i % 3],
+            )
+        cls.post = Post.objects.filter(author=authors[0]).first()
+        for author in authors:
+            cls.post.comments.create(text='Комментарий', author=author)
+        cls.author = authors[0]
+        cls.group = groups[0]
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def test_views_query_budget(self):
+        """Каждая страница укладывается в бюджет запросов."""
+        # Сессия и пользователь запроса занимают два запроса
+        budgets = {
+            reverse('posts:main-view'): 3,
+            reverse('posts:group_list',
+                    kwargs={'slug': self.group.slug}): 4,
+            reverse('posts:profile',
+                    kwargs={'username': self.author.username}): 5,
+            reverse('posts:follow_index'): 4,
+            reverse('posts:post_detail',
+                    kwargs={'post_id': self.post.pk}): 4,
+            reverse('posts:search') + '?q=Пост': 4,
+        }
+        for url, budget in budgets.items():
+            with self.subTest(url=url):
+                with self.assertNumQueries(budget):
+                    self.client.get(url)
+
+
+class CommentsPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='commentator')
+        cls.post = Post.objects.create(
+            text='Обсуждаемый пост', author=cls.user)
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=cls.user, text=f'Комментарий {i}')
+            for i in range(COMMENTS_ON_PAGE + 5)
+        )
+
+    def test_first_page_inline(self):
+        """На странице поста только первая страница комментариев."""
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}))
+        comments = response.context['comments']
+        self.assertEqual(len(comments), COMMENTS_ON_PAGE)
+        self.assertIsNotNone(comments.next_cursor)
+        self.assertContains(response, comments.next_cursor)
+
+    def test_next_page_fragment(self):
+        """Остальные комментарии отдаёт фрагмент по курсору."""
+        first = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        ).context['comments']
+        response = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': self.post.pk}),
+            {'cursor': first.next_cursor},
+        )
+        comments = response.context['comments']
+        self.assertEqual(len(comments), 5)
+        self.assertIsNone(comments.next_cursor)
+        self.assertFalse(set(first) & set(comments))
+        self.assertNotContains(response, '<html')
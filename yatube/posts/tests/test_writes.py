@@ -0,0 +1,137 @@
+import threading
+import time
+
+from django.db import OperationalError, connection
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from core import instrumentation
+from posts import writes
+from posts.models import Follow, User
+
+
+@override_settings(WRITE_RETRY_BASE=0, WRITE_RETRY_MAX=0)
+class WriteRetryTest(TransactionTestCase):
+    def test_begin_immediate(self):
+        with CaptureQueriesContext(connection) as queries:
+            writes.run(User.objects.create, username='immediate')
+        self.assertEqual(queries[0]['sql'], 'BEGIN IMMEDIATE')
+
+    def test_locked_transaction_retried(self):
+        """Транзакция с database is locked повторяется целиком."""
+        attempts = []
+
+        def write():
+            User.objects.create(username=f'retry{len(attempts)}')
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise OperationalError('database is locked')
+
+        with instrumentation.collect() as stats:
+            writes.run(write)
+        self.assertEqual(stats.lock_retries, 2)
+        self.assertEqual(
+            list(User.objects.values_list('username', flat=True)),
+            ['retry2'])
+
+    def test_other_errors_not_retried(self):
+        def write():
+            raise OperationalError('no such table: missing')
+
+        with self.assertRaises(OperationalError):
+            writes.run(write)
+
+    def test_gives_up_after_retries(self):
+        def write():
+            raise OperationalError('database is locked')
+
+        with override_settings(WRITE_RETRIES=1):
+            with self.assertRaises(OperationalError):
+                writes.run(write)
+
+
+class WriteQueueTest(TransactionTestCase):
+    @override_settings(WRITE_RETRY_BASE=0, WRITE_RETRY_MAX=0)
+    def test_locked_batch_retried(self):
+        """database is locked в задании повторяет всю пачку."""
+        attempts = []
+
+        def write():
+            attempts.append(1)
+            if len(attempts) < 2:
+                raise OperationalError('database is locked')
+            return User.objects.create(username='queued').username
+
+        self.assertEqual(writes.WriteQueue().submit(write), 'queued')
+        self.assertEqual(len(attempts), 2)
+
+    def test_waiting_jobs_share_transaction(self):
+        """Задания, ждавшие занятую базу, пишутся одной пачкой."""
+        author = User.objects.create(username='author')
+        readers = [
+            User.objects.create(username=f'reader{index}')
+            for index in range(3)
+        ]
+        queue = writes.WriteQueue()
+        queue.busy = True
+        executed_in = []
+        errors = []
+
+        def follow(reader):
+            executed_in.append(threading.get_ident())
+            Follow.objects.create(user=reader, author=author)
+
+        def submit(reader):
+            try:
+                queue.submit(lambda: follow(reader))
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=submit, args=(reader,))
+            for reader in readers
+        ] + [threading.Thread(target=submit, args=(readers[0],))]
+        for thread in threads:
+            thread.start()
+        while len(queue.pending) < len(threads):
+            time.sleep(0.01)
+        # Прежний ведущий закончил: очередь переходит к первому ждущему
+        with queue.lock:
+            queue.pending[0].leader = True
+            queue.pending[0].wake.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(set(executed_in)), 1)
+        self.assertEqual(Follow.objects.count(), 3)
+        # Повторная подписка упала в своей точке сохранения
+        self.assertEqual(len(errors), 1)
+        self.assertFalse(queue.busy)
+
+    def test_interrupted_leader_wakes_batch(self):
+        """Прерванный ведущий будит всю пачку и пробрасывает прерывание."""
+        queue = writes.WriteQueue()
+        waiting = writes.Job(lambda: None)
+        queue.pending.append(waiting)
+
+        def interrupt():
+            raise KeyboardInterrupt
+
+        with self.assertRaises(KeyboardInterrupt):
+            queue.submit(interrupt)
+        self.assertTrue(waiting.wake.is_set())
+        self.assertIsInstance(waiting.error, RuntimeError)
+        self.assertFalse(queue.busy)
+
+    @override_settings(WRITE_QUEUE_TIMEOUT=0.01)
+    def test_stuck_queue_written_inline(self):
+        """Не дождавшись ведущего, задание записывается само."""
+        queue = writes.WriteQueue()
+        queue.busy = True
+        self.assertEqual(
+            queue.submit(
+                lambda: User.objects.create(username='inline').username),
+            'inline'
+        )
+        self.assertEqual(queue.pending, [])
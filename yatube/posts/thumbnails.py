@@ -0,0 +1,19 @@
+"""Счётчик обращений к key-value хранилищу sorl-thumbnail.
+
+Ленты берут метаданные картинок из строки поста (см. posts.images)
+и в хранилище миниатюр не ходят. Счётчик за запрос выводится
+в заголовке ответа, чтобы регрессия была видна сразу.
+"""
+import contextvars
+
+from sorl.thumbnail.kvstores.cached_db_kvstore import KVStore
+
+lookups = contextvars.ContextVar('thumbnail_lookups', default=0)
+
+
+class CountingKVStore(KVStore):
+    """Стандартное хранилище sorl, которое считает чтения."""
+
+    def _get_raw(self, key):
+        lookups.set(lookups.get() + 1)
+        return super()._get_raw(key)
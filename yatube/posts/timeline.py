@@ -0,0 +1,154 @@
+"""Материализованная лента подписок (fan-out on write).
+
+При публикации пост раскладывается по лентам всех подписчиков автора,
+поэтому чтение ``follow_index`` — это выборка по индексу
+``(user, pub_date, post)``. Посты авторов, у которых подписчиков больше
+``TIMELINE_FANOUT_LIMIT``, не раскладываются, а подмешиваются при чтении.
+"""
+from operator import attrgetter
+
+from django.conf import settings
+from django.db.models import Q
+
+from . import feed_cache
+from .apps import get_paginator
+from .models import (
+    FEED_FIELDS, Follow, Post, TimelineEntry, TimelineJob, UserStats)
+
+BATCH_SIZE = 500
+
+
+def followers_count(author_id):
+    return UserStats.objects.filter(user_id=author_id).values_list(
+        'followers_count', flat=True).first() or 0
+
+
+def is_fanout_author(author_id):
+    return followers_count(author_id) < settings.TIMELINE_FANOUT_LIMIT
+
+
+def _bulk_insert(entries):
+    TimelineEntry.objects.bulk_create(
+        entries, batch_size=BATCH_SIZE, ignore_conflicts=True
+    )
+
+
+def fan_out(post):
+    """Добавляет новый пост в ленты подписчиков автора."""
+    if not is_fanout_author(post.author_id):
+        return
+    followers = list(Follow.objects.filter(
+        author_id=post.author_id).values_list('user_id', flat=True))
+    _bulk_insert(
+        TimelineEntry(user_id=user_id, post_id=post.pk,
+                      author_id=post.author_id, pub_date=post.pub_date)
+        for user_id in followers
+    )
+    feed_cache.bump(*(feed_cache.follow(user_id) for user_id in followers))
+
+
+def touch(author_id):
+    """Сбрасывает кеш лент подписчиков после правки поста автора.
+
+    Ленты с постами популярных авторов зависят от версии автора,
+    её сбрасывает сам сигнал поста.
+    """
+    if not is_fanout_author(author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=author_id).values_list('user_id', flat=True)
+    feed_cache.bump(*(feed_cache.follow(user_id) for user_id in followers))
+
+
+def _fill(user_ids, author_id):
+    posts = Post.objects.filter(
+        author_id=author_id).order_by().values_list('pk', 'pub_date')
+    _bulk_insert(
+        TimelineEntry(user_id=user_id, post_id=post_id,
+                      author_id=author_id, pub_date=pub_date)
+        for post_id, pub_date in posts.iterator()
+        for user_id in user_ids
+    )
+    feed_cache.bump(*(feed_cache.follow(user_id) for user_id in user_ids))
+
+
+def backfill(user_id, author_id):
+    """Заполняет ленту пользователя постами автора после подписки."""
+    if is_fanout_author(author_id):
+        _fill([user_id], author_id)
+
+
+def demote(author_id, was):
+    """Ставит в очередь автора, который перестал быть популярным.
+
+    Пока подписчиков было не меньше TIMELINE_FANOUT_LIMIT, его посты
+    и подписки на него в ленты не попадали. ``was`` — счётчик до
+    изменения: при параллельных отписках каждая видит переход через
+    порог от своего значения, и хотя бы одна ставит задачу. Ленты
+    раскладывает ``manage.py timeline_worker``, а до тех пор посты
+    автора подмешиваются при чтении.
+    """
+    limit = settings.TIMELINE_FANOUT_LIMIT
+    if was >= limit > followers_count(author_id):
+        TimelineJob.objects.get_or_create(author_id=author_id)
+
+
+def run_jobs(limit):
+    """Раскладывает посты до limit авторов из очереди, возвращает их число."""
+    jobs = list(TimelineJob.objects.all()[:limit])
+    for job in jobs:
+        # Автор мог снова стать популярным, пока задача ждала
+        if is_fanout_author(job.author_id):
+            followers = list(Follow.objects.filter(
+                author_id=job.author_id).values_list('user_id', flat=True))
+            for start in range(0, len(followers), BATCH_SIZE):
+                _fill(followers[start:start + BATCH_SIZE], job.author_id)
+        # Задача, поставленная заново во время раскладки, остаётся
+        TimelineJob.objects.filter(pk=job.pk, created=job.created).delete()
+    return len(jobs)
+
+
+def trim(user_id, author_id):
+    """Убирает посты автора из ленты пользователя после отписки."""
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+    feed_cache.bump(feed_cache.follow(user_id))
+
+
+def merged_authors(user):
+    """Авторы из подписок пользователя, чьи посты читаются напрямую.
+
+    Это популярные авторы и авторы, чьи посты ещё ждут раскладки.
+    """
+    return Follow.objects.filter(
+        Q(author__stats__followers_count__gte=settings.TIMELINE_FANOUT_LIMIT)
+        | Q(author__timeline_job__isnull=False),
+        user=user,
+    ).values_list('author_id', flat=True)
+
+
+def timeline_entries(user):
+    # Те же поля поста, что и Post.objects.for_feed()
+    return TimelineEntry.objects.filter(user=user).select_related(
+        'post__author', 'post__group'
+    ).only('pub_date', 'post', *(f'post__{name}' for name in FEED_FIELDS))
+
+
+def merged_feed(user, authors):
+    timeline = TimelineEntry.objects.filter(user=user).values('post_id')
+    return Post.objects.filter(
+        Q(pk__in=timeline) | Q(author_id__in=authors)).for_feed()
+
+
+def follow_page(request, authors):
+    """Страница ленты подписок.
+
+    Без популярных авторов (``authors`` из merged_authors) лента
+    листается прямо по индексу ``(user, pub_date, post)``, иначе их посты
+    подмешиваются к записям ленты в одном запросе по постам.
+    """
+    if authors:
+        return get_paginator(merged_feed(request.user, authors), request)
+    return get_paginator(
+        timeline_entries(request.user), request,
+        key='post_id', item=attrgetter('post'),
+    )
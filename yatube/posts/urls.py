@@ -9,6 +9,8 @@ urlpatterns = [
     path('', views.index, name='main-view'),
     # Посты
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
+    # Поиск по постам
+    path('search/', views.post_search, name='search'),
     # Профайл пользователя
     path('profile/<str:username>/', views.profile, name='profile'),
     # Просмотр записи
@@ -18,6 +20,9 @@ urlpatterns = [
     path('posts/<post_id>/edit/', views.post_edit, name='post_edit'),
     path('posts/<int:post_id>/comment/',
          views.add_comment, name='add_comment'),
+    # Следующие страницы комментариев
+    path('posts/<int:post_id>/comments/',
+         views.post_comments, name='post_comments'),
     path('follow/', views.follow_index, name='follow_index'),
     path(
         'profile/<str:username>/follow/',
@@ -1,16 +1,21 @@
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import get_object_or_404, redirect, render
+from django.utils.functional import SimpleLazyObject
 
 from posts.forms import CommentForm, PostForm
-from .apps import get_paginator
-from .models import Follow, Group, Post, User
+from yatube.settings import POSTS_ON_PAGE
+from . import feed_cache, search, timeline, writes
+from .apps import get_comments_page, get_paginator
+from .counters import user_stats
+from .models import Comment, Follow, Group, Post, User
 
 
 def index(request):
     template = 'posts/index.html'
-    page_obj = get_paginator(Post.objects.all(), request)
+    page_obj = get_paginator(Post.objects.for_feed(), request)
     context = {
         'page_obj': page_obj,
+        **feed_cache.context(feed_cache.index()),
     }
     return render(request, template, context)
 
@@ -18,35 +23,69 @@ def index(request):
 def group_posts(request, slug):
     template = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
-    page_obj = get_paginator(group.posts.all(), request)
+    page_obj = get_paginator(group.posts.for_feed(), request)
+    feed_cache.depends(feed_cache.group_info(group.pk))
     context = {
         'group': group,
         'page_obj': page_obj,
+        **feed_cache.context(feed_cache.group(group.pk)),
     }
     return render(request, template, context)
 
 
+def post_search(request):
+    query = request.GET.get('q', '').strip()
+    if search.is_available():
+        page_obj = search.search_page(
+            query, POSTS_ON_PAGE, request.GET.get('cursor'))
+    else:
+        page_obj = get_paginator(
+            Post.objects.filter(text__icontains=query).for_feed() if query
+            else Post.objects.none(),
+            request,
+        )
+    context = {
+        'page_obj': page_obj,
+        'query': query,
+    }
+    return render(request, 'posts/search.html', context)
+
+
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    post_list = Post.objects.filter(author__username=username)
-    count = post_list.count()
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username)
+    post_list = Post.objects.filter(author=author).for_feed()
+    stats = user_stats(author)
     page_obj = get_paginator(post_list, request)
-    following = request.user.is_authenticated and author.following.filter(
-        user=request.user).exists()
+    # Кнопка подписки — персональная вставка: в общей странице
+    # посетитель не нужен
+    following = SimpleLazyObject(
+        lambda: request.user.is_authenticated and author.following.filter(
+            user=request.user).exists())
+    feed_cache.depends(
+        feed_cache.follows(author.pk), feed_cache.user(author.pk))
     context = {
         'page_obj': page_obj,
         'username': author,
-        'count': count,
+        'count': stats.posts_count,
+        'stats': stats,
         'following': following,
+        **feed_cache.context(feed_cache.author(author.pk)),
     }
     return render(request, 'posts/profile.html', context)
 
 
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, id=post_id)
-    count = post.author.posts.count()
+    post = get_object_or_404(Post.objects.for_detail(), id=post_id)
+    count = user_stats(post.author).posts_count
     form = CommentForm()
-    comments = post.comments.all()
+    comments = get_comments_page(
+        post.comments.for_thread(), request.GET.get('comments'))
+    feed_cache.depends(
+        feed_cache.post(post.pk), feed_cache.comments(post.pk),
+        feed_cache.user(post.author_id), feed_cache.author(post.author_id),
+        feed_cache.group_info(post.group_id)
+    )
     context = {
         'post': post,
         'count': count,
@@ -56,13 +95,26 @@ def post_detail(request, post_id):
     return render(request, 'posts/post_detail.html', context)
 
 
+def post_comments(request, post_id):
+    # Следующая страница комментариев для подгрузки на странице поста
+    comments = get_comments_page(
+        Comment.objects.filter(post_id=post_id).for_thread(),
+        request.GET.get('cursor'),
+    )
+    context = {
+        'post_id': post_id,
+        'comments': comments,
+    }
+    return render(request, 'posts/includes/comment_list.html', context)
+
+
 @login_required
 def post_create(request):
     form = PostForm(request.POST or None, files=request.FILES or None)
     if form.is_valid():
         form = form.save(commit=False)
         form.author = request.user
-        form.save()
+        writes.run(form.save)
         return redirect('posts:profile', request.user.username)
     return render(request, 'posts/create_post.html', {'form': form, })
 
@@ -76,7 +128,7 @@ def post_edit(request, post_id):
                     files=request.FILES or None,
                     instance=post)
     if form.is_valid():
-        form.save()
+        writes.run(form.save)
         return redirect('posts:post_detail', post_id=post_id)
     context = {
         'post': post,
@@ -94,16 +146,22 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        writes.queue.submit(comment.save)
     return redirect('posts:post_detail', post_id=post_id)
 
 
 @login_required
 def follow_index(request):
     # информация о текущем пользователе доступна в переменной request.user
-    post_list = Post.objects.filter(author__following__user=request.user)
-    page_obj = get_paginator(post_list, request)
-    context = {'page_obj': page_obj}
+    authors = list(timeline.merged_authors(request.user))
+    page_obj = timeline.follow_page(request, authors)
+    context = {
+        'page_obj': page_obj,
+        **feed_cache.context(
+            feed_cache.follow(request.user.pk),
+            *(feed_cache.author(pk) for pk in authors)
+        ),
+    }
     return render(request, 'posts/follow.html', context)
 
 
@@ -112,12 +170,14 @@ def profile_follow(request, username):
     # Подписаться на автора
     author = get_object_or_404(User, username=username)
     if author != request.user:
-        Follow.objects.get_or_create(user=request.user, author=author)
+        writes.queue.submit(lambda: Follow.objects.get_or_create(
+            user=request.user, author=author))
     return redirect('posts:profile', username=username)
 
 
 @login_required
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
-    Follow.objects.filter(user=request.user, author=author).delete()
+    writes.queue.submit(Follow.objects.filter(
+        user=request.user, author=author).delete)
     return redirect('posts:profile', username=username)
@@ -0,0 +1,191 @@
+"""Запись в базу из представлений posts при конкуренции за SQLite.
+
+SQLite пропускает одного писателя за раз. Короткие транзакции
+начинаются с ``BEGIN IMMEDIATE`` и при ``database is locked``
+повторяются целиком с экспоненциальной задержкой со случайным
+разбросом. Комментарии и подписки, пришедшие одновременно, ставятся
+в очередь и записываются одной транзакцией: SQLite платит за
+блокировку и fsync один раз на всю пачку.
+"""
+import functools
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import OperationalError, transaction
+
+from core.instrumentation import record_lock
+from core.routers import mark_write
+
+
+def is_locked(error):
+    message = str(error)
+    return 'database is locked' in message or 'database is busy' in message
+
+
+def backoff(attempt):
+    """Задержка перед повтором: полный разброс до растущей границы."""
+    ceiling = min(
+        settings.WRITE_RETRY_MAX, settings.WRITE_RETRY_BASE * 2 ** attempt)
+    return random.uniform(0, ceiling)
+
+
+@contextmanager
+def immediate_atomic(using=None):
+    """transaction.atomic, который сразу берёт блокировку записи."""
+    connection = transaction.get_connection(using)
+    immediate = (
+        not connection.in_atomic_block
+        and hasattr(connection, 'begin_immediate')
+    )
+    connection.begin_immediate = immediate
+    started = time.perf_counter()
+    try:
+        with transaction.atomic(using):
+            if immediate:
+                connection.begin_immediate = False
+                record_lock(time.perf_counter() - started)
+            yield
+    finally:
+        if immediate:
+            connection.begin_immediate = False
+
+
+def run(func, *args, using=None, **kwargs):
+    """Выполняет func в транзакции, повторяя её при блокировке базы.
+
+    Внутри чужой транзакции повторять нечего: откатится внешняя,
+    поэтому func просто выполняется в ней.
+    """
+    if transaction.get_connection(using).in_atomic_block:
+        with transaction.atomic(using):
+            result = func(*args, **kwargs)
+        mark_write()
+        return result
+    attempt = 0
+    while True:
+        started = time.perf_counter()
+        try:
+            with immediate_atomic(using):
+                result = func(*args, **kwargs)
+            mark_write()
+            return result
+        except OperationalError as error:
+            if not is_locked(error) or attempt >= settings.WRITE_RETRIES:
+                raise
+            time.sleep(backoff(attempt))
+            record_lock(time.perf_counter() - started, retries=1)
+            attempt += 1
+
+
+class Job:
+    __slots__ = ('func', 'leader', 'wake', 'result', 'error')
+
+    def __init__(self, func):
+        self.func = func
+        self.leader = False
+        self.wake = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class WriteQueue:
+    """Групповая запись: одна транзакция на все ожидающие задания.
+
+    Первый пришедший поток становится ведущим и записывает всё, что
+    накопилось, пока база была занята; остальные ждут результата.
+    Каждое задание выполняется в своей точке сохранения, так что
+    ошибка одного не откатывает соседей. После пачки ведущим
+    становится первый из ещё ожидающих. Задание, не дождавшееся
+    ведущего за WRITE_QUEUE_TIMEOUT секунд, записывается само.
+    """
+
+    def __init__(self, max_batch=None):
+        self.max_batch = max_batch
+        self.lock = threading.Lock()
+        self.pending = []
+        self.busy = False
+
+    def submit(self, func, using=None):
+        if transaction.get_connection(using).in_atomic_block:
+            with transaction.atomic(using):
+                result = func()
+            mark_write()
+            return result
+        job = Job(func)
+        with self.lock:
+            self.pending.append(job)
+            if not self.busy:
+                self.busy = job.leader = True
+        if not job.leader and not self.wait(job):
+            return run(func, using=using)
+        if job.leader:
+            self.commit_pending(using)
+        if job.error is not None:
+            raise job.error
+        mark_write()
+        return job.result
+
+    def wait(self, job):
+        """Ждёт ведущего; False — задание забрано из очереди назад.
+
+        Задание, которое ведущий уже взял в пачку, записать ещё раз
+        нельзя: его результата приходится дождаться.
+        """
+        if job.wake.wait(settings.WRITE_QUEUE_TIMEOUT):
+            return True
+        with self.lock:
+            if not job.wake.is_set() and job in self.pending:
+                self.pending.remove(job)
+                return False
+        job.wake.wait()
+        return True
+
+    def commit_pending(self, using):
+        size = self.max_batch or settings.WRITE_BATCH
+        with self.lock:
+            batch = self.pending[:size]
+            del self.pending[:size]
+        try:
+            outcomes = run(
+                functools.partial(self.apply, batch, using), using=using)
+        except Exception as error:
+            outcomes = [(None, error)] * len(batch)
+        except BaseException as error:
+            # Поток ведущего прерывают: ждущие получают ошибку,
+            # а само прерывание идёт дальше
+            failure = RuntimeError('Групповая запись прервана')
+            failure.__cause__ = error
+            outcomes = [(None, failure)] * len(batch)
+            raise
+        finally:
+            with self.lock:
+                if self.pending:
+                    self.pending[0].leader = True
+                    self.pending[0].wake.set()
+                else:
+                    self.busy = False
+            for job, (result, error) in zip(batch, outcomes):
+                job.result, job.error = result, error
+                job.wake.set()
+
+    @staticmethod
+    def apply(batch, using):
+        outcomes = []
+        for job in batch:
+            try:
+                with transaction.atomic(using):
+                    outcomes.append((job.func(), None))
+            except OperationalError as error:
+                # Блокировку базы повторяет run() для всей пачки
+                if is_locked(error):
+                    raise
+                outcomes.append((None, error))
+            except Exception as error:
+                outcomes.append((None, error))
+        return outcomes
+
+
+queue = WriteQueue()
@@ -10,12 +10,24 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
+import atexit
 import os
+import shutil
+import sys
+import tempfile
+from importlib.util import find_spec
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
 POSTS_ON_PAGE = 10
+# Комментарии под постом подгружаются страницами
+COMMENTS_ON_PAGE = 20
+# Авторы с большим числом подписчиков не раскладывают посты по лентам
+# подписчиков при публикации, их посты подмешиваются при чтении
+TIMELINE_FANOUT_LIMIT = 1000
+# Фрагменты лент сбрасываются сигналами, срок жизни — страховка
+FEED_CACHE_TIMEOUT = 60 * 60 * 6
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/2.2/howto/deployment/checklist/
@@ -51,20 +63,60 @@ INSTALLED_APPS = [
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
     'sorl.thumbnail',
-    'debug_toolbar',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.SlowQueryMiddleware',
+    'core.middleware.ReplicaMiddleware',
+    'core.middleware.ProfilingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
+    # После сессий и CSRF: вставки посетителя дорисовываются здесь
+    'posts.middleware.PageCacheMiddleware',
+    'posts.middleware.ThumbnailLookupsMiddleware',
 ]
 
+# Панель отладки только при разработке: в проде пакета может не быть,
+# а DEBUG_TOOLBAR=0 отключает её для замеров
+DEBUG_TOOLBAR = (
+    DEBUG and find_spec('debug_toolbar') is not None
+    and os.environ.get('DEBUG_TOOLBAR', '1') == '1'
+)
+if DEBUG_TOOLBAR:
+    INSTALLED_APPS.append('debug_toolbar')
+    MIDDLEWARE.append('debug_toolbar.middleware.DebugToolbarMiddleware')
+
+# Доля запросов, которые профилируются (0 — только по заголовку)
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', 0))
+PROFILING_DIR = os.path.join(BASE_DIR, 'profiles')
+# Заголовок с подписью из manage.py profile_report --token
+PROFILING_HEADER = 'X-Profile'
+PROFILING_TOKEN_MAX_AGE = 60 * 60
+
+# Снимки метрик процессов; каталог очищают при перезапуске сервиса
+METRICS_DIR = os.environ.get(
+    'METRICS_DIR', os.path.join(tempfile.gettempdir(), 'yatube-metrics'))
+# Как часто процесс сбрасывает свои счётчики на диск, с
+METRICS_FLUSH_INTERVAL = 5
+# /metrics/ отдаётся только сборщику с этих адресов и с заголовком
+# Authorization: Bearer <METRICS_TOKEN>; без токена эндпоинт закрыт
+METRICS_ALLOWED_IPS = ['127.0.0.1']
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Запросы к базе дольше стольких миллисекунд попадают в журнал
+# (None — журнал выключен, в окружении: пустое значение или off);
+# сводка: manage.py slow_queries
+SLOW_QUERY_MS = os.environ.get('SLOW_QUERY_MS', '100').strip()
+SLOW_QUERY_MS = (
+    None if SLOW_QUERY_MS.lower() in ('', 'off') else float(SLOW_QUERY_MS))
+SLOW_QUERY_LOG = os.path.join(BASE_DIR, 'logs', 'slow_queries.jsonl')
+
 INTERNAL_IPS = [
     '127.0.0.1',
 ]
@@ -75,7 +127,7 @@ TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.templates.TimedDjangoTemplates',
 
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
@@ -99,11 +151,57 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'core.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # Соединение переживает запрос: не открываем файл и не
+        # ставим прагмы заново на каждый запрос
+        'CONN_MAX_AGE': int(os.environ.get('CONN_MAX_AGE', 600)),
     }
 }
 
+# Реплики для чтения лент: DB_REPLICAS — пути к копиям файла SQLite
+# через запятую (manage.py sync_replica). Реплику на PostgreSQL можно
+# добавить в DATABASES под своим именем и вписать в REPLICA_DATABASES
+DATABASES.update({
+    f'replica{number}': {
+        **DATABASES['default'],
+        'NAME': path,
+        'TEST': {'MIRROR': 'default'},
+    }
+    for number, path in enumerate(
+        filter(None, os.environ.get('DB_REPLICAS', '').split(',')), start=1)
+})
+REPLICA_DATABASES = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+REPLICA_VIEWS = {
+    'posts:main-view', 'posts:group_list', 'posts:profile',
+    'posts:post_detail', 'posts:post_comments', 'posts:follow_index',
+}
+# Сколько секунд после записи пользователь читает с default
+REPLICA_STICKY_SECONDS = 5
+REPLICA_STICKY_COOKIE = 'read_primary'
+
+# Прагмы каждого нового соединения SQLite (core.sqlite)
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,
+    'temp_store': 'MEMORY',
+}
+SQLITE_OPTIMIZE_INTERVAL = 60 * 60
+
+# Повторы записи при database is locked (posts.writes): число попыток
+# и границы задержки со случайным разбросом, с
+WRITE_RETRIES = 5
+WRITE_RETRY_BASE = 0.02
+WRITE_RETRY_MAX = 1
+# Сколько комментариев и подписок записывается одной транзакцией
+WRITE_BATCH = 50
+# Сколько секунд задание ждёт ведущего, прежде чем записаться само
+WRITE_QUEUE_TIMEOUT = 5
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -150,6 +248,8 @@ STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# sorl-thumbnail со счётчиком обращений (заголовок X-Thumbnail-Lookups)
+THUMBNAIL_KVSTORE = 'posts.thumbnails.CountingKVStore'
 
 # STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 # STATIC_URL = '/static/'
@@ -165,8 +265,58 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
+# Истёкший фрагмент пересчитывает один запрос, остальные получают
+# прошлую копию или ждут до STAMPEDE_WAIT секунд (core.stampede)
+STAMPEDE_PROTECTION = True
+STAMPEDE_LOCK_TIMEOUT = 10
+STAMPEDE_WAIT = 2
+STAMPEDE_STALE_TIMEOUT = 60 * 60 * 24
+
+TESTING = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
+
+# Готовые страницы лент для всех посетителей (posts.page_cache).
+# Включается в окружении сервера (PAGE_CACHE=1), как и реплики; тесты
+# самого кеша включают его через override_settings
+PAGE_CACHE_ENABLED = os.environ.get('PAGE_CACHE', '0') == '1'
+PAGE_CACHE_VIEWS = {
+    'posts:main-view', 'posts:group_list', 'posts:profile',
+    'posts:post_detail',
+}
+# Сколько секунд страница считается свежей без изменения версий
+PAGE_CACHE_MAX_AGE = 60
+# Сколько хранится копия, которую можно отдать, пока собирается новая
+PAGE_CACHE_TIMEOUT = 60 * 60
+# Собирать новую копию в отдельном потоке
+PAGE_CACHE_BACKGROUND = True
+
+# Кеш общий для всех воркеров на машине (core.sqlite_cache)
+CACHE_LOCATION = os.environ.get(
+    'CACHE_LOCATION',
+    os.path.join(tempfile.gettempdir(), 'yatube-cache.sqlite3'))
+# Тесты не должны видеть кеш прошлых запусков и работающего сервера
+if TESTING:
+    CACHE_LOCATION = os.path.join(
+        tempfile.mkdtemp(prefix='yatube-cache-'), 'cache.sqlite3')
+    atexit.register(shutil.rmtree, os.path.dirname(CACHE_LOCATION), True)
 CACHES = {
+    # Память процесса перед общим кешем (core.tiered_cache)
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': 'core.cache.TieredCache',
+        'LOCATION': 'l1',
+        'OPTIONS': {
+            'L2': 'shared',
+            'L1_TIMEOUT': 5,
+            'L1_MAX_ENTRIES': 500,
+            # Версии лент всегда читаются из общего кеша
+            'L1_BYPASS': ['feed-version:'],
+        },
+    },
+    'shared': {
+        'BACKEND': 'core.sqlite_cache.SQLiteCache',
+        'LOCATION': CACHE_LOCATION,
+        'OPTIONS': {
+            'MAX_ENTRIES': 100_000,
+            'MAX_SIZE': 256 * 1024 * 1024,
+        },
+    },
 }